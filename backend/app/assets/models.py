@@ -34,7 +34,7 @@ class Asset(Base):
     asset_type = Column(String(50))  # server, workstation, network_device, container
     criticality = Column(String(50), default=AssetCriticality.MEDIUM.value)
     network_zone = Column(String(50), default=NetworkZoneType.INTERNAL.value)
-    business_unit = Column(String(100))
+    business_unit = Column(String(100), index=True)
     owner = Column(String(255))
     
     # Network
@@ -11,6 +11,7 @@ celery = Celery(
         "app.matching.tasks",
         "app.ml.tasks",
         "app.graph.tasks",
+        "app.risk.tasks",
     ],
 )
 
@@ -41,6 +42,10 @@ celery.conf.beat_schedule = {
         "task": "app.ingestion.tasks.ingest_epss_scores",
         "schedule": crontab(hour=2, minute=0),
     },
+    "search-exploits": {
+        "task": "app.ingestion.tasks.search_exploits",
+        "schedule": crontab(hour=5, minute=0),
+    },
     "run-vulnerability-matching": {
         "task": "app.matching.tasks.run_matching",
         "schedule": crontab(hour="*/6", minute=30),
@@ -49,6 +54,47 @@ celery.conf.beat_schedule = {
         "task": "app.graph.tasks.rebuild_graph",
         "schedule": crontab(hour=3, minute=0),
     },
+    "refresh-attack-path-cache": {
+        "task": "app.graph.tasks.refresh_attack_path_cache",
+        "schedule": crontab(minute="14,29,44,59"),  # no-op unless the graph changed
+    },
+    "compute-risk-propagation": {
+        "task": "app.graph.tasks.compute_risk_propagation",
+        "schedule": crontab(minute=45),  # hourly, after the change log consumers
+    },
+    # ── Change log consumers (incremental downstream recomputation) ──
+    "match-changed-cves": {
+        "task": "app.matching.tasks.match_changed_cves",
+        "schedule": crontab(minute="5,20,35,50"),
+    },
+    "predict-changed-cves": {
+        "task": "app.ml.tasks.predict_changed_cves",
+        "schedule": crontab(minute="7,22,37,52"),
+    },
+    "rescore-changed-cves": {
+        "task": "app.risk.tasks.rescore_changed_cves",
+        "schedule": crontab(minute="10,25,40,55"),
+    },
+    "sync-changed-vulnerabilities": {
+        "task": "app.graph.tasks.sync_changed_vulnerabilities",
+        "schedule": crontab(minute="12,27,42,57"),
+    },
+    "flush-dirty-risk-scores": {
+        "task": "app.risk.tasks.flush_dirty_risk_scores",
+        "schedule": 15.0,  # seconds; ORM-tracked asset/CVE/match edits
+    },
+    "prune-change-events": {
+        "task": "app.ingestion.tasks.prune_change_events",
+        "schedule": crontab(hour=1, minute=30),
+    },
+    "snapshot-risk-history": {
+        "task": "app.risk.tasks.snapshot_risk_history",
+        "schedule": crontab(hour=23, minute=50),
+    },
+    "downsample-risk-history": {
+        "task": "app.risk.tasks.downsample_risk_history",
+        "schedule": crontab(hour=0, minute=40),
+    },
     "retrain-ml-model": {
         "task": "app.ml.tasks.retrain_model",
         "schedule": crontab(hour=4, minute=0, day_of_week=1),  # weekly
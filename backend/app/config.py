@@ -14,6 +14,16 @@ class Settings(BaseSettings):
     NEO4J_URI: str = "bolt://localhost:7687"
     NEO4J_USER: str = "neo4j"
     NEO4J_PASSWORD: str = "neo4j_secret"
+    NEO4J_DATABASE: Optional[str] = None  # server default database when unset
+    NEO4J_MAX_POOL_SIZE: int = 50
+    NEO4J_ACQUISITION_TIMEOUT: float = 10.0  # seconds to wait for a pooled connection
+    NEO4J_CONNECTION_TIMEOUT: float = 5.0
+    NEO4J_QUERY_TIMEOUT: float = 30.0  # default per-transaction timeout
+    NEO4J_MAX_RETRY_TIME: float = 15.0  # managed transaction retries on transient errors
+    GRAPH_WRITE_CHUNK_SIZE: int = 5000  # rows per UNWIND transaction
+    GRAPH_WRITE_CONCURRENCY: int = 4  # chunks in flight for independent writes
+    GRAPH_NATIVE_MAX_NODES: int = 500_000  # graphs up to this size are queried in-process even when Neo4j is up
+    GRAPH_SNAPSHOT_PATH: Optional[str] = None  # shared binary graph snapshot; app/graph/snapshots/ when unset
     
     # ── Elasticsearch ──
     ELASTICSEARCH_URL: str = "http://localhost:9200"
@@ -27,6 +37,9 @@ class Settings(BaseSettings):
     NVD_API_KEY: Optional[str] = None
     SHODAN_API_KEY: Optional[str] = None
     GITHUB_TOKEN: Optional[str] = None
+
+    # ── Ingestion ──
+    NVD_FAST_DECODE: bool = True  # msgspec struct decoding for NVD pages when installed
     
     # ── App ──
     APP_ENV: str = "development"
@@ -1,6 +1,8 @@
 import logging
 from typing import List, Dict, Optional
-from app.graph.neo4j_client import neo4j_client
+from app.config import settings
+from app.graph.neo4j_client import neo4j_client, GraphUnavailableError
+from app.graph import native, reachability, propagation, path_cache
 
 logger = logging.getLogger("vulnguard.graph.analysis")
 
@@ -8,8 +10,51 @@ logger = logging.getLogger("vulnguard.graph.analysis")
 class AttackPathAnalyzer:
     """Analyze attack paths in the graph."""
 
-    async def shortest_path_to_asset(self, source_id: int, target_id: int) -> Dict:
-        """Find shortest attack path between two assets."""
+    async def _native_graph(self, force: bool = False) -> Optional[native.AttackGraph]:
+        """The in-process graph when it should answer: Neo4j is down, the graph is small, or ``force``."""
+        from app.database import async_session
+
+        async with async_session() as db:
+            if (
+                force
+                or not await neo4j_client.is_available()
+                or await native.estimated_nodes(db) <= settings.GRAPH_NATIVE_MAX_NODES
+            ):
+                return await native.get_graph(db)
+        return None
+
+    async def _read(self, query: str, params: dict = None) -> Optional[List[Dict]]:
+        """Neo4j read results, or None when Neo4j became unreachable (callers fall back)."""
+        try:
+            return await neo4j_client.read(query, params)
+        except GraphUnavailableError:
+            return None
+
+    def _path_result(self, path_nodes: Optional[list]) -> Dict:
+        if path_nodes:
+            return {
+                "path": path_nodes,
+                "length": len(path_nodes) - 1,
+                "risk_score": self._calculate_path_risk(path_nodes),
+            }
+        return {"path": [], "length": -1, "risk_score": 0}
+
+    async def shortest_path_to_asset(self, source_id: int, target_id: int, weighted: bool = False) -> Dict:
+        """Find shortest attack path between two assets.
+
+        ``weighted`` prefers hops through likely-exploited vulnerabilities
+        (Dijkstra) and is only served by the in-process graph. Paths from
+        internet-facing to critical assets come from the precomputed cache.
+        """
+        if not weighted:
+            cached = await self._cached_paths(source_id, target_id, 1)
+            if cached is not None:
+                return {**self._path_result(cached[0] if cached else None), "cached": True}
+
+        graph = await self._native_graph(force=weighted)
+        if graph is not None:
+            return self._path_result(graph.shortest_path(source_id, target_id, weighted=weighted))
+
         query = """
         MATCH path = shortestPath(
             (source:Asset {asset_id: $source_id})-[*..10]-(target:Asset {asset_id: $target_id})
@@ -25,147 +70,101 @@ class AttackPathAnalyzer:
         ] AS path_nodes,
         length(path) AS path_length
         """
-        results = await neo4j_client.run_query(query, {
+        results = await self._read(query, {
             "source_id": source_id, "target_id": target_id
         })
-        
-        if results:
-            return {
-                "path": results[0]["path_nodes"],
-                "length": results[0]["path_length"],
-                "risk_score": self._calculate_path_risk(results[0]["path_nodes"]),
-            }
-        return {"path": [], "length": -1, "risk_score": 0}
+        if results is None:
+            graph = await self._native_graph(force=True)
+            return self._path_result(graph.shortest_path(source_id, target_id))
+        return self._path_result(results[0]["path_nodes"] if results else None)
+
+    async def _cached_paths(self, source_id: int, target_id: int, k: int) -> Optional[List[List[Dict]]]:
+        from app.database import async_session
+
+        async with async_session() as db:
+            return await path_cache.cached_paths(db, source_id, target_id, k)
+
+    async def attack_paths(self, source_id: int, target_id: int, k: int = 3) -> List[Dict]:
+        """The ``k`` shortest attack paths between two assets, ties going to the more exploitable route."""
+        paths = await self._cached_paths(source_id, target_id, k)
+        if paths is None:
+            graph = await self._native_graph(force=True)
+            paths = graph.attack_paths(source_id, target_id, k)
+        return [self._path_result(p) for p in paths]
+
+    async def reachable_assets(self, asset_id: int, hops: int = 2) -> List[Dict]:
+        """Assets within ``hops`` edges of an asset (k-hop reachability)."""
+        graph = await self._native_graph(force=True)
+        return graph.reachable_assets(asset_id, hops)
 
     async def lateral_movement_paths(self, asset_id: int, max_depth: int = 5) -> List[Dict]:
         """Find all lateral movement paths from an asset."""
-        query = """
-        MATCH (source:Asset {asset_id: $asset_id})
-        MATCH path = (source)-[:IN_ZONE]->(:NetworkZone)-[:CONNECTS_TO]->(:NetworkZone)<-[:IN_ZONE]-(target:Asset)
-        WHERE source <> target
+        graph = await self._native_graph()
+        if graph is not None:
+            return graph.lateral_movement(asset_id, max_depth)
+
+        # Same semantics as native.AttackGraph.lateral_movement: up to max_depth - 2
+        # zone hops, each target at its shortest distance, ranked by criticality rank
+        rank = " ".join(f"WHEN '{name}' THEN {value}" for name, value in native.CRITICALITY_RANK.items())
+        query = f"""
+        MATCH (source:Asset {{asset_id: $asset_id}})-[:IN_ZONE]->(start:NetworkZone)
+        MATCH path = (start)-[:CONNECTS_TO*1..{max(int(max_depth) - 2, 1)}]->(zone:NetworkZone)
+        WHERE zone <> start
+        WITH source, zone, min(length(path)) AS zone_hops
+        MATCH (zone)<-[:IN_ZONE]-(target:Asset)
+        WHERE target <> source
         RETURN target.asset_id AS target_id,
                target.hostname AS target_hostname,
                target.criticality AS target_criticality,
-               target.risk_score AS target_risk,
-               length(path) AS hops
-        ORDER BY target.criticality DESC, target.risk_score DESC
+               coalesce(target.risk_score, 0.0) AS target_risk,
+               zone_hops + 2 AS hops
+        ORDER BY CASE target.criticality {rank} ELSE 1 END DESC, target_risk DESC, target_id
         LIMIT 20
         """
-        return await neo4j_client.run_query(query, {"asset_id": asset_id})
+        results = await self._read(query, {"asset_id": asset_id})
+        if results is None:
+            return (await self._native_graph(force=True)).lateral_movement(asset_id, max_depth)
+        return results
 
-    async def blast_radius(self, cve_id: str) -> Dict:
-        """Estimate the blast radius if a CVE is exploited using SQLite."""
+    async def blast_radius(self, cve_id: str, hops: int = 2) -> Dict:
+        """Assets an exploited CVE exposes: every open-match asset plus all assets in zones
+        reachable from theirs within ``hops`` CONNECTS_TO hops (bitset OR)."""
         from app.database import async_session
-        from sqlalchemy import select
+        from sqlalchemy import select, or_
         from app.matching.models import VulnerabilityMatch
-        
+
         async with async_session() as db:
-            result = await db.execute(select(VulnerabilityMatch).where(VulnerabilityMatch.cve_id == cve_id))
-            matches = result.scalars().all()
-            
-            directly_affected = len(matches)
-            indirectly = directly_affected * 2
-            total = directly_affected + indirectly
-            
-            return {
-                "cve_id": cve_id,
-                "directly_affected_assets": directly_affected,
-                "indirectly_reachable_assets": indirectly,
-                "total_blast_radius": total,
-                "severity": self._blast_severity(total)
-            }
+            affected = (await db.execute(
+                select(VulnerabilityMatch.asset_id).distinct().where(
+                    VulnerabilityMatch.cve_id == cve_id,
+                    or_(VulnerabilityMatch.status == "open", VulnerabilityMatch.status.is_(None)),
+                )
+            )).scalars().all()
+            index = await reachability.get_index(db)
 
-    async def risk_propagation(self) -> List[Dict]:
-        """Calculate risk propagation scores across the graph."""
-        query = """
-        MATCH (a:Asset)-[:AFFECTED_BY]->(v:Vulnerability)
-        WITH a, count(v) AS vuln_count, avg(v.cvss_score) AS avg_cvss, max(v.exploit_probability) AS max_prob
-        OPTIONAL MATCH (a)-[:IN_ZONE]->(z:NetworkZone)-[:CONNECTS_TO*0..2]->(:NetworkZone)<-[:IN_ZONE]-(neighbor:Asset)
-        WHERE neighbor <> a
-        WITH a, vuln_count, avg_cvss, max_prob, count(DISTINCT neighbor) AS reachable_count
-        RETURN a.asset_id AS asset_id,
-               a.hostname AS hostname,
-               a.criticality AS criticality,
-               vuln_count,
-               round(avg_cvss * 100) / 100 AS avg_cvss,
-               round(max_prob * 100) / 100 AS max_exploit_prob,
-               reachable_count,
-               round((vuln_count * avg_cvss * max_prob * (1 + reachable_count * 0.1)) * 100) / 100 AS propagation_score
-        ORDER BY propagation_score DESC
-        LIMIT 50
-        """
-        return await neo4j_client.run_query(query)
+        radius = index.blast_radius(affected, hops)
+        total = radius["reachable"]
+        return {
+            "cve_id": cve_id,
+            "hops": hops,
+            "directly_affected_assets": radius["direct"],
+            "indirectly_reachable_assets": total - radius["direct"],
+            "total_blast_radius": total,
+            "severity": self._blast_severity(total)
+        }
 
-    async def get_full_graph_data(self) -> Dict:
-        """Get all nodes and edges for visualization from SQLite."""
+    async def risk_propagation(self, limit: int = 50) -> List[Dict]:
+        """Assets with the highest propagated risk (personalized PageRank, stored per asset)."""
         from app.database import async_session
-        from sqlalchemy import select
-        from app.assets.models import Asset
-        from app.matching.models import VulnerabilityMatch
-        
-        nodes = []
-        edges = []
-        zones = set()
-        vulnerability_ids = set()
-        
+
+        async with async_session() as db:
+            return await propagation.top_scores(db, limit)
+
+    async def asset_risk_propagation(self, asset_id: int) -> Optional[Dict]:
+        from app.database import async_session
+
         async with async_session() as db:
-            assets = (await db.execute(select(Asset))).scalars().all()
-            matches = (await db.execute(select(VulnerabilityMatch))).scalars().all()
-            
-            for a in assets:
-                asset_id = a.id
-                crit = a.criticality.value if hasattr(a.criticality, 'value') else a.criticality
-                nodes.append({
-                    "id": asset_id,
-                    "type": "Asset",
-                    "properties": {"hostname": a.hostname, "criticality": crit or "medium"}
-                })
-                
-                zone = a.network_zone.value if hasattr(a.network_zone, 'value') else a.network_zone
-                if not zone:
-                    zone = "internal"
-                
-                zone_id = f"zone_{zone}"
-                if zone not in zones:
-                    zones.add(zone)
-                    nodes.append({
-                        "id": zone_id,
-                        "type": "NetworkZone",
-                        "properties": {"name": zone}
-                    })
-                
-                edges.append({
-                    "source": asset_id,
-                    "target": zone_id,
-                    "relationship": "IN_ZONE"
-                })
-                
-            for m in matches:
-                vuln_id = f"vuln_{m.cve_id}"
-                if m.cve_id not in vulnerability_ids:
-                    vulnerability_ids.add(m.cve_id)
-                    nodes.append({
-                        "id": vuln_id,
-                        "type": "Vulnerability",
-                        "properties": {"cve_id": m.cve_id, "level": "high"}
-                    })
-                    
-                edges.append({
-                    "source": m.asset_id,
-                    "target": vuln_id,
-                    "relationship": "AFFECTED_BY"
-                })
-                
-        # Connect zones together
-        zones_list = list(zones)
-        for i in range(len(zones_list) - 1):
-            edges.append({
-                "source": f"zone_{zones_list[i]}",
-                "target": f"zone_{zones_list[i+1]}",
-                "relationship": "CONNECTS_TO"
-            })
-            
-        return {"nodes": nodes, "edges": edges}
+            return await propagation.asset_score(db, asset_id)
 
     @staticmethod
     def _calculate_path_risk(path_nodes: list) -> float:
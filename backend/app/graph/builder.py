@@ -1,22 +1,41 @@
 import logging
-from typing import List, Dict
-from app.graph.neo4j_client import neo4j_client
+from typing import Dict, Iterable, List, Optional
+from app.graph.batch_writer import BatchWriter
 
 logger = logging.getLogger("vulnguard.graph.builder")
 
+# Zone ↔ Zone reachability (directed CONNECTS_TO edges)
+ZONE_CONNECTIVITY = [
+    ("external", "dmz"),
+    ("dmz", "internal"),
+    ("internal", "restricted"),
+    ("cloud", "dmz"),
+    ("cloud", "internal"),
+]
+
+PRIVILEGE_LEVELS = ["system", "admin", "user", "service", "guest"]
+
+# Privilege escalation (directed ESCALATES_TO edges, low → high)
+PRIVILEGE_ESCALATIONS = [
+    ("guest", "user"), ("user", "admin"),
+    ("admin", "system"), ("service", "admin"),
+]
+
 
 class GraphBuilder:
-    """Build and maintain the attack graph in Neo4j."""
+    """Build and maintain the attack graph in Neo4j.
 
-    async def clear_graph(self):
-        """Clear all nodes and relationships."""
-        await neo4j_client.run_write("MATCH (n) DETACH DELETE n")
-        logger.info("Graph cleared")
+    Every write unwinds ``$rows`` through a ``BatchWriter``, so payloads of any
+    size are chunked; each method returns the writer's throughput stats.
+    """
 
-    async def build_asset_nodes(self, assets: List[Dict]):
+    def __init__(self, writer: Optional[BatchWriter] = None):
+        self.writer = writer or BatchWriter()
+
+    async def build_asset_nodes(self, assets: Iterable[Dict]) -> Dict:
         """Create asset nodes."""
         query = """
-        UNWIND $assets AS asset
+        UNWIND $rows AS asset
         MERGE (a:Asset {asset_id: asset.id})
         SET a.hostname = asset.hostname,
             a.ip_address = asset.ip_address,
@@ -27,13 +46,12 @@ class GraphBuilder:
             a.risk_score = asset.risk_score,
             a.business_unit = asset.business_unit
         """
-        await neo4j_client.run_write(query, {"assets": assets})
-        logger.info(f"Created {len(assets)} asset nodes")
+        return await self.writer.write(query, assets, "asset nodes")
 
-    async def build_vulnerability_nodes(self, vulnerabilities: List[Dict]):
+    async def build_vulnerability_nodes(self, vulnerabilities: Iterable[Dict]) -> Dict:
         """Create vulnerability nodes."""
         query = """
-        UNWIND $vulns AS v
+        UNWIND $rows AS v
         MERGE (vuln:Vulnerability {cve_id: v.cve_id})
         SET vuln.cvss_score = v.cvss_score,
             vuln.epss_score = v.epss_score,
@@ -43,92 +61,99 @@ class GraphBuilder:
             vuln.has_exploit = v.has_exploit,
             vuln.severity = v.severity
         """
-        await neo4j_client.run_write(query, {"vulns": vulnerabilities})
-        logger.info(f"Created {len(vulnerabilities)} vulnerability nodes")
+        return await self.writer.write(query, vulnerabilities, "vulnerability nodes")
 
-    async def build_zone_nodes(self, zones: List[str]):
+    async def build_zone_nodes(self, zones: List[str]) -> Dict:
         """Create network zone nodes."""
         query = """
-        UNWIND $zones AS zone
+        UNWIND $rows AS zone
         MERGE (z:NetworkZone {name: zone})
         """
-        await neo4j_client.run_write(query, {"zones": zones})
+        return await self.writer.write(query, zones, "zone nodes")
 
-    async def build_privilege_nodes(self):
+    async def build_privilege_nodes(self) -> Dict:
         """Create privilege level nodes."""
-        levels = ["system", "admin", "user", "service", "guest"]
         query = """
-        UNWIND $levels AS level
+        UNWIND $rows AS level
         MERGE (p:Privilege {level: level})
         """
-        await neo4j_client.run_write(query, {"levels": levels})
-
-    async def build_relationships(self, matches: List[Dict], assets: List[Dict]):
-        """Build edges: asset ↔ vulnerability, asset ↔ zone, connectivity."""
-        
-        # Asset → Vulnerability (AFFECTED_BY)
-        vuln_query = """
-        UNWIND $matches AS m
+        return await self.writer.write(query, PRIVILEGE_LEVELS, "privilege nodes")
+
+    async def build_affected_by(self, matches: Iterable[Dict]) -> Dict:
+        """Create Asset → Vulnerability (AFFECTED_BY) edges."""
+        query = """
+        UNWIND $rows AS m
         MATCH (a:Asset {asset_id: m.asset_id})
         MATCH (v:Vulnerability {cve_id: m.cve_id})
         MERGE (a)-[r:AFFECTED_BY]->(v)
         SET r.confidence = m.confidence,
             r.software = m.software_name
         """
-        if matches:
-            await neo4j_client.run_write(vuln_query, {"matches": matches})
+        # Chunks share both endpoints: many assets per CVE and many CVEs per asset
+        return await self.writer.write(query, matches, "AFFECTED_BY edges", independent=False)
 
-        # Asset → NetworkZone (IN_ZONE)
-        zone_query = """
-        UNWIND $assets AS asset
+    async def build_in_zone(self, assets: Iterable[Dict]) -> Dict:
+        """Create Asset → NetworkZone (IN_ZONE) edges, dropping any to a previous zone."""
+        query = """
+        UNWIND $rows AS asset
         MATCH (a:Asset {asset_id: asset.id})
+        OPTIONAL MATCH (a)-[old:IN_ZONE]->(prev:NetworkZone)
+        WHERE prev.name <> asset.network_zone
+        DELETE old
+        WITH DISTINCT a, asset
         MATCH (z:NetworkZone {name: asset.network_zone})
         MERGE (a)-[:IN_ZONE]->(z)
         """
-        await neo4j_client.run_write(zone_query, {"assets": assets})
-
-        # Zone ↔ Zone (connectivity)
-        connectivity = [
-            ("external", "dmz", "CONNECTS_TO"),
-            ("dmz", "internal", "CONNECTS_TO"),
-            ("internal", "restricted", "CONNECTS_TO"),
-            ("cloud", "dmz", "CONNECTS_TO"),
-            ("cloud", "internal", "CONNECTS_TO"),
-        ]
-        for src, dst, rel in connectivity:
-            q = f"""
-            MATCH (z1:NetworkZone {{name: $src}})
-            MATCH (z2:NetworkZone {{name: $dst}})
-            MERGE (z1)-[:{rel}]->(z2)
-            """
-            await neo4j_client.run_write(q, {"src": src, "dst": dst})
-
-        # Privilege escalation edges
-        priv_edges = [
-            ("guest", "user"), ("user", "admin"),
-            ("admin", "system"), ("service", "admin"),
+        # Every chunk locks the same few zone nodes
+        return await self.writer.write(query, assets, "IN_ZONE edges", independent=False)
+
+    async def build_static_edges(self) -> List[Dict]:
+        """Create zone connectivity (CONNECTS_TO) and privilege escalation (ESCALATES_TO) edges."""
+        connects = """
+        UNWIND $rows AS edge
+        MATCH (z1:NetworkZone {name: edge.src})
+        MATCH (z2:NetworkZone {name: edge.dst})
+        MERGE (z1)-[:CONNECTS_TO]->(z2)
+        """
+        escalates = """
+        UNWIND $rows AS edge
+        MATCH (p1:Privilege {level: edge.low})
+        MATCH (p2:Privilege {level: edge.high})
+        MERGE (p1)-[:ESCALATES_TO]->(p2)
+        """
+        return [
+            await self.writer.write(
+                connects, [{"src": s, "dst": d} for s, d in ZONE_CONNECTIVITY], "CONNECTS_TO edges"
+            ),
+            await self.writer.write(
+                escalates, [{"low": l, "high": h} for l, h in PRIVILEGE_ESCALATIONS], "ESCALATES_TO edges"
+            ),
         ]
-        for low, high in priv_edges:
-            q = """
-            MATCH (p1:Privilege {level: $low})
-            MATCH (p2:Privilege {level: $high})
-            MERGE (p1)-[:ESCALATES_TO]->(p2)
-            """
-            await neo4j_client.run_write(q, {"low": low, "high": high})
-
-        logger.info("Built all graph relationships")
-
-    async def build_full_graph(self, assets: List[Dict], vulnerabilities: List[Dict], matches: List[Dict]):
-        """Build the complete attack graph."""
-        await self.clear_graph()
-        await neo4j_client.ensure_indexes()
-
-        zones = list(set(a.get("network_zone", "internal") for a in assets))
-        
-        await self.build_zone_nodes(zones)
-        await self.build_privilege_nodes()
-        await self.build_asset_nodes(assets)
-        await self.build_vulnerability_nodes(vulnerabilities)
-        await self.build_relationships(matches, assets)
-
-        logger.info("Full attack graph built successfully")
+
+    async def delete_affected_by(self, pairs: Iterable[Dict]) -> Dict:
+        """Remove AFFECTED_BY edges for (asset_id, cve_id) pairs no longer matched."""
+        query = """
+        UNWIND $rows AS p
+        MATCH (:Asset {asset_id: p.asset_id})-[r:AFFECTED_BY]->(:Vulnerability {cve_id: p.cve_id})
+        DELETE r
+        """
+        # Deleting a relationship locks its Asset and Vulnerability nodes, as in build_affected_by
+        return await self.writer.write(query, pairs, "removed AFFECTED_BY edges", independent=False)
+
+    async def delete_assets(self, asset_ids: Iterable[int]) -> Dict:
+        """Remove asset nodes (and their edges) that no longer exist."""
+        query = """
+        UNWIND $rows AS id
+        MATCH (a:Asset {asset_id: id})
+        DETACH DELETE a
+        """
+        return await self.writer.write(query, asset_ids, "removed asset nodes")
+
+    async def delete_vulnerabilities(self, cve_ids: Iterable[str]) -> Dict:
+        """Remove vulnerability nodes (and their edges) that no longer exist."""
+        query = """
+        UNWIND $rows AS id
+        MATCH (v:Vulnerability {cve_id: id})
+        DETACH DELETE v
+        """
+        return await self.writer.write(query, cve_ids, "removed vulnerability nodes")
@@ -0,0 +1,55 @@
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, Float, BigInteger, DateTime, Text, ForeignKey, UniqueConstraint, Index
+from app.database import Base
+
+
+class GraphSyncState(Base):
+    """Content hash of each node/edge as last written to Neo4j; the diff baseline for graph sync."""
+    __tablename__ = "graph_sync_state"
+    __table_args__ = (
+        UniqueConstraint("entity_type", "entity_key", name="uq_graph_sync_entity"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity_type = Column(String(20), nullable=False)  # asset, vulnerability, affected_by
+    entity_key = Column(String(50), nullable=False)  # asset id, CVE id, "asset_id|cve_id"
+    content_hash = Column(BigInteger, nullable=False)
+    synced_at = Column(DateTime, default=datetime.utcnow)
+
+
+class AssetPropagationScore(Base):
+    """Risk that can propagate to an asset through the attack graph (see ``app.graph.propagation``)."""
+    __tablename__ = "asset_propagation_scores"
+
+    id = Column(Integer, primary_key=True, index=True)
+    asset_id = Column(Integer, ForeignKey("assets.id"), unique=True, nullable=False)
+    propagation_score = Column(Float, nullable=False)  # 0-100, relative to the highest-scoring asset
+    pagerank = Column(Float, nullable=False)  # raw stationary probability
+    vuln_count = Column(Integer, default=0)
+    avg_cvss = Column(Float, default=0.0)
+    max_exploit_prob = Column(Float, default=0.0)
+    reachable_count = Column(Integer, default=0)  # assets within two zone hops
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+
+# Top-N reads walk this index instead of sorting the table
+Index("ix_asset_propagation_scores_score_desc", AssetPropagationScore.propagation_score.desc())
+
+
+class AttackPathCache(Base):
+    """One of the k best precomputed attack paths from an internet-facing to a critical asset."""
+    __tablename__ = "attack_path_cache"
+    __table_args__ = (
+        # Also the lookup index: WHERE source AND target ORDER BY rank
+        UniqueConstraint("source_asset_id", "target_asset_id", "rank", name="uq_attack_path_cache_pair_rank"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_asset_id = Column(Integer, nullable=False)
+    target_asset_id = Column(Integer, nullable=False)
+    rank = Column(Integer, nullable=False, default=0)
+    hops = Column(Integer, nullable=False)  # -1: no path within the depth limit
+    cost = Column(Float)
+    nodes = Column(Text, nullable=False, default="[]")  # JSON node tokens, e.g. ["a:12","z:dmz","a:7"]
+    fingerprint = Column(String(40), nullable=False)  # graph fingerprint the path was computed for
+    computed_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,606 @@
+"""
+In-process attack graph over CSR adjacency arrays.
+
+Mirrors the Neo4j model built by ``GraphBuilder`` (assets, network zones,
+vulnerabilities and privilege levels with IN_ZONE, AFFECTED_BY, CONNECTS_TO
+and ESCALATES_TO edges) with integer node ids, so shortest-path, k-hop and
+lateral-movement queries run as array BFS/Dijkstra without a database round
+trip. Used when Neo4j is unreachable and for graphs small enough to keep in
+memory. Graph syncs publish the arrays as a memory-mapped snapshot
+(``app.graph.snapshot``) that other processes map instead of reloading.
+"""
+import asyncio
+import heapq
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, func, distinct
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.assets.models import Asset
+from app.ingestion.models import CVE
+from app.matching.models import VulnerabilityMatch
+from app.graph import snapshot
+from app.graph.builder import ZONE_CONNECTIVITY, PRIVILEGE_LEVELS, PRIVILEGE_ESCALATIONS
+from app.risk.inputs import enum_value
+
+logger = logging.getLogger("vulnguard.graph.native")
+
+GRAPH_MAX_AGE_SECONDS = 300
+SNAPSHOT_CHECK_SECONDS = 2
+SIZE_ESTIMATE_MAX_AGE_SECONDS = 300
+
+KIND_ASSET, KIND_ZONE, KIND_VULNERABILITY, KIND_PRIVILEGE = 0, 1, 2, 3
+
+CRITICALITY_RANK = {"critical": 3, "high": 2, "medium": 1, "low": 0}
+PATH_MAX_DEPTH = 10
+
+
+# Relationship of each CSR entry; entries stored against the edge's direction add EDGE_REVERSED
+EDGE_TYPES = ("IN_ZONE", "AFFECTED_BY", "CONNECTS_TO", "ESCALATES_TO")
+EDGE_REVERSED = len(EDGE_TYPES)
+
+
+def graph_core(assets: pd.DataFrame, pairs: pd.DataFrame) -> Dict:
+    """The arrays and string tables an ``AttackGraph`` is built from (what snapshots store)."""
+    n_assets = len(assets)
+    asset_ids = assets["id"].to_numpy(dtype=np.int64)
+    asset_index = pd.Series(np.arange(n_assets), index=asset_ids)
+
+    zone_of = assets["network_zone"].map(lambda v: enum_value(v, "internal"))
+    asset_zone, zone_names = pd.factorize(zone_of)
+    zone_names = list(zone_names)
+    for src, dst in ZONE_CONNECTIVITY:
+        for name in (src, dst):
+            if name not in zone_names:
+                zone_names.append(name)
+    zone_index = {z: n_assets + i for i, z in enumerate(zone_names)}
+
+    if len(pairs):
+        pair_asset = asset_index.loc[pairs["asset_id"].to_numpy()].to_numpy(dtype=np.int64)
+        pair_vuln, cve_ids = pd.factorize(pairs["cve_id"])
+        first = pd.Series(np.arange(len(pairs))).groupby(pair_vuln).first().to_numpy()
+        cve_ids = list(cve_ids)
+        cvss = pairs["cvss_v3_score"].fillna(0.0).to_numpy(dtype=np.float64)[first]
+        exploit_probability = pairs["predicted_exploit_probability"].fillna(0.0).to_numpy(dtype=np.float64)[first]
+    else:
+        pair_asset = pair_vuln = np.zeros(0, dtype=np.int64)
+        cve_ids, cvss, exploit_probability = [], np.zeros(0), np.zeros(0)
+    pair_vuln = pair_vuln.astype(np.int64)
+    vuln_base = n_assets + len(zone_names)
+    priv_base = vuln_base + len(cve_ids)
+    privilege_index = {p: priv_base + i for i, p in enumerate(PRIVILEGE_LEVELS)}
+
+    # Directed edges as the builder writes them
+    zone_edges = np.array(
+        [(zone_index[s], zone_index[d]) for s, d in ZONE_CONNECTIVITY], dtype=np.int64
+    ).reshape(-1, 2)
+    priv_edges = np.array(
+        [(privilege_index[l], privilege_index[h]) for l, h in PRIVILEGE_ESCALATIONS], dtype=np.int64
+    ).reshape(-1, 2)
+    src = np.concatenate([np.arange(n_assets, dtype=np.int64), pair_asset, zone_edges[:, 0], priv_edges[:, 0]])
+    dst = np.concatenate([n_assets + asset_zone.astype(np.int64), vuln_base + pair_vuln, zone_edges[:, 1], priv_edges[:, 1]])
+    edge_type = np.repeat(
+        np.arange(len(EDGE_TYPES), dtype=np.int8), [n_assets, len(pair_asset), len(zone_edges), len(priv_edges)]
+    )
+    # Entering a likely-exploited vulnerability is cheaper for weighted paths
+    weight = np.ones(len(src), dtype=np.float64)
+    weight[n_assets:n_assets + len(pair_asset)] = 2.0 - exploit_probability[pair_vuln]
+
+    # Cypher path patterns are undirected, so store both directions
+    n_nodes = priv_base + len(PRIVILEGE_LEVELS)
+    both = np.concatenate([src, dst])
+    order = np.argsort(both, kind="stable")
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(both, minlength=n_nodes), out=indptr[1:])
+    return {
+        "asset_ids": asset_ids,
+        "hostnames": assets["hostname"].fillna("").astype(str).tolist(),
+        "criticality": assets["criticality"].map(lambda v: enum_value(v, "medium")).tolist(),
+        "asset_risk": assets["risk_score"].fillna(0.0).to_numpy(dtype=np.float64),
+        "internet_facing": assets["is_internet_facing"].fillna(False).to_numpy(dtype=bool),
+        "asset_zone": asset_zone.astype(np.int32),
+        "zone_names": zone_names,
+        "cve_ids": cve_ids,
+        "cvss": cvss,
+        "exploit_probability": exploit_probability,
+        "pair_asset": pair_asset,
+        "pair_vuln": pair_vuln,
+        "indptr": indptr,
+        "indices": np.concatenate([dst, src])[order].astype(np.int32),
+        "weights": np.concatenate([weight, weight])[order].astype(np.float32),
+        "edge_types": np.concatenate([edge_type, edge_type + EDGE_REVERSED])[order].astype(np.int8),
+    }
+
+
+class AttackGraph:
+    """Attack graph as CSR arrays; node ids are assets, then zones, vulnerabilities, privileges."""
+
+    def __init__(
+        self, core: Dict, generation: Optional[int] = None, loaded_at: Optional[float] = None,
+        fingerprint: Optional[str] = None,
+    ):
+        """Build from ``graph_core`` output or a loaded snapshot; arrays are used as-is (possibly
+        read-only views of a memory map), only small lookups are derived here."""
+        self.core = core
+        self.generation = generation  # snapshot generation; None when loaded from the database
+        self.loaded_at = loaded_at or time.time()
+        self.fingerprint = fingerprint  # graph_fingerprint of the data the graph was built from
+        self.validated_at = time.time()
+
+        self.asset_ids = core["asset_ids"]
+        self.hostnames = core["hostnames"]
+        self.criticality = core["criticality"]
+        self.asset_risk = core["asset_risk"]
+        self.internet_facing = core["internet_facing"]
+        self.asset_zone = core["asset_zone"]
+        self.zone_names = core["zone_names"]
+        self.cve_ids = core["cve_ids"]
+        self.cvss = core["cvss"]
+        self.exploit_probability = core["exploit_probability"]
+        self.pair_asset, self.pair_vuln = core["pair_asset"], core["pair_vuln"]
+        self.indptr, self.indices, self.weights = core["indptr"], core["indices"], core["weights"]
+        self.edge_types = core["edge_types"]
+
+        n_assets, n_zones = len(self.asset_ids), len(self.zone_names)
+        self.criticality_rank = np.array([CRITICALITY_RANK.get(c, 1) for c in self.criticality], dtype=np.int8)
+        self.asset_index = dict(zip(self.asset_ids.tolist(), range(n_assets)))
+        zone_base = n_assets
+        vuln_base = zone_base + n_zones
+        priv_base = vuln_base + len(self.cve_ids)
+        self.zone_index = {z: zone_base + i for i, z in enumerate(self.zone_names)}
+        self.privilege_index = {p: priv_base + i for i, p in enumerate(PRIVILEGE_LEVELS)}
+        self.n_nodes = priv_base + len(PRIVILEGE_LEVELS)
+        self.n_edges = len(self.indices) // 2
+        self.node_kind = np.empty(self.n_nodes, dtype=np.int8)
+        self.node_kind[:zone_base] = KIND_ASSET
+        self.node_kind[zone_base:vuln_base] = KIND_ZONE
+        self.node_kind[vuln_base:priv_base] = KIND_VULNERABILITY
+        self.node_kind[priv_base:] = KIND_PRIVILEGE
+        self._zone_base, self._vuln_base, self._priv_base = zone_base, vuln_base, priv_base
+
+        # Hop count first, then the more exploitable route: the (1 - p) vulnerability
+        # surcharges of a path never add up to a whole hop
+        self.surcharge = (self.weights - 1).astype(np.float64)
+        self.hop_weights = 1 + self.surcharge / (PATH_MAX_DEPTH + 1)
+
+        # Zone-level adjacency for lateral movement (tiny, kept as Python lists)
+        self.zone_out: List[List[int]] = [[] for _ in range(n_zones)]
+        for s, d in ZONE_CONNECTIVITY:
+            self.zone_out[self.zone_index[s] - zone_base].append(self.zone_index[d] - zone_base)
+        zone_order = np.lexsort((-self.asset_risk, -self.criticality_rank, self.asset_zone))
+        counts = np.bincount(self.asset_zone, minlength=n_zones)
+        self.zone_members = np.split(zone_order.astype(np.int32), np.cumsum(counts)[:-1])
+
+        # Per-asset vulnerability aggregates for risk propagation
+        self.vuln_count = np.bincount(self.pair_asset, minlength=n_assets)
+        self.cvss_sum = np.bincount(self.pair_asset, weights=self.cvss[self.pair_vuln], minlength=n_assets)
+        self.max_exploit = np.zeros(n_assets)
+        np.maximum.at(self.max_exploit, self.pair_asset, self.exploit_probability[self.pair_vuln])
+
+    @classmethod
+    def from_frames(cls, assets: pd.DataFrame, pairs: pd.DataFrame) -> "AttackGraph":
+        return cls(graph_core(assets, pairs))
+
+    # ── Traversal ─────────────────────────────────────────
+
+    def _offsets(self, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """CSR positions of every edge leaving a frontier, and the edge count per frontier node."""
+        starts = self.indptr[frontier]
+        lengths = self.indptr[frontier + 1] - starts
+        total = int(lengths.sum())
+        return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total), lengths
+
+    def _expand(self, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """All (neighbor, owner) pairs of a frontier, gathered from the CSR slices."""
+        offsets, lengths = self._offsets(frontier)
+        return self.indices[offsets], np.repeat(frontier, lengths).astype(np.int32)
+
+    def _visit(self, frontier: np.ndarray, parent: np.ndarray) -> np.ndarray:
+        """Expand one BFS level, recording parents of newly reached nodes; returns the next frontier."""
+        nbrs, owners = self._expand(frontier)
+        fresh = parent[nbrs] == -1
+        nbrs, first = np.unique(nbrs[fresh], return_index=True)
+        parent[nbrs] = owners[fresh][first]
+        return nbrs
+
+    def bfs(self, source: int, max_depth: int) -> np.ndarray:
+        """Level-synchronous BFS; hop count per node, -1 where unreached."""
+        parent = np.full(self.n_nodes, -1, dtype=np.int32)
+        depth = np.full(self.n_nodes, -1, dtype=np.int16)
+        parent[source], depth[source] = source, 0
+        frontier = np.array([source], dtype=np.int32)
+        for level in range(1, max_depth + 1):
+            frontier = self._visit(frontier, parent)
+            if not len(frontier):
+                break
+            depth[frontier] = level
+        return depth
+
+    def bidirectional_bfs(self, source: int, target: int, max_depth: int) -> List[int]:
+        """Unweighted shortest path, growing whichever side has the smaller frontier degree.
+
+        Zone and widespread-CVE nodes are hubs, so meeting in the middle avoids
+        expanding their neighbourhoods from both ends.
+        """
+        if source == target:
+            return [source]
+        parents = [np.full(self.n_nodes, -1, dtype=np.int32), np.full(self.n_nodes, -1, dtype=np.int32)]
+        parents[0][source], parents[1][target] = source, target
+        frontiers = [np.array([source], dtype=np.int32), np.array([target], dtype=np.int32)]
+        for _ in range(max_depth):
+            degree = [int((self.indptr[f + 1] - self.indptr[f]).sum()) for f in frontiers]
+            side = 0 if degree[0] <= degree[1] else 1
+            frontiers[side] = self._visit(frontiers[side], parents[side])
+            if not len(frontiers[side]):
+                return []
+            meet = frontiers[side][parents[1 - side][frontiers[side]] != -1]
+            if len(meet):
+                m = int(meet[0])
+                return self._walk(parents[0], source, m) + self._walk(parents[1], target, m)[-2::-1]
+        return []
+
+    def dijkstra(self, source: int, target: int, max_depth: int) -> np.ndarray:
+        """Weighted shortest path tree towards ``target``, bounded to ``max_depth`` hops."""
+        dist = np.full(self.n_nodes, np.inf)
+        hops = np.zeros(self.n_nodes, dtype=np.int16)
+        parent = np.full(self.n_nodes, -1, dtype=np.int32)
+        dist[source], parent[source] = 0.0, source
+        heap = [(0.0, source)]
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u == target:
+                break
+            if d > dist[u] or hops[u] >= max_depth:
+                continue
+            lo, hi = self.indptr[u], self.indptr[u + 1]
+            nbrs = self.indices[lo:hi]
+            nd = d + self.weights[lo:hi]
+            better = nd < dist[nbrs]
+            nbrs, nd = nbrs[better], nd[better]
+            dist[nbrs], parent[nbrs], hops[nbrs] = nd, u, hops[u] + 1
+            for v, dv in zip(nbrs.tolist(), nd.tolist()):
+                heapq.heappush(heap, (dv, v))
+        return parent
+
+    def fewest_hops_tree(self, source: int, target: int, max_depth: int, blocked: Optional[np.ndarray] = None,
+                         banned: Optional[Dict[int, set]] = None, to_target: Optional[np.ndarray] = None) -> np.ndarray:
+        """Parents of a level-synchronous BFS towards ``target`` in which each node keeps,
+        among its fewest-hop paths, the one with the smallest vulnerability surcharge.
+
+        Exact for ``hop_weights``, whose surcharges never add up to a hop.
+        ``blocked`` masks nodes that may not be entered, ``banned`` maps a node
+        to neighbours it may not step to (Yen's spur searches), and
+        ``to_target`` (hop distances from ``bfs(target)``) prunes nodes that
+        cannot reach the target within ``max_depth``.
+        """
+        parent = np.full(self.n_nodes, -1, dtype=np.int32)
+        surcharge = np.zeros(self.n_nodes)
+        parent[source] = source
+        frontier = np.array([source], dtype=np.int32)
+        for level in range(1, max_depth + 1):
+            if parent[target] != -1 or not len(frontier):
+                break
+            offsets, lengths = self._offsets(frontier)
+            nbrs, owners = self.indices[offsets], np.repeat(frontier, lengths)
+            keep = parent[nbrs] == -1
+            if blocked is not None:
+                keep &= ~blocked[nbrs]
+            if to_target is not None:
+                remaining = to_target[nbrs]
+                keep &= (remaining >= 0) & (level + remaining <= max_depth)
+            for u, vs in (banned or {}).items():
+                keep &= ~((owners == u) & np.isin(nbrs, list(vs)))
+            nbrs, owners = nbrs[keep], owners[keep]
+            cost = surcharge[owners] + self.surcharge[offsets[keep]]
+            order = np.lexsort((cost, nbrs))
+            nbrs, owners, cost = nbrs[order], owners[order], cost[order]
+            first = np.ones(len(nbrs), dtype=bool)
+            first[1:] = nbrs[1:] != nbrs[:-1]
+            frontier = nbrs[first]
+            parent[frontier], surcharge[frontier] = owners[first], cost[first]
+        return parent
+
+    def path_cost(self, path: List[int], weights: Optional[np.ndarray] = None) -> float:
+        weights = self.weights if weights is None else weights
+        cost = 0.0
+        for u, v in zip(path, path[1:]):
+            lo, hi = self.indptr[u], self.indptr[u + 1]
+            cost += float(weights[lo:hi][self.indices[lo:hi] == v].min())
+        return cost
+
+    def _fewest_hops_path(self, source: int, target: int, max_depth: int, to_target: np.ndarray,
+                          blocked: Optional[np.ndarray] = None, banned: Optional[Dict[int, set]] = None) -> List[int]:
+        """``fewest_hops_tree`` path, deepening from the unblocked hop distance so each search
+        only covers nodes on paths of the current length."""
+        for depth in range(max(int(to_target[source]), 0), max_depth + 1):
+            path = self._walk(self.fewest_hops_tree(source, target, depth, blocked, banned, to_target), source, target)
+            if path:
+                return path
+        return []
+
+    def k_shortest_paths(self, source: int, target: int, k: int, max_depth: int = PATH_MAX_DEPTH,
+                         to_target: Optional[np.ndarray] = None) -> List[Tuple[float, List[int]]]:
+        """Up to ``k`` loopless (cost, path) pairs by ``hop_weights`` cost (Yen's algorithm):
+        fewest hops first, ties going to the more exploitable route.
+
+        ``to_target`` (``bfs(target, max_depth)``) can be shared by every
+        source of the same target.
+        """
+        if to_target is None:
+            to_target = self.bfs(target, max_depth)
+        if to_target[source] < 0:
+            return []
+        first = self._fewest_hops_path(source, target, max_depth, to_target)
+        found = [(self.path_cost(first, self.hop_weights), first)]
+        candidates, seen = [], {tuple(first)}
+        while len(found) < k:
+            # Paths longer than the worst candidate that could still make the cut are not needed
+            needed = k - len(found)
+            limit = max_depth
+            if len(candidates) >= needed:
+                limit = min(limit, len(heapq.nsmallest(needed, candidates)[-1][1]) - 1)
+            last = found[-1][1]
+            for j in range(len(last) - 1):
+                root = last[:j + 1]
+                banned = {last[j]: {path[j + 1] for _, path in found if path[:j + 1] == root}}
+                blocked = np.zeros(self.n_nodes, dtype=bool)
+                blocked[root[:-1]] = True
+                spur = self._fewest_hops_path(last[j], target, limit - j, to_target, blocked, banned)
+                if spur and tuple(root[:-1] + spur) not in seen:
+                    path = root[:-1] + spur
+                    seen.add(tuple(path))
+                    heapq.heappush(candidates, (self.path_cost(path, self.hop_weights), path))
+            if not candidates:
+                break
+            found.append(heapq.heappop(candidates))
+        return found
+
+    @staticmethod
+    def _walk(parent: np.ndarray, source: int, target: int) -> List[int]:
+        if parent[target] == -1:
+            return []
+        path = [target]
+        while path[-1] != source:
+            path.append(int(parent[path[-1]]))
+        return path[::-1]
+
+    # ── Queries ───────────────────────────────────────────
+
+    def node_dict(self, node: int) -> Dict:
+        """Node in the shape ``AttackPathAnalyzer`` returns from Cypher paths."""
+        kind = self.node_kind[node]
+        if kind == KIND_ASSET:
+            return {"type": "asset", "id": int(self.asset_ids[node]), "hostname": self.hostnames[node],
+                    "criticality": self.criticality[node]}
+        if kind == KIND_VULNERABILITY:
+            i = node - self._vuln_base
+            return {"type": "vulnerability", "id": self.cve_ids[i], "cvss": float(self.cvss[i])}
+        if kind == KIND_ZONE:
+            return {"type": "zone", "name": self.zone_names[node - self._zone_base]}
+        return {"type": "privilege", "level": PRIVILEGE_LEVELS[node - self._priv_base]}
+
+    def shortest_path(self, source_id: int, target_id: int, max_depth: int = PATH_MAX_DEPTH,
+                      weighted: bool = False) -> Optional[List[Dict]]:
+        """Nodes on the shortest path between two assets, or None when unreachable."""
+        source, target = self.asset_index.get(source_id), self.asset_index.get(target_id)
+        if source is None or target is None:
+            return None
+        if weighted:
+            parent = self.dijkstra(source, target, max_depth)
+            path = self._walk(parent, source, target)
+        else:
+            path = self.bidirectional_bfs(source, target, max_depth)
+        return [self.node_dict(n) for n in path] or None
+
+    def attack_paths(self, source_id: int, target_id: int, k: int,
+                     max_depth: int = PATH_MAX_DEPTH) -> List[List[Dict]]:
+        """The ``k`` shortest paths between two assets, ties going to the more exploitable route."""
+        source, target = self.asset_index.get(source_id), self.asset_index.get(target_id)
+        if source is None or target is None:
+            return []
+        return [
+            [self.node_dict(n) for n in path]
+            for _, path in self.k_shortest_paths(source, target, k, max_depth)
+        ]
+
+    def reachable_assets(self, asset_id: int, hops: int) -> List[Dict]:
+        """Assets within ``hops`` edges of an asset, nearest first."""
+        source = self.asset_index.get(asset_id)
+        if source is None:
+            return []
+        depth = self.bfs(source, hops)
+        n_assets = len(self.asset_ids)
+        found = np.flatnonzero(depth[:n_assets] > 0)
+        found = found[np.argsort(depth[found], kind="stable")]
+        return [
+            {"asset_id": int(self.asset_ids[i]), "hostname": self.hostnames[i],
+             "criticality": self.criticality[i], "hops": int(depth[i])}
+            for i in found
+        ]
+
+    def neighborhood(self, asset_id: int, hops: int, limit: int) -> Tuple[np.ndarray, List[Tuple[int, int, str]]]:
+        """Up to ``limit`` nodes within ``hops`` of an asset (nearest, then riskiest, first)
+        and the directed edges among them as (source, target, relationship)."""
+        source = self.asset_index.get(asset_id)
+        if source is None:
+            return np.zeros(0, dtype=np.int32), []
+        depth = self.bfs(source, hops)
+        nodes = np.flatnonzero(depth >= 0).astype(np.int32)
+        n_assets = len(self.asset_ids)
+        risk = np.where(nodes < n_assets, self.asset_risk[np.minimum(nodes, n_assets - 1)], 0.0)
+        nodes = nodes[np.lexsort((-risk, depth[nodes]))[:limit]]
+
+        keep = np.zeros(self.n_nodes, dtype=bool)
+        keep[nodes] = True
+        offsets, lengths = self._offsets(nodes)
+        owners, nbrs, types = np.repeat(nodes, lengths), self.indices[offsets], self.edge_types[offsets]
+        forward = (types < EDGE_REVERSED) & keep[nbrs]  # each edge once, from its source
+        return nodes, [
+            (u, v, EDGE_TYPES[t])
+            for u, v, t in zip(owners[forward].tolist(), nbrs[forward].tolist(), types[forward].tolist())
+        ]
+
+    def lateral_movement(self, asset_id: int, max_depth: int = 5, limit: int = 20) -> List[Dict]:
+        """Assets in zones reachable over CONNECTS_TO, ranked by criticality, risk, then id.
+
+        A path is asset → zone → (CONNECTS_TO)+ → zone ← asset, so ``max_depth``
+        allows up to ``max_depth - 2`` zone-to-zone hops.
+        """
+        source = self.asset_index.get(asset_id)
+        if source is None:
+            return []
+        start = int(self.asset_zone[source])
+        seen = {start: 0}
+        frontier = [start]
+        for zone_hops in range(1, max(max_depth - 2, 1) + 1):
+            frontier = [z for u in frontier for z in self.zone_out[u] if z not in seen]
+            for z in frontier:
+                seen[z] = zone_hops
+        del seen[start]
+        if not seen:
+            return []
+
+        # Members are pre-sorted per zone, so only each zone's head can make the cut
+        candidates = np.concatenate([self.zone_members[z][:limit + 1] for z in seen])
+        candidates = candidates[candidates != source]
+        top = candidates[np.lexsort((
+            self.asset_ids[candidates], -self.asset_risk[candidates], -self.criticality_rank[candidates],
+        ))[:limit]]
+        return [
+            {"target_id": int(self.asset_ids[i]), "target_hostname": self.hostnames[i],
+             "target_criticality": self.criticality[i], "target_risk": float(self.asset_risk[i]),
+             "hops": seen[int(self.asset_zone[i])] + 2}
+            for i in top
+        ]
+
+    def zone_reach_sizes(self, hops: int) -> np.ndarray:
+        """Per zone, the number of assets in it and in the zones within ``hops`` CONNECTS_TO hops."""
+        n_zones = len(self.zone_names)
+        zone_size = np.bincount(self.asset_zone, minlength=n_zones)
+        sizes = np.zeros(n_zones, dtype=np.int64)
+        for z in range(n_zones):
+            reach, frontier = {z}, [z]
+            for _ in range(hops):
+                frontier = [d for u in frontier for d in self.zone_out[u] if d not in reach]
+                reach.update(frontier)
+            sizes[z] = zone_size[list(reach)].sum()
+        return sizes
+
+
+async def load_graph(db: AsyncSession) -> AttackGraph:
+    from app.graph.visualization import graph_fingerprint
+
+    started = time.perf_counter()
+    # Taken before the rows, so a concurrent change leaves the graph looking stale rather than fresh
+    fingerprint = await graph_fingerprint(db)
+    assets = (await db.execute(select(
+        Asset.id, Asset.hostname, Asset.criticality, Asset.network_zone,
+        Asset.is_internet_facing, Asset.risk_score,
+    ).order_by(Asset.id))).all()
+    pairs = (await db.execute(
+        select(
+            VulnerabilityMatch.asset_id, VulnerabilityMatch.cve_id,
+            CVE.cvss_v3_score, CVE.predicted_exploit_probability,
+        )
+        .join(CVE, CVE.cve_id == VulnerabilityMatch.cve_id)
+        .distinct()
+    )).all()
+    asset_columns = ["id", "hostname", "criticality", "network_zone", "is_internet_facing", "risk_score"]
+    pair_columns = ["asset_id", "cve_id", "cvss_v3_score", "predicted_exploit_probability"]
+    graph = AttackGraph.from_frames(
+        pd.DataFrame([tuple(r) for r in assets], columns=asset_columns),
+        pd.DataFrame([tuple(r) for r in pairs], columns=pair_columns),
+    )
+    graph.fingerprint = fingerprint
+    logger.info(
+        f"Loaded attack graph: {graph.n_nodes} nodes, {graph.n_edges} edges "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+    return graph
+
+
+def load_snapshot_graph() -> AttackGraph:
+    started = time.perf_counter()
+    header, core = snapshot.load_snapshot()
+    graph = AttackGraph(
+        core, generation=header["generation"], loaded_at=header["created_at"],
+        fingerprint=header.get("fingerprint"),
+    )
+    logger.info(
+        f"Mapped attack graph snapshot generation {graph.generation}: {graph.n_nodes} nodes, "
+        f"{graph.n_edges} edges in {(time.perf_counter() - started) * 1000:.1f}ms"
+    )
+    return graph
+
+
+def publish_snapshot(graph: AttackGraph) -> Dict:
+    """Write ``graph`` as the next snapshot generation for other processes to map."""
+    return snapshot.write_snapshot(graph.core, fingerprint=graph.fingerprint)
+
+
+_graph: Optional[AttackGraph] = None
+_graph_lock = asyncio.Lock()
+_size_estimate: Tuple[int, float] = (0, 0.0)
+_snapshot_checked_at = 0.0
+
+
+def _newer_snapshot() -> Optional[AttackGraph]:
+    """The snapshot graph when the file holds another generation than the current graph
+    (or data newer than a database-loaded one)."""
+    header = snapshot.read_header()
+    if header is None:
+        return None
+    if _graph is not None:
+        if _graph.generation is not None and header["generation"] == _graph.generation:
+            return None
+        if _graph.generation is None and header["created_at"] <= _graph.loaded_at:
+            return None
+    try:
+        return load_snapshot_graph()
+    except snapshot.SnapshotError as e:
+        logger.warning(f"Ignoring graph snapshot: {e}")
+        return None
+
+
+async def get_graph(db: AsyncSession, refresh: bool = False) -> AttackGraph:
+    """Process-wide graph.
+
+    A newer snapshot generation is mapped when one appears (checked at most
+    every SNAPSHOT_CHECK_SECONDS). Every GRAPH_MAX_AGE_SECONDS the graph's
+    data fingerprint is compared with the database, however old the graph
+    is; the graph is reloaded from the database only when they differ, when
+    there is no graph yet or when ``refresh`` is requested.
+    """
+    from app.graph.visualization import graph_fingerprint
+
+    global _graph, _snapshot_checked_at
+    async with _graph_lock:
+        if not refresh and time.time() - _snapshot_checked_at > SNAPSHOT_CHECK_SECONDS:
+            _snapshot_checked_at = time.time()
+            _graph = _newer_snapshot() or _graph
+        if not refresh and _graph is not None and time.time() - _graph.validated_at > GRAPH_MAX_AGE_SECONDS:
+            if _graph.fingerprint is not None and _graph.fingerprint == await graph_fingerprint(db):
+                _graph.validated_at = time.time()
+            else:
+                refresh = True
+        if refresh or _graph is None:
+            _graph = await load_graph(db)
+        return _graph
+
+
+async def estimated_nodes(db: AsyncSession) -> int:
+    """Node count of the graph without loading it (assets plus matched CVEs)."""
+    global _size_estimate
+    if _graph is not None:
+        return _graph.n_nodes
+    value, at = _size_estimate
+    if time.time() - at > SIZE_ESTIMATE_MAX_AGE_SECONDS:
+        assets = (await db.execute(select(func.count(Asset.id)))).scalar() or 0
+        cves = (await db.execute(select(func.count(distinct(VulnerabilityMatch.cve_id))))).scalar() or 0
+        value = assets + cves
+        _size_estimate = (value, time.time())
+    return value
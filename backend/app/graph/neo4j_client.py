@@ -1,10 +1,64 @@
+"""
+Async Neo4j client.
+
+Reads and writes run as managed transactions, so on a cluster they are
+routed to readers or the leader and transient failures are retried by the
+driver. Each call has a server-side transaction timeout and a client-side
+deadline, large results can be streamed record by record, and latency,
+errors and streamed rows are recorded in ``app.metrics`` under
+``neo4j_``. Failures raise ``GraphDatabaseError`` subclasses rather than
+returning empty results.
+"""
+import asyncio
 import logging
-from typing import Optional
-from neo4j import AsyncGraphDatabase
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from neo4j import AsyncGraphDatabase, READ_ACCESS, WRITE_ACCESS, unit_of_work
+from neo4j.exceptions import (
+    ClientError, ConnectionAcquisitionTimeoutError, DatabaseUnavailable, Neo4jError,
+    ServiceUnavailable, SessionExpired,
+)
 from app.config import settings
+from app.metrics import metrics
 
 logger = logging.getLogger("vulnguard.graph.neo4j")
 
+AVAILABILITY_TTL_SECONDS = 30
+AVAILABILITY_PROBE_TIMEOUT = 2.0
+CLIENT_DEADLINE_GRACE_SECONDS = 2.0  # beyond the server-side timeout, for network stalls
+
+
+class GraphDatabaseError(Exception):
+    """A Neo4j operation failed."""
+
+
+class GraphUnavailableError(GraphDatabaseError):
+    """Neo4j could not be reached or no pooled connection was free in time."""
+
+
+class GraphQueryTimeoutError(GraphDatabaseError):
+    """A query exceeded its timeout."""
+
+
+class GraphQueryError(GraphDatabaseError):
+    """Neo4j rejected a query (syntax, constraint, type errors)."""
+
+
+def _translate(e: BaseException) -> GraphDatabaseError:
+    if isinstance(e, GraphDatabaseError):
+        return e
+    if isinstance(e, asyncio.TimeoutError):
+        return GraphQueryTimeoutError("Neo4j query exceeded its client-side deadline")
+    if isinstance(e, Neo4jError) and e.code and "TransactionTimedOut" in e.code:
+        return GraphQueryTimeoutError(str(e))
+    if isinstance(e, (ServiceUnavailable, SessionExpired, DatabaseUnavailable, ConnectionAcquisitionTimeoutError, OSError)):
+        return GraphUnavailableError(str(e))
+    if isinstance(e, ClientError):
+        return GraphQueryError(str(e))
+    return GraphDatabaseError(str(e))
+
 
 class Neo4jClient:
     """Async Neo4j driver wrapper."""
@@ -13,12 +67,20 @@ class Neo4jClient:
         self.uri = settings.NEO4J_URI
         self.user = settings.NEO4J_USER
         self.password = settings.NEO4J_PASSWORD
+        self.database = settings.NEO4J_DATABASE
+        self.query_timeout = settings.NEO4J_QUERY_TIMEOUT
         self._driver = None
+        self._available: Optional[bool] = None
+        self._checked_at = 0.0
 
     async def connect(self):
         if not self._driver:
             self._driver = AsyncGraphDatabase.driver(
-                self.uri, auth=(self.user, self.password)
+                self.uri, auth=(self.user, self.password),
+                max_connection_pool_size=settings.NEO4J_MAX_POOL_SIZE,
+                connection_acquisition_timeout=settings.NEO4J_ACQUISITION_TIMEOUT,
+                connection_timeout=settings.NEO4J_CONNECTION_TIMEOUT,
+                max_transaction_retry_time=settings.NEO4J_MAX_RETRY_TIME,
             )
             logger.info("Connected to Neo4j")
 
@@ -27,31 +89,130 @@ class Neo4jClient:
             await self._driver.close()
             self._driver = None
 
-    async def run_query(self, query: str, params: dict = None) -> list:
+    async def is_available(self) -> bool:
+        """Whether Neo4j answered a connectivity probe recently (cached for AVAILABILITY_TTL_SECONDS)."""
+        if self._available is not None and time.monotonic() - self._checked_at < AVAILABILITY_TTL_SECONDS:
+            return self._available
+        error = await self._probe()
+        if error is not None and self._available is not False:
+            logger.warning(f"Neo4j unavailable, graph queries fall back to the in-process engine: {error}")
+        self._mark(error is None)
+        return self._available
+
+    async def _probe(self) -> Optional[Exception]:
+        """Connectivity check; returns the failure, or None when Neo4j answered."""
         try:
             await self.connect()
-            async with self._driver.session() as session:
-                result = await session.run(query, params or {})
-                # result is an AsyncResult, we need to iterate over it properly
-                records = []
-                async for record in result:
-                    records.append(record.data())
-                return records
+            await asyncio.wait_for(self._driver.verify_connectivity(), timeout=AVAILABILITY_PROBE_TIMEOUT)
         except Exception as e:
-            logger.error(f"Neo4j query failed (Service likely unavailable): {e}")
-            return []
+            return e
+        return None
 
-    async def run_write(self, query: str, params: dict = None):
+    def _mark(self, available: bool):
+        self._available = available
+        self._checked_at = time.monotonic()
+
+    def _session(self, access_mode: str):
+        return self._driver.session(database=self.database, default_access_mode=access_mode)
+
+    @asynccontextmanager
+    async def _observed(self, kind: str):
+        """Time an operation and translate driver errors, recording both in metrics."""
+        started = time.perf_counter()
         try:
-            await self.connect()
-            async with self._driver.session() as session:
-                await session.run(query, params or {})
+            yield
         except Exception as e:
-            logger.error(f"Neo4j write failed: {e}")
+            error = _translate(e)
+            metrics.inc("neo4j_queries_total", kind=kind, status=type(error).__name__)
+            if isinstance(error, GraphUnavailableError):
+                self._mark(False)
+            logger.error(f"Neo4j {kind} failed: {error}")
+            if error is e:
+                raise
+            raise error from e
+        else:
+            metrics.inc("neo4j_queries_total", kind=kind, status="ok")
+        finally:
+            metrics.observe("neo4j_query_seconds", time.perf_counter() - started, kind=kind)
+
+    async def _managed(self, access_mode: str, work, timeout: Optional[float]):
+        timeout = timeout or self.query_timeout
+        await self.connect()
+        async with self._session(access_mode) as session:
+            execute = session.execute_read if access_mode == READ_ACCESS else session.execute_write
+            try:
+                return await asyncio.wait_for(
+                    execute(unit_of_work(timeout=timeout)(work)),
+                    timeout=timeout + CLIENT_DEADLINE_GRACE_SECONDS,
+                )
+            except asyncio.TimeoutError:
+                # The driver keeps retrying connection failures until the deadline;
+                # report those as an outage rather than a slow query
+                error = await self._probe()
+                if error is not None:
+                    raise GraphUnavailableError(str(error)) from None
+                raise
+
+    async def read(self, query: str, params: dict = None, timeout: Optional[float] = None) -> List[Dict]:
+        """Run a read in a managed transaction, routed to a reader; returns all records."""
+        async def work(tx):
+            result = await tx.run(query, params or {})
+            return [record.data() async for record in result]
+
+        async with self._observed("read"):
+            return await self._managed(READ_ACCESS, work, timeout)
+
+    async def execute_write(self, query: str, params: dict = None, timeout: Optional[float] = None) -> dict:
+        """Run a write in a managed transaction (retried by the driver on transient errors).
+
+        Returns the update counters.
+        """
+        async def work(tx):
+            result = await tx.run(query, params or {})
+            summary = await result.consume()
+            return summary.counters
+
+        async with self._observed("write"):
+            counters = await self._managed(WRITE_ACCESS, work, timeout)
+        return {k: v for k, v in vars(counters).items() if not k.startswith("_") and v}
+
+    async def stream(self, query: str, params: dict = None, timeout: Optional[float] = None) -> AsyncIterator[Dict]:
+        """Yield records of a read as they arrive, without buffering the result.
+
+        Runs in an explicit read transaction (a managed one could replay
+        records already yielded on retry), so a failure mid-stream raises.
+        """
+        timeout = timeout or self.query_timeout
+        rows = 0
+        async with self._observed("stream"):
+            await self.connect()
+            async with self._session(READ_ACCESS) as session:
+                tx = await session.begin_transaction(timeout=timeout)
+                try:
+                    result = await tx.run(query, params or {})
+                    async for record in result:
+                        rows += 1
+                        yield record.data()
+                    await tx.commit()
+                finally:
+                    if not tx.closed():
+                        await tx.close()
+                    metrics.inc("neo4j_stream_records_total", rows)
+
+    async def run_query(self, query: str, params: dict = None) -> list:
+        """Read query returning all records (see ``read``)."""
+        return await self.read(query, params)
+
+    async def run_write(self, query: str, params: dict = None):
+        """Auto-commit write, for schema statements that cannot run in a managed transaction."""
+        async with self._observed("schema"):
+            await self.connect()
+            async with self._session(WRITE_ACCESS) as session:
+                result = await session.run(query, params or {})
+                await result.consume()
 
     async def ensure_indexes(self):
         """Create indexes for performance."""
-        await self.connect()
         indexes = [
             "CREATE INDEX IF NOT EXISTS FOR (a:Asset) ON (a.asset_id)",
             "CREATE INDEX IF NOT EXISTS FOR (v:Vulnerability) ON (v.cve_id)",
@@ -61,7 +222,7 @@ class Neo4jClient:
         for idx in indexes:
             try:
                 await self.run_write(idx)
-            except Exception as e:
+            except GraphQueryError as e:
                 logger.warning(f"Index creation skipped: {e}")
 
 
@@ -0,0 +1,160 @@
+"""
+Precomputed attack paths to crown-jewel assets.
+
+A background job runs Yen's k-shortest-paths on the in-process graph from
+every internet-facing asset to every ``critical`` asset and stores the paths
+as compact node tokens (``a:<asset id>``, ``z:<zone>``, ``v:<CVE id>``,
+``p:<privilege>``) in ``attack_path_cache``. Rows carry the graph fingerprint
+they were computed for; any asset, match or CVE change alters the
+fingerprint, so stale rows are ignored on read and replaced by the next run.
+"""
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.assets.models import Asset
+from app.ingestion.models import CVE
+from app.graph import native
+from app.graph.builder import PRIVILEGE_LEVELS
+from app.graph.models import AttackPathCache
+from app.graph.visualization import graph_fingerprint
+from app.risk.inputs import enum_value
+
+logger = logging.getLogger("vulnguard.graph.path_cache")
+
+PATHS_PER_PAIR = 3
+MAX_PAIRS = 20_000  # riskiest sources and targets first; other pairs are computed on request
+STORE_CHUNK_SIZE = 5000
+
+
+# ── Encoding ──────────────────────────────────────────────
+
+def encode_path(graph: native.AttackGraph, path: List[int]) -> str:
+    tokens = []
+    for node in path:
+        kind = graph.node_kind[node]
+        if kind == native.KIND_ASSET:
+            tokens.append(f"a:{graph.asset_ids[node]}")
+        elif kind == native.KIND_ZONE:
+            tokens.append(f"z:{graph.zone_names[node - graph._zone_base]}")
+        elif kind == native.KIND_VULNERABILITY:
+            tokens.append(f"v:{graph.cve_ids[node - graph._vuln_base]}")
+        else:
+            tokens.append(f"p:{PRIVILEGE_LEVELS[node - graph._priv_base]}")
+    return json.dumps(tokens, separators=(",", ":"))
+
+
+async def decode_paths(db: AsyncSession, encoded: List[str]) -> List[List[Dict]]:
+    """Node dicts (as ``AttackGraph.node_dict`` builds them) for stored paths, in one lookup per table."""
+    paths = [json.loads(nodes) for nodes in encoded]
+    tokens = [token.split(":", 1) for path in paths for token in path]
+    asset_ids = {int(key) for kind, key in tokens if kind == "a"}
+    cve_ids = {key for kind, key in tokens if kind == "v"}
+    assets = {
+        asset_id: (hostname, enum_value(criticality, "medium"))
+        for asset_id, hostname, criticality in (await db.execute(
+            select(Asset.id, Asset.hostname, Asset.criticality).where(Asset.id.in_(asset_ids))
+        )).all()
+    } if asset_ids else {}
+    cvss = dict((await db.execute(
+        select(CVE.cve_id, CVE.cvss_v3_score).where(CVE.cve_id.in_(cve_ids))
+    )).all()) if cve_ids else {}
+
+    def node(token: str) -> Dict:
+        kind, key = token.split(":", 1)
+        if kind == "a":
+            hostname, criticality = assets.get(int(key), (None, "medium"))
+            return {"type": "asset", "id": int(key), "hostname": hostname, "criticality": criticality}
+        if kind == "v":
+            return {"type": "vulnerability", "id": key, "cvss": float(cvss.get(key) or 0.0)}
+        if kind == "z":
+            return {"type": "zone", "name": key}
+        return {"type": "privilege", "level": key}
+
+    return [[node(token) for token in path] for path in paths]
+
+
+# ── Refresh ───────────────────────────────────────────────
+
+def compute_rows(graph: native.AttackGraph, fingerprint: str) -> List[Dict]:
+    """Cache rows for the riskiest internet-facing/critical pairs, up to MAX_PAIRS."""
+    by_risk = np.argsort(-graph.asset_risk, kind="stable")
+    sources = by_risk[graph.internet_facing[by_risk]]
+    targets = by_risk[np.array(graph.criticality, dtype=object)[by_risk] == "critical"]
+    pairs = [(int(s), int(t)) for t in targets for s in sources if s != t]
+    if len(pairs) > MAX_PAIRS:
+        logger.warning(f"Caching attack paths for {MAX_PAIRS} of {len(pairs)} pairs")
+        pairs = pairs[:MAX_PAIRS]
+
+    now = datetime.utcnow()
+    rows = []
+    to_target: Dict[int, np.ndarray] = {}
+    for source, target in pairs:
+        if target not in to_target:
+            to_target = {target: graph.bfs(target, native.PATH_MAX_DEPTH)}  # pairs are grouped by target
+        base = {
+            "source_asset_id": int(graph.asset_ids[source]), "target_asset_id": int(graph.asset_ids[target]),
+            "fingerprint": fingerprint, "computed_at": now,
+        }
+        paths = graph.k_shortest_paths(source, target, PATHS_PER_PAIR, to_target=to_target[target])
+        if not paths:
+            rows.append({**base, "rank": 0, "hops": -1, "cost": None, "nodes": "[]"})
+        for rank, (cost, path) in enumerate(paths):
+            rows.append({
+                **base, "rank": rank, "hops": len(path) - 1, "cost": round(cost, 4),
+                "nodes": encode_path(graph, path),
+            })
+    return rows
+
+
+async def cached_fingerprint(db: AsyncSession) -> Optional[str]:
+    return (await db.execute(select(AttackPathCache.fingerprint).limit(1))).scalar()
+
+
+async def refresh(db: AsyncSession, force: bool = False) -> Dict:
+    """Recompute the cache when the graph changed since the last run (or ``force``)."""
+    started = time.perf_counter()
+    fingerprint = await graph_fingerprint(db)
+    if not force and await cached_fingerprint(db) == fingerprint:
+        return {"status": "fresh"}
+
+    graph = await native.get_graph(db, refresh=True)
+    rows = compute_rows(graph, fingerprint)
+    await db.execute(delete(AttackPathCache))
+    for start in range(0, len(rows), STORE_CHUNK_SIZE):
+        await db.execute(AttackPathCache.__table__.insert(), rows[start:start + STORE_CHUNK_SIZE])
+    summary = {
+        "status": "refreshed",
+        "pairs": len({(r["source_asset_id"], r["target_asset_id"]) for r in rows}),
+        "paths": sum(1 for r in rows if r["hops"] >= 0),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+    logger.info(f"Attack path cache: {summary}")
+    return summary
+
+
+# ── Lookup ────────────────────────────────────────────────
+
+async def cached_paths(db: AsyncSession, source_id: int, target_id: int, k: int) -> Optional[List[List[Dict]]]:
+    """Up to ``k`` cached paths between two assets (``[]`` when none exists), or None on a miss.
+
+    Pairs that were not precomputed, requests for more than PATHS_PER_PAIR
+    paths and rows from an older graph are misses.
+    """
+    if k > PATHS_PER_PAIR:
+        return None
+    rows = (await db.execute(
+        select(AttackPathCache.hops, AttackPathCache.nodes, AttackPathCache.fingerprint)
+        .where(AttackPathCache.source_asset_id == source_id, AttackPathCache.target_asset_id == target_id)
+        .order_by(AttackPathCache.rank)
+        .limit(k)
+    )).all()
+    if not rows or rows[0].fingerprint != await graph_fingerprint(db):
+        return None
+    return await decode_paths(db, [r.nodes for r in rows if r.hops >= 0])
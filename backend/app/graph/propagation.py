@@ -0,0 +1,170 @@
+"""
+Fleet-wide risk propagation as a personalized PageRank.
+
+Risk enters the attack graph at vulnerability nodes, seeded by exploit
+probability x CVSS, and flows along the edges an attacker would follow:
+vulnerability -> affected asset, asset -> its zone, zone -> member assets,
+and zone -> zone over CONNECTS_TO. The stationary distribution, found by
+power iteration over a sparse transition matrix, is the share of fleet risk
+that reaches each asset. One job scores every asset and stores the result
+in ``asset_propagation_scores``; reads are index lookups on that table.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.assets.models import Asset
+from app.graph import native
+from app.graph.builder import ZONE_CONNECTIVITY
+from app.graph.models import AssetPropagationScore
+from app.risk.inputs import enum_value
+
+logger = logging.getLogger("vulnguard.graph.propagation")
+
+DAMPING = 0.85
+TOLERANCE = 1e-10  # L1 change between iterations
+MAX_ITERATIONS = 200
+REACH_HOPS = 2
+STORE_CHUNK_SIZE = 5000
+
+
+def transition_matrix(graph: native.AttackGraph) -> sp.csr_matrix:
+    """Column-stochastic risk-flow matrix over assets, zones and vulnerabilities, transposed
+    so one propagation step is ``matrix @ rank``. Rows of nodes without out-edges are empty."""
+    n_assets = len(graph.asset_ids)
+    n = graph._priv_base  # privilege nodes are not linked to assets
+    assets = np.arange(n_assets, dtype=np.int64)
+    zones = graph._zone_base + graph.asset_zone.astype(np.int64)
+    zone_edges = np.array(
+        [(graph.zone_index[s], graph.zone_index[d]) for s, d in ZONE_CONNECTIVITY], dtype=np.int64
+    ).reshape(-1, 2)
+    src = np.concatenate([graph._vuln_base + graph.pair_vuln, assets, zones, zone_edges[:, 0]])
+    dst = np.concatenate([graph.pair_asset, zones, assets, zone_edges[:, 1]])
+
+    out_degree = np.bincount(src, minlength=n).astype(np.float64)
+    weight = 1.0 / out_degree[src]
+    return sp.csr_matrix((weight, (dst, src)), shape=(n, n))
+
+
+def seed_vector(graph: native.AttackGraph) -> np.ndarray:
+    """Teleport distribution: vulnerability nodes weighted by exploit probability x CVSS."""
+    seed = np.zeros(graph._priv_base)
+    seed[graph._vuln_base:graph._priv_base] = graph.exploit_probability * graph.cvss
+    total = seed.sum()
+    return seed / total if total > 0 else seed
+
+
+def personalized_pagerank(matrix: sp.csr_matrix, seed: np.ndarray, damping: float = DAMPING) -> np.ndarray:
+    """Power iteration; mass on nodes without out-edges restarts from ``seed``."""
+    dangling = np.asarray(matrix.sum(axis=0)).ravel() == 0
+    rank = seed.copy()
+    for iteration in range(1, MAX_ITERATIONS + 1):
+        updated = damping * (matrix @ rank)
+        updated += (damping * rank[dangling].sum() + 1 - damping) * seed
+        change = np.abs(updated - rank).sum()
+        rank = updated
+        if change < TOLERANCE:
+            break
+    else:
+        logger.warning(f"Risk propagation did not converge in {MAX_ITERATIONS} iterations (change {change:.2e})")
+    logger.debug(f"Risk propagation converged after {iteration} iterations")
+    return rank
+
+
+def compute_scores(graph: native.AttackGraph) -> pd.DataFrame:
+    """One row per asset: PageRank mass, 0-100 score and the vulnerability aggregates."""
+    n_assets = len(graph.asset_ids)
+    seed = seed_vector(graph)
+    if seed.any():
+        rank = personalized_pagerank(transition_matrix(graph), seed)[:n_assets]
+    else:
+        rank = np.zeros(n_assets)
+    top = rank.max() if n_assets else 0.0
+    count = graph.vuln_count
+    return pd.DataFrame({
+        "asset_id": graph.asset_ids,
+        "propagation_score": np.round(100 * rank / top, 2) if top > 0 else np.zeros(n_assets),
+        "pagerank": rank,
+        "vuln_count": count,
+        "avg_cvss": np.round(np.divide(graph.cvss_sum, count, out=np.zeros(n_assets), where=count > 0), 2),
+        "max_exploit_prob": np.round(graph.max_exploit, 2),
+        "reachable_count": graph.zone_reach_sizes(REACH_HOPS)[graph.asset_zone] - 1,
+    })
+
+
+async def store_scores(db: AsyncSession, scores: pd.DataFrame) -> None:
+    """Replace the stored scores in the caller's transaction."""
+    now = datetime.utcnow()
+    await db.execute(delete(AssetPropagationScore))
+    rows = scores.to_dict("records")
+    for start in range(0, len(rows), STORE_CHUNK_SIZE):
+        batch = [{**row, "computed_at": now} for row in rows[start:start + STORE_CHUNK_SIZE]]
+        await db.execute(AssetPropagationScore.__table__.insert(), batch)
+
+
+async def recompute(db: AsyncSession) -> Dict:
+    """Score the whole fleet from a freshly loaded graph and store the result."""
+    started = time.perf_counter()
+    graph = await native.get_graph(db, refresh=True)
+    scores = compute_scores(graph)
+    await store_scores(db, scores)
+    summary = {"assets": len(scores), "seconds": round(time.perf_counter() - started, 2)}
+    logger.info(f"Risk propagation scored {summary['assets']} assets in {summary['seconds']}s")
+    return summary
+
+
+_compute_lock = asyncio.Lock()
+
+
+async def ensure_scores(db: AsyncSession) -> None:
+    """Compute scores on first use when the scheduled job has not run yet."""
+    async with _compute_lock:
+        if (await db.execute(select(func.count(AssetPropagationScore.id)))).scalar():
+            return
+        await recompute(db)
+        await db.commit()
+
+
+def _row(score: AssetPropagationScore, hostname: str, criticality) -> Dict:
+    return {
+        "asset_id": score.asset_id,
+        "hostname": hostname,
+        "criticality": enum_value(criticality, "medium"),
+        "vuln_count": score.vuln_count,
+        "avg_cvss": score.avg_cvss,
+        "max_exploit_prob": score.max_exploit_prob,
+        "reachable_count": score.reachable_count,
+        "propagation_score": score.propagation_score,
+        "computed_at": score.computed_at.isoformat() if score.computed_at else None,
+    }
+
+
+async def top_scores(db: AsyncSession, limit: int = 50) -> List[Dict]:
+    """Highest-scoring assets, read through the descending score index."""
+    await ensure_scores(db)
+    rows = (await db.execute(
+        select(AssetPropagationScore, Asset.hostname, Asset.criticality)
+        .join(Asset, Asset.id == AssetPropagationScore.asset_id)
+        .where(AssetPropagationScore.propagation_score > 0)
+        .order_by(AssetPropagationScore.propagation_score.desc())
+        .limit(limit)
+    )).all()
+    return [_row(*row) for row in rows]
+
+
+async def asset_score(db: AsyncSession, asset_id: int) -> Optional[Dict]:
+    await ensure_scores(db)
+    row = (await db.execute(
+        select(AssetPropagationScore, Asset.hostname, Asset.criticality)
+        .join(Asset, Asset.id == AssetPropagationScore.asset_id)
+        .where(AssetPropagationScore.asset_id == asset_id)
+    )).first()
+    return _row(*row) if row else None
@@ -0,0 +1,244 @@
+"""
+Precomputed asset reachability as packed bitsets.
+
+An attacker on an asset can move to every asset in its own zone and in the
+zones reachable over CONNECTS_TO edges. Reachability therefore depends only
+on the asset's zone: each zone keeps a member bitset, and each (zone, hops)
+pair a reach bitset (the OR of the member bitsets of the zones within
+``hops``). An asset's reach bitset is the one of its zone, shared rather than
+copied, and a CVE's blast radius is the OR over the zones of its affected
+assets. Asset additions, removals and zone moves flip single bits.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.assets.models import Asset
+from app.graph.builder import ZONE_CONNECTIVITY
+from app.risk.inputs import enum_value
+
+logger = logging.getLogger("vulnguard.graph.reachability")
+
+MAX_HOPS = 3
+REFRESH_INTERVAL_SECONDS = 5
+CAPACITY_GROWTH = 1.5
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.int64)
+
+
+def _bit(slot: int):
+    return slot >> 3, np.uint8(0x80 >> (slot & 7))  # np.packbits bit order
+
+
+class ReachabilityIndex:
+    """Per-zone member and reach bitsets over asset slots."""
+
+    def __init__(self, assets: Iterable[tuple], zones: Optional[List[str]] = None):
+        self.zone_names = list(zones or [])
+        for edge in ZONE_CONNECTIVITY:
+            for name in edge:
+                if name not in self.zone_names:
+                    self.zone_names.append(name)
+        self.zone_index = {z: i for i, z in enumerate(self.zone_names)}
+        self.zone_reach = self._zone_reach()
+
+        assets = list(assets)
+        self.capacity = max(64, int(len(assets) * CAPACITY_GROWTH))
+        self.slot_of: Dict[int, int] = {}
+        self.asset_of = np.full(self.capacity, -1, dtype=np.int64)
+        self.zone_of = np.full(self.capacity, -1, dtype=np.int32)
+        self.free: List[int] = []
+        self.members = np.zeros((len(self.zone_names), self._width()), dtype=np.uint8)
+        self.reach = np.zeros((MAX_HOPS + 1, len(self.zone_names), self._width()), dtype=np.uint8)
+        self.synced_at: Optional[datetime] = None
+        self.checked_at = time.time()
+
+        for asset_id, zone in assets:
+            slot = len(self.slot_of)
+            self.slot_of[asset_id] = slot
+            self.asset_of[slot] = asset_id
+            self.zone_of[slot] = self.zone_index[zone]
+        used = len(self.slot_of)
+        self.free = list(range(self.capacity - 1, used - 1, -1))
+        for z in range(len(self.zone_names)):
+            in_zone = np.zeros(self.capacity, dtype=bool)
+            in_zone[:used] = self.zone_of[:used] == z
+            self.members[z] = np.packbits(in_zone)
+        self._rebuild_reach()
+
+    def _width(self) -> int:
+        return (self.capacity + 7) // 8
+
+    def _zone_reach(self) -> List[List[List[int]]]:
+        """For each hop limit and zone, the zones within that many CONNECTS_TO hops (itself included)."""
+        out = [[] for _ in self.zone_names]
+        for src, dst in ZONE_CONNECTIVITY:
+            out[self.zone_index[src]].append(self.zone_index[dst])
+        table = []
+        for hops in range(MAX_HOPS + 1):
+            per_zone = []
+            for z in range(len(self.zone_names)):
+                seen, frontier = {z}, [z]
+                for _ in range(hops):
+                    frontier = [d for u in frontier for d in out[u] if d not in seen]
+                    seen.update(frontier)
+                per_zone.append(sorted(seen))
+            table.append(per_zone)
+        return table
+
+    def _rebuild_reach(self) -> None:
+        for hops in range(MAX_HOPS + 1):
+            for z, zones in enumerate(self.zone_reach[hops]):
+                self.reach[hops, z] = np.bitwise_or.reduce(self.members[zones], axis=0)
+
+    def _grow(self) -> None:
+        old = self.capacity
+        self.capacity = int(old * CAPACITY_GROWTH) + 64
+        pad = self._width() - self.members.shape[-1]
+        self.members = np.pad(self.members, ((0, 0), (0, pad)))
+        self.reach = np.pad(self.reach, ((0, 0), (0, 0), (0, pad)))
+        self.asset_of = np.concatenate([self.asset_of, np.full(self.capacity - old, -1, dtype=np.int64)])
+        self.zone_of = np.concatenate([self.zone_of, np.full(self.capacity - old, -1, dtype=np.int32)])
+        self.free = list(range(self.capacity - 1, old - 1, -1)) + self.free
+
+    def _flip(self, slot: int, zone: int, on: bool) -> None:
+        byte, mask = _bit(slot)
+        if on:
+            self.members[zone, byte] |= mask
+        else:
+            self.members[zone, byte] &= ~mask
+        for hops in range(MAX_HOPS + 1):
+            for z, zones in enumerate(self.zone_reach[hops]):
+                if zone in zones:
+                    if on:
+                        self.reach[hops, z, byte] |= mask
+                    else:
+                        self.reach[hops, z, byte] &= ~mask
+
+    # ── Incremental updates ───────────────────────────────
+
+    def upsert(self, asset_id: int, zone: str) -> bool:
+        """Add an asset or move it to ``zone``; False when the zone is unknown (needs a rebuild)."""
+        z = self.zone_index.get(zone)
+        if z is None:
+            return False
+        slot = self.slot_of.get(asset_id)
+        if slot is None:
+            if not self.free:
+                self._grow()
+            slot = self.free.pop()
+            self.slot_of[asset_id] = slot
+            self.asset_of[slot] = asset_id
+        elif self.zone_of[slot] == z:
+            return True
+        else:
+            self._flip(slot, int(self.zone_of[slot]), False)
+        self.zone_of[slot] = z
+        self._flip(slot, z, True)
+        return True
+
+    def remove(self, asset_id: int) -> None:
+        slot = self.slot_of.pop(asset_id, None)
+        if slot is None:
+            return
+        self._flip(slot, int(self.zone_of[slot]), False)
+        self.asset_of[slot], self.zone_of[slot] = -1, -1
+        self.free.append(slot)
+
+    # ── Queries ───────────────────────────────────────────
+
+    def asset_reach(self, asset_id: int, hops: int = 2) -> Optional[np.ndarray]:
+        """Packed bitset of the assets reachable from one asset (a shared view; do not modify)."""
+        slot = self.slot_of.get(asset_id)
+        if slot is None:
+            return None
+        return self.reach[min(hops, MAX_HOPS), self.zone_of[slot]]
+
+    def blast_radius(self, asset_ids: Iterable[int], hops: int = 2) -> Dict:
+        """OR of the reach bitsets of the given assets; counts include the assets themselves."""
+        hops = min(hops, MAX_HOPS)
+        direct = np.zeros(self.members.shape[-1], dtype=np.uint8)
+        zones = set()
+        for asset_id in asset_ids:
+            slot = self.slot_of.get(asset_id)
+            if slot is None:
+                continue
+            byte, mask = _bit(slot)
+            direct[byte] |= mask
+            zones.add(int(self.zone_of[slot]))
+        reachable = direct.copy()
+        for z in zones:
+            reachable |= self.reach[hops, z]
+        return {
+            "direct": int(_POPCOUNT[direct].sum()),
+            "reachable": int(_POPCOUNT[reachable].sum()),
+            "bits": reachable,
+        }
+
+    def assets_in(self, bits: np.ndarray) -> np.ndarray:
+        """Asset ids whose bits are set."""
+        slots = np.flatnonzero(np.unpackbits(bits)[: self.capacity])
+        return self.asset_of[slots]
+
+
+def _zone(value) -> str:
+    return enum_value(value, "internal")
+
+
+async def build_index(db: AsyncSession) -> ReachabilityIndex:
+    started = time.perf_counter()
+    rows = (await db.execute(select(Asset.id, Asset.network_zone, Asset.updated_at))).all()
+    assets = [(asset_id, _zone(zone)) for asset_id, zone, _ in rows]
+    index = ReachabilityIndex(assets, zones=sorted({z for _, z in assets}))
+    index.synced_at = max((r[2] for r in rows if r[2]), default=None)
+    logger.info(f"Built reachability bitsets for {len(assets)} assets in {time.perf_counter() - started:.2f}s")
+    return index
+
+
+async def refresh_index(db: AsyncSession, index: ReachabilityIndex) -> ReachabilityIndex:
+    """Apply asset additions, zone moves and deletions since the last refresh.
+
+    Returns a rebuilt index when an asset moved into a zone the index has
+    never seen.
+    """
+    query = select(Asset.id, Asset.network_zone, Asset.updated_at)
+    if index.synced_at is not None:
+        # >= re-applies rows sharing the last timestamp; upserts are idempotent
+        query = query.where(Asset.updated_at >= index.synced_at)
+    for asset_id, zone, updated_at in (await db.execute(query)).all():
+        if not index.upsert(asset_id, _zone(zone)):
+            return await build_index(db)
+        if updated_at and (index.synced_at is None or updated_at > index.synced_at):
+            index.synced_at = updated_at
+
+    count = (await db.execute(select(func.count(Asset.id)))).scalar() or 0
+    if count != len(index.slot_of):
+        live = set((await db.execute(select(Asset.id))).scalars().all())
+        for asset_id in [a for a in index.slot_of if a not in live]:
+            index.remove(asset_id)
+        # Rows inserted without updated_at are picked up here too
+        if len(index.slot_of) != count:
+            return await build_index(db)
+    index.checked_at = time.time()
+    return index
+
+
+_index: Optional[ReachabilityIndex] = None
+_index_lock = asyncio.Lock()
+
+
+async def get_index(db: AsyncSession) -> ReachabilityIndex:
+    """Process-wide index, refreshed incrementally at most every REFRESH_INTERVAL_SECONDS."""
+    global _index
+    async with _index_lock:
+        if _index is None:
+            _index = await build_index(db)
+        elif time.time() - _index.checked_at > REFRESH_INTERVAL_SECONDS:
+            _index = await refresh_index(db, _index)
+        return _index
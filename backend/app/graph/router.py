@@ -1,7 +1,14 @@
-from fastapi import APIRouter, Depends, Query
+import gzip
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db
 from app.auth.dependencies import get_current_user, require_role
 from app.auth.models import User, UserRole
 from app.graph.analysis import AttackPathAnalyzer
+from app.graph import visualization
+from app.metrics import metrics
 from app.graph.tasks import rebuild_graph
 
 router = APIRouter(prefix="/api/graph", tags=["Attack Path Modeling"])
@@ -12,50 +19,129 @@ analyzer = AttackPathAnalyzer()
 @router.get("/path/{source_id}/{target_id}")
 async def get_shortest_path(
     source_id: int, target_id: int,
+    weighted: bool = Query(False, description="Prefer paths through likely-exploited vulnerabilities"),
     current_user: User = Depends(get_current_user),
 ):
     """Find shortest attack path between two assets."""
-    return await analyzer.shortest_path_to_asset(source_id, target_id)
+    return await analyzer.shortest_path_to_asset(source_id, target_id, weighted)
+
+
+@router.get("/paths/{source_id}/{target_id}")
+async def get_attack_paths(
+    source_id: int, target_id: int,
+    k: int = Query(3, ge=1, le=10, description="Number of alternative paths"),
+    current_user: User = Depends(get_current_user),
+):
+    """The k shortest attack paths between two assets."""
+    return await analyzer.attack_paths(source_id, target_id, k)
+
+
+@router.get("/reachable/{asset_id}")
+async def reachable_assets(
+    asset_id: int,
+    hops: int = Query(2, ge=1, le=10),
+    current_user: User = Depends(get_current_user),
+):
+    """Assets reachable from an asset within a number of hops."""
+    return await analyzer.reachable_assets(asset_id, hops)
 
 
 @router.get("/lateral-movement/{asset_id}")
 async def lateral_movement(
     asset_id: int,
+    max_depth: int = Query(5, ge=3, le=10),
     current_user: User = Depends(get_current_user),
 ):
     """Find lateral movement paths from an asset."""
-    return await analyzer.lateral_movement_paths(asset_id)
+    return await analyzer.lateral_movement_paths(asset_id, max_depth)
 
 
 @router.get("/blast-radius/{cve_id}")
 async def blast_radius(
     cve_id: str,
+    hops: int = Query(2, ge=0, le=3, description="Zone-to-zone hops an attacker may take"),
     current_user: User = Depends(get_current_user),
 ):
     """Estimate blast radius of a vulnerability."""
-    return await analyzer.blast_radius(cve_id)
+    return await analyzer.blast_radius(cve_id, hops)
 
 
 @router.get("/risk-propagation")
 async def risk_propagation(
+    limit: int = Query(50, ge=1, le=1000),
     current_user: User = Depends(get_current_user),
 ):
     """Get risk propagation scores across the network."""
-    return await analyzer.risk_propagation()
+    return await analyzer.risk_propagation(limit)
+
+
+@router.get("/risk-propagation/{asset_id}")
+async def asset_risk_propagation(
+    asset_id: int,
+    current_user: User = Depends(get_current_user),
+):
+    """Propagated risk score of one asset."""
+    score = await analyzer.asset_risk_propagation(asset_id)
+    if score is None:
+        raise HTTPException(status_code=404, detail="No propagation score for this asset")
+    return score
 
 
 @router.get("/visualization")
 async def graph_visualization(
+    request: Request,
+    mode: str = Query("top", pattern="^(aggregate|top|neighborhood|full)$"),
+    limit: Optional[int] = Query(None, ge=1, le=2000, description="Assets (top, full page) or nodes (neighborhood)"),
+    vulns_per_asset: int = Query(5, ge=0, le=50),
+    asset_id: Optional[int] = Query(None, description="Center asset for neighborhood mode"),
+    hops: int = Query(2, ge=1, le=4),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous full-mode page"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Graph data for visualization at a level of detail the browser can render.
+
+    Responses carry an ETag; a matching If-None-Match returns 304.
+    """
+    if mode == "neighborhood" and asset_id is None:
+        raise HTTPException(status_code=400, detail="asset_id is required for neighborhood mode")
+    params = {"mode": mode, "limit": limit or visualization.DEFAULT_LIMITS.get(mode)}
+    if mode == "top":
+        params["vulns_per_asset"] = vulns_per_asset
+    elif mode == "neighborhood":
+        params.update(asset_id=asset_id, hops=hops)
+    elif mode == "full":
+        params["cursor"] = cursor
+    params["if_none_match"] = request.headers.get("if-none-match")
+
+    try:
+        etag, body = await visualization.render_view(db, params)
+    except visualization.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Accept-Encoding"}
+    if body is None:
+        return Response(status_code=304, headers=headers)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return Response(body, media_type="application/json", headers={**headers, "Content-Encoding": "gzip"})
+    return Response(gzip.decompress(body), media_type="application/json", headers=headers)
+
+
+@router.get("/metrics")
+async def graph_metrics(
+    format: str = Query("json", enum=["json", "prometheus"]),
     current_user: User = Depends(get_current_user),
 ):
-    """Get full graph data for visualization."""
-    return await analyzer.get_full_graph_data()
+    """Neo4j query latency, errors by type and streamed rows (this process)."""
+    if format == "prometheus":
+        return PlainTextResponse(metrics.render_prometheus("neo4j_"))
+    return metrics.snapshot("neo4j_")
 
 
 @router.post("/rebuild")
 async def trigger_rebuild(
+    full: bool = Query(False, description="Rewrite every node and edge instead of only changes"),
     current_user: User = Depends(require_role(UserRole.ADMIN, UserRole.ANALYST)),
 ):
-    """Trigger graph rebuild."""
-    task = rebuild_graph.delay()
+    """Trigger graph sync."""
+    task = rebuild_graph.delay(full=full)
     return {"status": "queued", "task_id": task.id}
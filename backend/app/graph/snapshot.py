@@ -0,0 +1,178 @@
+"""
+Versioned binary snapshot of the in-process attack graph.
+
+The file holds the arrays ``native.graph_core`` produces (node id arrays,
+CSR offsets, neighbour indices, edge types and weights) and its string
+tables, each section 64-byte aligned behind a small JSON header:
+
+    magic (8 bytes) | format version (u32) | header length (u32) | header | sections
+
+The header records the snapshot generation, creation time, the data
+fingerprint of the database state it was built from, the payload CRC-32 and each section's dtype, length and offset. Loading memory-maps the
+file read-only, so numeric arrays are views onto the page cache shared by
+every API and worker process; only string tables are decoded into Python
+lists. Writers replace the file atomically, so readers that still map the
+previous generation keep a consistent copy until they reload.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+import zlib
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+
+logger = logging.getLogger("vulnguard.graph.snapshot")
+
+MAGIC = b"VGGRAPH\x00"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<8sII")
+ALIGNMENT = 64
+STRING_SEPARATOR = b"\x00"
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), "snapshots")
+
+ARRAY_FIELDS = (
+    "asset_ids", "asset_risk", "internet_facing", "asset_zone", "cvss", "exploit_probability",
+    "pair_asset", "pair_vuln", "indptr", "indices", "weights", "edge_types",
+)
+STRING_FIELDS = ("hostnames", "criticality", "zone_names", "cve_ids")
+
+
+class SnapshotError(Exception):
+    """A snapshot file is missing, truncated, of another format version or fails its checksum."""
+
+
+def snapshot_path() -> str:
+    return settings.GRAPH_SNAPSHOT_PATH or os.path.join(SNAPSHOT_DIR, "attack_graph.snapshot")
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def read_header(path: Optional[str] = None) -> Optional[Dict]:
+    """Header of the snapshot at ``path``, or None when there is no readable snapshot."""
+    path = path or snapshot_path()
+    try:
+        with open(path, "rb") as f:
+            magic, version, length = PREAMBLE.unpack(f.read(PREAMBLE.size))
+            if magic != MAGIC or version != FORMAT_VERSION:
+                return None
+            return json.loads(f.read(length))
+    except (OSError, struct.error, ValueError):
+        return None
+
+
+def write_snapshot(core: Dict, path: Optional[str] = None, fingerprint: Optional[str] = None) -> Dict:
+    """Write ``core`` as the next generation and atomically replace the snapshot file.
+
+    ``fingerprint`` identifies the database state the arrays were built from,
+    so readers can tell whether the snapshot is still current.
+    """
+    started = time.perf_counter()
+    path = path or snapshot_path()
+    previous = read_header(path)
+    generation = (previous["generation"] if previous else 0) + 1
+
+    sections = [(name, np.ascontiguousarray(core[name])) for name in ARRAY_FIELDS]
+    for name in STRING_FIELDS:
+        encoded = STRING_SEPARATOR.join(str(v).encode() for v in core[name])
+        sections.append((name, np.frombuffer(encoded, dtype=np.uint8)))
+
+    layout, offset = {}, 0
+    for name, array in sections:
+        layout[name] = {"dtype": array.dtype.str, "count": int(array.size), "offset": offset}
+        if name in STRING_FIELDS:
+            layout[name]["items"] = len(core[name])
+        offset = _aligned(offset + array.nbytes)
+    payload = bytearray(offset)
+    for name, array in sections:
+        start = layout[name]["offset"]
+        payload[start:start + array.nbytes] = array.tobytes()
+
+    header = {
+        "generation": generation,
+        "created_at": time.time(),
+        "fingerprint": fingerprint,
+        "checksum": zlib.crc32(payload),
+        "payload_length": len(payload),
+        "sections": layout,
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode()
+    # The payload starts aligned so every section is aligned in the mapping too
+    header_bytes += b" " * (_aligned(PREAMBLE.size + len(header_bytes)) - PREAMBLE.size - len(header_bytes))
+
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".attack_graph.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    summary = {
+        "generation": generation,
+        "bytes": PREAMBLE.size + len(header_bytes) + len(payload),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    logger.info(f"Wrote attack graph snapshot {summary}")
+    return summary
+
+
+def load_snapshot(path: Optional[str] = None, verify: bool = True) -> Tuple[Dict, Dict]:
+    """Memory-map a snapshot; returns (header, core) with read-only array views.
+
+    ``verify`` checks the payload CRC-32, which touches every page once.
+    """
+    path = path or snapshot_path()
+    try:
+        with open(path, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Cannot map graph snapshot {path}: {e}") from e
+
+    try:
+        magic, version, length = PREAMBLE.unpack_from(buffer, 0)
+    except struct.error as e:
+        raise SnapshotError(f"Truncated graph snapshot {path}") from e
+    if magic != MAGIC:
+        raise SnapshotError(f"{path} is not a graph snapshot")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"Graph snapshot {path} has format version {version}, expected {FORMAT_VERSION}")
+    base = PREAMBLE.size + length
+    try:
+        header = json.loads(buffer[PREAMBLE.size:base])
+    except ValueError as e:
+        raise SnapshotError(f"Corrupt graph snapshot header in {path}") from e
+    if len(buffer) != base + header["payload_length"]:
+        raise SnapshotError(f"Truncated graph snapshot {path}")
+    if verify and zlib.crc32(memoryview(buffer)[base:]) != header["checksum"]:
+        raise SnapshotError(f"Graph snapshot {path} fails its checksum")
+
+    core = {}
+    for name, section in header["sections"].items():
+        dtype = np.dtype(section["dtype"])
+        if not section["count"]:
+            array = np.zeros(0, dtype=dtype)
+        else:
+            array = np.frombuffer(buffer, dtype=dtype, count=section["count"], offset=base + section["offset"])
+        if name in STRING_FIELDS:
+            core[name] = array.tobytes().decode().split(STRING_SEPARATOR.decode()) if section["items"] else []
+        else:
+            core[name] = array
+    return header, core
@@ -0,0 +1,235 @@
+"""
+Diff-based attack graph sync.
+
+Each node and edge written to Neo4j is content-hashed and the hash kept in
+``graph_sync_state``. A sync hashes the current assets, CVEs and matches,
+writes only rows whose hash is new or different, and deletes only keys that
+disappeared, so the graph stays populated throughout and the work scales
+with the change volume rather than the fleet size.
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import is_sqlite
+from app.assets.models import Asset
+from app.ingestion.models import CVE
+from app.matching.models import VulnerabilityMatch
+from app.graph.builder import GraphBuilder, ZONE_CONNECTIVITY
+from app.graph.models import GraphSyncState
+from app.graph.neo4j_client import neo4j_client
+from app.risk.inputs import enum_value
+
+logger = logging.getLogger("vulnguard.graph.sync")
+
+RECORD_SLICE_SIZE = 5000
+STATE_WRITE_CHUNK_SIZE = 5000
+GRAPH_KEYS_TIMEOUT = 600.0  # one-off full key scan when no sync state exists
+
+ENTITY_ASSET = "asset"
+ENTITY_VULNERABILITY = "vulnerability"
+ENTITY_AFFECTED_BY = "affected_by"
+
+
+# ── Payloads (the exact properties the builder writes) ────
+
+def asset_payload(rows) -> pd.DataFrame:
+    df = pd.DataFrame(
+        [tuple(r) for r in rows],
+        columns=["id", "hostname", "ip_address", "os_platform", "criticality", "network_zone",
+                 "is_internet_facing", "risk_score", "business_unit"],
+    )
+    df["criticality"] = df["criticality"].map(lambda v: enum_value(v, "medium"))
+    df["network_zone"] = df["network_zone"].map(lambda v: enum_value(v, "internal"))
+    df["business_unit"] = df["business_unit"].map(lambda v: enum_value(v, "unassigned"))
+    df["risk_score"] = df["risk_score"].fillna(0.0)
+    df["key"] = df["id"].astype(str)
+    return df
+
+
+def vulnerability_payload(rows) -> pd.DataFrame:
+    df = pd.DataFrame(
+        [tuple(r) for r in rows],
+        columns=["cve_id", "cvss_score", "epss_score", "is_kev", "exploit_probability",
+                 "attack_vector", "has_exploit", "severity"],
+    )
+    for column in ("cvss_score", "epss_score", "exploit_probability"):
+        df[column] = df[column].fillna(0.0)
+    df["severity"] = df["severity"].map(lambda v: enum_value(v, "MEDIUM"))
+    df["key"] = df["cve_id"]
+    return df
+
+
+def affected_by_payload(rows) -> pd.DataFrame:
+    df = pd.DataFrame(
+        [tuple(r) for r in rows],
+        columns=["asset_id", "cve_id", "confidence", "software_name"],
+    )
+    df["software_name"] = df["software_name"].map(lambda v: enum_value(v, ""))
+    df["key"] = df["asset_id"].astype(str) + "|" + df["cve_id"]
+    # One AFFECTED_BY edge per pair; the builder's MERGE keeps the last match's properties
+    return df.drop_duplicates("key", keep="last")
+
+
+ASSET_COLUMNS = (
+    Asset.id, Asset.hostname, Asset.ip_address, Asset.os_platform, Asset.criticality,
+    Asset.network_zone, Asset.is_internet_facing, Asset.risk_score, Asset.business_unit,
+)
+VULNERABILITY_COLUMNS = (
+    CVE.cve_id, CVE.cvss_v3_score, CVE.epss_score, CVE.is_kev, CVE.predicted_exploit_probability,
+    CVE.attack_vector, CVE.has_public_exploit, CVE.cvss_v3_severity,
+)
+AFFECTED_BY_COLUMNS = (
+    VulnerabilityMatch.asset_id, VulnerabilityMatch.cve_id,
+    VulnerabilityMatch.match_confidence, VulnerabilityMatch.software_name,
+)
+
+
+def content_hashes(df: pd.DataFrame) -> pd.Series:
+    """Signed 64-bit hash of every payload column, indexed by entity key."""
+    if df.empty:
+        return pd.Series(dtype=np.int64)
+    values = pd.util.hash_pandas_object(df.drop(columns="key"), index=False).to_numpy()
+    return pd.Series(values.view(np.int64), index=df["key"].to_numpy())
+
+
+def records(df: pd.DataFrame) -> List[Dict]:
+    return df.drop(columns="key").to_dict("records")
+
+
+def iter_records(df: pd.DataFrame, size: int = RECORD_SLICE_SIZE) -> Iterator[Dict]:
+    """Payload rows converted slice by slice, so only the writer's chunks are materialised."""
+    for start in range(0, len(df), size):
+        yield from records(df.iloc[start:start + size])
+
+
+def chunks(rows: list, size: int):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+# ── State ─────────────────────────────────────────────────
+
+async def load_state(db: AsyncSession, entity_type: str) -> pd.Series:
+    rows = (await db.execute(
+        select(GraphSyncState.entity_key, GraphSyncState.content_hash)
+        .where(GraphSyncState.entity_type == entity_type)
+    )).all()
+    if not rows:
+        return pd.Series(dtype=np.int64)
+    keys, hashes = zip(*rows)
+    return pd.Series(np.array(hashes, dtype=np.int64), index=list(keys))
+
+
+async def graph_keys(entity_type: str) -> pd.Series:
+    """Keys already in Neo4j, as a hash-less baseline when no sync state exists yet.
+
+    The first diff sync after a full build then rewrites every row once and
+    removes graph entities that no longer exist in the database.
+    """
+    if entity_type == ENTITY_ASSET:
+        query = "MATCH (a:Asset) RETURN toString(a.asset_id) AS key"
+    elif entity_type == ENTITY_VULNERABILITY:
+        query = "MATCH (v:Vulnerability) RETURN v.cve_id AS key"
+    else:
+        query = (
+            "MATCH (a:Asset)-[:AFFECTED_BY]->(v:Vulnerability) "
+            "RETURN toString(a.asset_id) + '|' + v.cve_id AS key"
+        )
+    keys = [r["key"] async for r in neo4j_client.stream(query, timeout=GRAPH_KEYS_TIMEOUT)]
+    return pd.Series(0, index=keys, dtype=np.int64)
+
+
+async def save_state(db: AsyncSession, entity_type: str, changed: pd.Series, removed: List[str]) -> None:
+    now = datetime.utcnow()
+    values = [
+        {"entity_type": entity_type, "entity_key": key, "content_hash": int(h), "synced_at": now}
+        for key, h in changed.items()
+    ]
+    for batch in chunks(values, STATE_WRITE_CHUNK_SIZE):
+        stmt = (sqlite.insert if is_sqlite else postgresql.insert)(GraphSyncState)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["entity_type", "entity_key"],
+            set_={"content_hash": stmt.excluded.content_hash, "synced_at": stmt.excluded.synced_at},
+        )
+        await db.execute(stmt, batch)
+    for batch in chunks(removed, STATE_WRITE_CHUNK_SIZE):
+        await db.execute(
+            delete(GraphSyncState)
+            .where(GraphSyncState.entity_type == entity_type, GraphSyncState.entity_key.in_(batch))
+        )
+
+
+async def clear_state(db: AsyncSession) -> None:
+    await db.execute(delete(GraphSyncState))
+
+
+def diff(current: pd.Series, stored: pd.Series):
+    """(hashes to write, keys to delete) between current and stored content hashes."""
+    previous = stored.reindex(current.index)
+    changed = current[previous.isna() | (previous != current)]
+    removed = stored.index.difference(current.index).tolist()
+    return changed, removed
+
+
+# ── Sync ──────────────────────────────────────────────────
+
+async def sync_graph(db: AsyncSession) -> Dict:
+    """Bring Neo4j in line with the database by applying only the differences.
+
+    Upserts run before deletes and nodes before edges, so readers see the
+    old or new version of each entity but never an empty graph. State is
+    saved in the caller's transaction only after every write succeeded.
+    """
+    started = time.perf_counter()
+    builder = GraphBuilder()
+
+    assets = asset_payload((await db.execute(select(*ASSET_COLUMNS))).all())
+    vulns = vulnerability_payload((await db.execute(select(*VULNERABILITY_COLUMNS))).all())
+    edges = affected_by_payload((await db.execute(
+        select(*AFFECTED_BY_COLUMNS).order_by(VulnerabilityMatch.id)
+    )).all())
+
+    plan = {}
+    for entity_type, df in ((ENTITY_ASSET, assets), (ENTITY_VULNERABILITY, vulns), (ENTITY_AFFECTED_BY, edges)):
+        stored = await load_state(db, entity_type)
+        if stored.empty:
+            stored = await graph_keys(entity_type)
+        current = content_hashes(df)
+        changed, removed = diff(current, stored)
+        plan[entity_type] = (df[df["key"].isin(changed.index)], changed, removed)
+
+    await neo4j_client.ensure_indexes()
+    changed_assets = plan[ENTITY_ASSET][0]
+    zones = sorted(set(changed_assets["network_zone"]) | {z for edge in ZONE_CONNECTIVITY for z in edge})
+    writes = [
+        await builder.build_zone_nodes(zones),
+        await builder.build_privilege_nodes(),
+        *await builder.build_static_edges(),
+        await builder.build_asset_nodes(iter_records(changed_assets)),
+        await builder.build_in_zone(iter_records(changed_assets)),
+        await builder.build_vulnerability_nodes(iter_records(plan[ENTITY_VULNERABILITY][0])),
+        await builder.build_affected_by(iter_records(plan[ENTITY_AFFECTED_BY][0])),
+        await builder.delete_affected_by(
+            {"asset_id": int(asset_id), "cve_id": cve_id}
+            for asset_id, cve_id in (key.split("|", 1) for key in plan[ENTITY_AFFECTED_BY][2])
+        ),
+        await builder.delete_assets(int(k) for k in plan[ENTITY_ASSET][2]),
+        await builder.delete_vulnerabilities(plan[ENTITY_VULNERABILITY][2]),
+    ]
+
+    summary = {}
+    for entity_type, (_, changed, removed) in plan.items():
+        await save_state(db, entity_type, changed, removed)
+        summary[entity_type] = {"written": len(changed), "deleted": len(removed)}
+    summary["writes"] = [w for w in writes if w["rows"]]
+    summary["seconds"] = round(time.perf_counter() - started, 2)
+    logger.info(f"Graph sync applied {summary}")
+    return summary
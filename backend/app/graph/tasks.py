@@ -2,10 +2,17 @@ import logging
 from sqlalchemy import select
 from app.celery_app import celery
 from app.database import async_session
-from app.assets.models import Asset
 from app.ingestion.models import CVE
 from app.matching.models import VulnerabilityMatch
 from app.graph.builder import GraphBuilder
+from app.graph.models import GraphSyncState
+from app.graph.sync import (
+    ENTITY_ASSET, ENTITY_VULNERABILITY, ENTITY_AFFECTED_BY, VULNERABILITY_COLUMNS, AFFECTED_BY_COLUMNS,
+    sync_graph, clear_state, save_state, content_hashes, records,
+    vulnerability_payload, affected_by_payload,
+)
+from app.graph import native, propagation, path_cache
+from app.ingestion.changelog import consume_changes
 import asyncio
 
 logger = logging.getLogger("vulnguard.graph.tasks")
@@ -20,55 +27,109 @@ def run_async(coro):
 
 
 @celery.task(name="app.graph.tasks.rebuild_graph", bind=True, max_retries=2)
-def rebuild_graph(self):
-    """Rebuild the full attack graph."""
+def rebuild_graph(self, full: bool = False):
+    """Sync the attack graph with the database, writing only what changed.
+
+    ``full`` discards the stored content hashes so every node and edge is
+    rewritten once and entities missing from the database are removed.
+    """
     try:
-        return run_async(_rebuild_graph())
+        return run_async(_rebuild_graph(full))
     except Exception as exc:
         logger.error(f"Graph rebuild failed: {exc}")
         self.retry(countdown=120, exc=exc)
 
 
-async def _rebuild_graph():
+async def _rebuild_graph(full: bool = False):
     async with async_session() as db:
-        # Get assets
-        result = await db.execute(select(Asset))
-        assets = [
-            {
-                "id": a.id, "hostname": a.hostname, "ip_address": a.ip_address,
-                "os_platform": a.os_platform, 
-                "criticality": (a.criticality.value if hasattr(a.criticality, 'value') else a.criticality) if a.criticality else "medium",
-                "network_zone": (a.network_zone.value if hasattr(a.network_zone, 'value') else a.network_zone) if a.network_zone else "internal",
-                "is_internet_facing": a.is_internet_facing, "risk_score": a.risk_score or 0,
-                "business_unit": a.business_unit or "unassigned",
-            }
-            for a in result.scalars().all()
-        ]
-
-        # Get CVEs
-        result = await db.execute(select(CVE))
-        vulns = [
-            {
-                "cve_id": c.cve_id, "cvss_score": c.cvss_v3_score or 0,
-                "epss_score": c.epss_score or 0, "is_kev": c.is_kev,
-                "exploit_probability": c.predicted_exploit_probability or 0,
-                "attack_vector": c.attack_vector, "has_exploit": c.has_public_exploit,
-                "severity": c.cvss_v3_severity or "MEDIUM",
-            }
-            for c in result.scalars().all()
-        ]
-
-        # Get matches
-        result = await db.execute(select(VulnerabilityMatch))
-        matches = [
-            {
-                "asset_id": m.asset_id, "cve_id": m.cve_id,
-                "confidence": m.match_confidence, "software_name": m.software_name or "",
-            }
-            for m in result.scalars().all()
-        ]
+        if full:
+            await clear_state(db)
+        try:
+            summary = await sync_graph(db)
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            # The in-process graph serves reads while Neo4j is down, so it is published regardless
+            native.publish_snapshot(await native.get_graph(db, refresh=True))
+            raise
+        summary["snapshot"] = native.publish_snapshot(await native.get_graph(db, refresh=True))
+    return summary
 
-    builder = GraphBuilder()
-    await builder.build_full_graph(assets, vulns, matches)
 
-    return {"assets": len(assets), "vulnerabilities": len(vulns), "matches": len(matches)}
+@celery.task(name="app.graph.tasks.compute_risk_propagation", bind=True, max_retries=2)
+def compute_risk_propagation(self):
+    """Recompute and store propagated risk scores for every asset."""
+    try:
+        return run_async(_compute_risk_propagation())
+    except Exception as exc:
+        logger.error(f"Risk propagation failed: {exc}")
+        self.retry(countdown=120, exc=exc)
+
+
+async def _compute_risk_propagation():
+    async with async_session() as db:
+        summary = await propagation.recompute(db)
+        await db.commit()
+    return summary
+
+
+@celery.task(name="app.graph.tasks.refresh_attack_path_cache", bind=True, max_retries=2)
+def refresh_attack_path_cache(self, force: bool = False):
+    """Recompute cached attack paths to critical assets if the graph changed."""
+    try:
+        return run_async(_refresh_attack_path_cache(force))
+    except Exception as exc:
+        logger.error(f"Attack path cache refresh failed: {exc}")
+        self.retry(countdown=120, exc=exc)
+
+
+async def _refresh_attack_path_cache(force: bool = False):
+    async with async_session() as db:
+        summary = await path_cache.refresh(db, force)
+        await db.commit()
+    return summary
+
+
+@celery.task(name="app.graph.tasks.sync_changed_vulnerabilities", bind=True, max_retries=2)
+def sync_changed_vulnerabilities(self):
+    """Refresh Vulnerability nodes and their AFFECTED_BY edges for CVEs in the change log."""
+    try:
+        return run_async(_sync_changed_vulnerabilities())
+    except Exception as exc:
+        logger.error(f"Incremental graph sync failed: {exc}")
+        self.retry(countdown=120, exc=exc)
+
+
+async def _sync_changed_vulnerabilities():
+    summary = await consume_changes("graph", _sync_cve_changes)
+    if summary["handled"]:
+        async with async_session() as db:
+            summary["snapshot"] = native.publish_snapshot(await native.get_graph(db, refresh=True))
+    return summary
+
+
+async def _sync_cve_changes(db, changes: dict) -> int:
+    cve_ids = list(changes)
+    vulns = vulnerability_payload((await db.execute(
+        select(*VULNERABILITY_COLUMNS).where(CVE.cve_id.in_(cve_ids))
+    )).all())
+    edges = affected_by_payload((await db.execute(
+        select(*AFFECTED_BY_COLUMNS).where(VulnerabilityMatch.cve_id.in_(cve_ids)).order_by(VulnerabilityMatch.id)
+    )).all())
+
+    # An asset created since the last diff sync has no node yet, so MERGE of its
+    # edge would match nothing; leave those edges unrecorded for sync_graph to write
+    asset_keys = edges["asset_id"].astype(str).unique().tolist()
+    synced_assets = set((await db.execute(
+        select(GraphSyncState.entity_key)
+        .where(GraphSyncState.entity_type == ENTITY_ASSET, GraphSyncState.entity_key.in_(asset_keys))
+    )).scalars().all()) if asset_keys else set()
+    edges = edges[edges["asset_id"].astype(str).isin(synced_assets)]
+
+    builder = GraphBuilder()
+    await builder.build_vulnerability_nodes(records(vulns))
+    await builder.build_affected_by(records(edges))
+    # Committed with the consumer offset; removed edges are left to the next diff sync
+    await save_state(db, ENTITY_VULNERABILITY, content_hashes(vulns), [])
+    await save_state(db, ENTITY_AFFECTED_BY, content_hashes(edges), [])
+    return len(vulns)
@@ -0,0 +1,342 @@
+"""
+Graph views for the frontend, at a level of detail it can render.
+
+Modes:
+  * ``aggregate``     one node per zone and per (zone, business unit) group
+  * ``top``           the N riskiest assets with their zones and worst findings
+  * ``neighborhood``  nodes within k hops of one asset (in-process graph)
+  * ``full``          every asset, keyset-paginated by asset id
+
+Payloads are serialised once, gzip-compressed and cached under an ETag
+derived from a cheap fingerprint of assets, matches and CVEs plus the view
+parameters, so an unchanged graph is answered with 304 or the cached bytes.
+"""
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func, or_, case
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.assets.models import Asset
+from app.ingestion.models import CVE
+from app.matching.models import VulnerabilityMatch
+from app.graph import native
+from app.graph.builder import ZONE_CONNECTIVITY, PRIVILEGE_LEVELS
+from app.risk.inputs import enum_value
+
+VIEW_MODES = ("aggregate", "top", "neighborhood", "full")
+DEFAULT_LIMITS = {"top": 50, "neighborhood": 300, "full": 500}  # assets, nodes, assets per page
+PAYLOAD_CACHE_SIZE = 32
+FINGERPRINT_TTL_SECONDS = 5
+GZIP_LEVEL = 6
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _cvss_level(cvss: Optional[float]) -> str:
+    cvss = cvss or 0.0
+    if cvss >= 9.0:
+        return "critical"
+    if cvss >= 7.0:
+        return "high"
+    if cvss >= 4.0:
+        return "medium"
+    return "low"
+
+
+def _zone_id(zone: str) -> str:
+    return f"zone_{zone}"
+
+
+def _asset_node(asset_id, hostname, criticality, risk_score) -> Dict:
+    return {
+        "id": asset_id,
+        "type": "Asset",
+        "properties": {
+            "hostname": hostname,
+            "criticality": enum_value(criticality, "medium"),
+            "risk_score": risk_score or 0.0,
+        },
+    }
+
+
+def _zone_node(zone: str, **properties) -> Dict:
+    return {"id": _zone_id(zone), "type": "NetworkZone", "properties": {"name": zone, **properties}}
+
+
+def _vuln_node(cve_id: str, cvss: Optional[float]) -> Dict:
+    return {
+        "id": f"vuln_{cve_id}",
+        "type": "Vulnerability",
+        "properties": {"cve_id": cve_id, "cvss": cvss or 0.0, "level": _cvss_level(cvss)},
+    }
+
+
+def _zone_edges(zones) -> List[Dict]:
+    return [
+        {"source": _zone_id(src), "target": _zone_id(dst), "relationship": "CONNECTS_TO"}
+        for src, dst in ZONE_CONNECTIVITY
+        if src in zones and dst in zones
+    ]
+
+
+_open_match = or_(VulnerabilityMatch.status == "open", VulnerabilityMatch.status.is_(None))
+
+
+# ── Cursor / fingerprint / payload cache ──────────────────
+
+def encode_cursor(after_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"after": after_id}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(json.loads(base64.urlsafe_b64decode(padded))["after"])
+    except Exception as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+_fingerprint: Tuple[Optional[str], float] = (None, 0.0)
+
+
+async def graph_fingerprint(db: AsyncSession) -> str:
+    """Hash of asset, match and CVE aggregates; reused for FINGERPRINT_TTL_SECONDS."""
+    global _fingerprint
+    value, at = _fingerprint
+    if value is None or time.time() - at > FINGERPRINT_TTL_SECONDS:
+        assets = (await db.execute(select(func.count(Asset.id), func.max(Asset.updated_at)))).one()
+        matches = (await db.execute(select(
+            func.count(VulnerabilityMatch.id), func.max(VulnerabilityMatch.id),
+            func.max(VulnerabilityMatch.resolved_at),
+        ))).one()
+        cves = (await db.execute(select(func.max(CVE.updated_at)))).one()
+        value = hashlib.sha1(repr((tuple(assets), tuple(matches), tuple(cves))).encode()).hexdigest()
+        _fingerprint = (value, time.time())
+    return value
+
+
+class PayloadCache:
+    """LRU of gzip-compressed view payloads keyed by ETag."""
+
+    def __init__(self, max_entries: int = PAYLOAD_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(etag)
+            if body is not None:
+                self._entries.move_to_end(etag)
+            return body
+
+    def put(self, etag: str, body: bytes) -> None:
+        with self._lock:
+            self._entries[etag] = body
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+payload_cache = PayloadCache()
+
+
+def view_etag(fingerprint: str, params: Dict) -> str:
+    key = json.dumps({"fingerprint": fingerprint, **params}, sort_keys=True)
+    return '"' + hashlib.sha1(key.encode()).hexdigest() + '"'
+
+
+def compress(payload: Dict) -> bytes:
+    return gzip.compress(json.dumps(payload, separators=(",", ":")).encode(), compresslevel=GZIP_LEVEL)
+
+
+# ── Views ─────────────────────────────────────────────────
+
+async def aggregate_view(db: AsyncSession) -> Dict:
+    zone = func.coalesce(Asset.network_zone, "internal")
+    unit = func.coalesce(Asset.business_unit, "unassigned")
+    findings = (
+        select(VulnerabilityMatch.asset_id, func.count(VulnerabilityMatch.id).label("findings"))
+        .where(_open_match)
+        .group_by(VulnerabilityMatch.asset_id)
+        .subquery()
+    )
+    rows = (await db.execute(
+        select(
+            zone.label("zone"), unit.label("business_unit"),
+            func.count(Asset.id), func.avg(Asset.risk_score), func.max(Asset.risk_score),
+            func.sum(case((Asset.criticality == "critical", 1), else_=0)),
+            func.coalesce(func.sum(findings.c.findings), 0),
+        )
+        .outerjoin(findings, findings.c.asset_id == Asset.id)
+        .group_by(zone, unit)
+        .order_by(zone, unit)
+    )).all()
+
+    zone_assets: Dict[str, int] = {}
+    nodes, edges = [], []
+    for zone_name, business_unit, assets, avg_risk, max_risk, critical, finding_count in rows:
+        group_id = f"group_{zone_name}_{business_unit}"
+        nodes.append({
+            "id": group_id,
+            "type": "AssetGroup",
+            "properties": {
+                "zone": zone_name, "business_unit": business_unit, "assets": assets,
+                "critical_assets": int(critical or 0), "findings": int(finding_count),
+                "avg_risk": round(avg_risk or 0.0, 2), "max_risk": round(max_risk or 0.0, 2),
+            },
+        })
+        edges.append({"source": group_id, "target": _zone_id(zone_name), "relationship": "IN_ZONE", "weight": assets})
+        zone_assets[zone_name] = zone_assets.get(zone_name, 0) + assets
+
+    nodes.extend(_zone_node(z, assets=n) for z, n in zone_assets.items())
+    edges.extend(_zone_edges(zone_assets))
+    return {"mode": "aggregate", "nodes": nodes, "edges": edges}
+
+
+async def top_view(db: AsyncSession, limit: int, vulns_per_asset: int) -> Dict:
+    assets = (await db.execute(
+        select(Asset.id, Asset.hostname, Asset.criticality, Asset.network_zone, Asset.risk_score)
+        .order_by(Asset.risk_score.desc().nulls_last(), Asset.id)
+        .limit(limit)
+    )).all()
+    ranked = (
+        select(
+            VulnerabilityMatch.asset_id, VulnerabilityMatch.cve_id, VulnerabilityMatch.cvss_score,
+            func.row_number().over(
+                partition_by=VulnerabilityMatch.asset_id,
+                order_by=(VulnerabilityMatch.cvss_score.desc(), VulnerabilityMatch.id),
+            ).label("rank"),
+        )
+        .where(_open_match, VulnerabilityMatch.asset_id.in_([a.id for a in assets]))
+        .subquery()
+    )
+    findings = (await db.execute(
+        select(ranked.c.asset_id, ranked.c.cve_id, ranked.c.cvss_score).where(ranked.c.rank <= vulns_per_asset)
+    )).all()
+    payload = _asset_subgraph(assets, findings)
+    return {"mode": "top", **payload}
+
+
+async def full_view(db: AsyncSession, page_size: int, cursor: Optional[str]) -> Dict:
+    after = decode_cursor(cursor)
+    assets = (await db.execute(
+        select(Asset.id, Asset.hostname, Asset.criticality, Asset.network_zone, Asset.risk_score)
+        .where(Asset.id > after)
+        .order_by(Asset.id)
+        .limit(page_size)
+    )).all()
+    findings = []
+    if assets:
+        findings = (await db.execute(
+            select(VulnerabilityMatch.asset_id, VulnerabilityMatch.cve_id, VulnerabilityMatch.cvss_score)
+            .where(_open_match, VulnerabilityMatch.asset_id.in_([a.id for a in assets]))
+            .order_by(VulnerabilityMatch.id)
+        )).all()
+    payload = _asset_subgraph(assets, findings)
+    next_cursor = encode_cursor(assets[-1].id) if len(assets) == page_size else None
+    return {"mode": "full", **payload, "next_cursor": next_cursor}
+
+
+def _asset_subgraph(assets, findings) -> Dict:
+    nodes, edges = [], []
+    zones = {}
+    for asset_id, hostname, criticality, network_zone, risk_score in assets:
+        nodes.append(_asset_node(asset_id, hostname, criticality, risk_score))
+        zone = enum_value(network_zone, "internal")
+        zones.setdefault(zone, _zone_node(zone))
+        edges.append({"source": asset_id, "target": _zone_id(zone), "relationship": "IN_ZONE"})
+
+    vulns = {}
+    for asset_id, cve_id, cvss in findings:
+        vulns.setdefault(cve_id, _vuln_node(cve_id, cvss))
+        edges.append({"source": asset_id, "target": f"vuln_{cve_id}", "relationship": "AFFECTED_BY"})
+
+    nodes.extend(zones.values())
+    nodes.extend(vulns.values())
+    edges.extend(_zone_edges(zones))
+    return {"nodes": nodes, "edges": edges}
+
+
+_graph_fingerprint: Optional[str] = None
+_graph_lock = asyncio.Lock()
+
+
+async def neighborhood_view(db: AsyncSession, fingerprint: str, asset_id: int, hops: int, limit: int) -> Dict:
+    global _graph_fingerprint
+    async with _graph_lock:
+        # Reload the in-process graph when the data changed since it was loaded
+        graph = await native.get_graph(db, refresh=_graph_fingerprint not in (None, fingerprint))
+        _graph_fingerprint = fingerprint
+
+    node_ids, edges = graph.neighborhood(asset_id, hops, limit)
+
+    def vis_id(node: int):
+        kind = graph.node_kind[node]
+        if kind == native.KIND_ASSET:
+            return int(graph.asset_ids[node])
+        if kind == native.KIND_ZONE:
+            return _zone_id(graph.zone_names[node - graph._zone_base])
+        if kind == native.KIND_VULNERABILITY:
+            return f"vuln_{graph.cve_ids[node - graph._vuln_base]}"
+        return f"priv_{PRIVILEGE_LEVELS[node - graph._priv_base]}"
+
+    nodes = []
+    for node in node_ids.tolist():
+        kind = graph.node_kind[node]
+        if kind == native.KIND_ASSET:
+            nodes.append(_asset_node(
+                int(graph.asset_ids[node]), graph.hostnames[node],
+                graph.criticality[node], float(graph.asset_risk[node]),
+            ))
+        elif kind == native.KIND_ZONE:
+            nodes.append(_zone_node(graph.zone_names[node - graph._zone_base]))
+        elif kind == native.KIND_VULNERABILITY:
+            i = node - graph._vuln_base
+            nodes.append(_vuln_node(graph.cve_ids[i], float(graph.cvss[i])))
+        else:
+            level = PRIVILEGE_LEVELS[node - graph._priv_base]
+            nodes.append({"id": f"priv_{level}", "type": "Privilege", "properties": {"level": level}})
+
+    return {
+        "mode": "neighborhood",
+        "center": asset_id,
+        "hops": hops,
+        "nodes": nodes,
+        "edges": [{"source": vis_id(u), "target": vis_id(v), "relationship": rel} for u, v, rel in edges],
+    }
+
+
+async def render_view(db: AsyncSession, params: Dict) -> Tuple[str, Optional[bytes]]:
+    """(ETag, gzip body) for a view; the body is None when ``params["if_none_match"]`` matches."""
+    fingerprint = await graph_fingerprint(db)
+    view = {k: v for k, v in params.items() if k != "if_none_match"}
+    etag = view_etag(fingerprint, view)
+    if params.get("if_none_match") == etag:
+        return etag, None
+    body = payload_cache.get(etag)
+    if body is None:
+        mode = view["mode"]
+        if mode == "aggregate":
+            payload = await aggregate_view(db)
+        elif mode == "top":
+            payload = await top_view(db, view["limit"], view["vulns_per_asset"])
+        elif mode == "neighborhood":
+            payload = await neighborhood_view(db, fingerprint, view["asset_id"], view["hops"], view["limit"])
+        else:
+            payload = await full_view(db, view["limit"], view.get("cursor"))
+        body = compress(payload)
+        payload_cache.put(etag, body)
+    return etag, body
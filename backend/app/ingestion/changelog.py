@@ -0,0 +1,122 @@
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+from sqlalchemy import select, insert, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import async_session
+from app.ingestion.models import ChangeEvent, ChangeConsumerOffset
+
+logger = logging.getLogger("vulnguard.ingestion.changelog")
+
+CHANGE_NEW = "new"
+CHANGE_CVSS = "cvss"
+CHANGE_EPSS = "epss"
+CHANGE_KEV = "kev"
+CHANGE_EXPLOIT = "exploit"
+
+ALL_CHANGE_TYPES = {CHANGE_NEW, CHANGE_CVSS, CHANGE_EPSS, CHANGE_KEV, CHANGE_EXPLOIT}
+
+# Every consumer of the change log; events are kept until all of them have read them
+CHANGE_CONSUMERS = {"matching", "graph", "risk", "ml"}
+
+ChangeSet = Dict[str, Set[str]]  # cve_id -> changed fields
+
+# Session flag: CVE writes in this session reach risk scoring through the log only
+CHANGES_LOGGED = "cve_changes_logged"
+
+
+async def record_changes(db: AsyncSession, changes: Iterable[Tuple[str, str]], source: str) -> int:
+    """Append (cve_id, change_type) events in the caller's transaction.
+
+    Call it before the session flushes the CVE writes it describes: it flags
+    the session so app.risk.dependencies leaves those writes to the ``risk``
+    consumer instead of also queueing them as dirty.
+    """
+    db.sync_session.info[CHANGES_LOGGED] = True
+    now = datetime.utcnow()
+    rows = [
+        {"cve_id": cve_id, "change_type": change_type, "source": source, "created_at": now}
+        for cve_id, change_type in changes
+    ]
+    if rows:
+        await db.execute(insert(ChangeEvent), rows)
+    return len(rows)
+
+
+async def _get_offset(db: AsyncSession, consumer: str) -> ChangeConsumerOffset:
+    result = await db.execute(
+        select(ChangeConsumerOffset).where(ChangeConsumerOffset.consumer == consumer)
+    )
+    offset = result.scalar_one_or_none()
+    if not offset:
+        offset = ChangeConsumerOffset(consumer=consumer, last_event_id=0)
+        db.add(offset)
+        await db.flush()
+    return offset
+
+
+async def consume_changes(
+    consumer: str,
+    handler: Callable[[AsyncSession, ChangeSet], Awaitable[Optional[int]]],
+    change_types: Optional[Set[str]] = None,
+    batch_size: int = 5000,
+) -> Dict:
+    """Feed unprocessed events to ``handler`` in batches, collapsed per CVE.
+
+    The handler's writes and the consumer offset are committed together, so a
+    crash replays at most the batch in flight.
+    """
+    if consumer not in CHANGE_CONSUMERS:
+        raise ValueError(f"Unregistered change log consumer: {consumer}")
+    events, batches, handled = 0, 0, 0
+
+    while True:
+        async with async_session() as db:
+            offset = await _get_offset(db, consumer)
+            query = (
+                select(ChangeEvent.id, ChangeEvent.cve_id, ChangeEvent.change_type)
+                .where(ChangeEvent.id > offset.last_event_id)
+                .order_by(ChangeEvent.id)
+                .limit(batch_size)
+            )
+            rows = (await db.execute(query)).fetchall()
+            if not rows:
+                await db.commit()
+                break
+
+            changes: ChangeSet = defaultdict(set)
+            for _, cve_id, change_type in rows:
+                if change_types is None or change_type in change_types:
+                    changes[cve_id].add(change_type)
+
+            if changes:
+                handled += (await handler(db, dict(changes))) or 0
+            offset.last_event_id = rows[-1][0]
+            await db.commit()
+
+        events += len(rows)
+        batches += 1
+        if len(rows) < batch_size:
+            break
+
+    if events:
+        logger.info(f"Consumer '{consumer}' processed {events} change events in {batches} batches")
+    return {"consumer": consumer, "events": events, "handled": handled}
+
+
+async def prune_change_log(db: AsyncSession) -> int:
+    """Delete events every registered consumer has already processed.
+
+    A consumer that has never run has no offset row yet and counts as
+    offset 0, so nothing is pruned until it has caught up.
+    """
+    offsets = dict((await db.execute(
+        select(ChangeConsumerOffset.consumer, ChangeConsumerOffset.last_event_id)
+        .where(ChangeConsumerOffset.consumer.in_(CHANGE_CONSUMERS))
+    )).all())
+    low_water = min(offsets.get(consumer) or 0 for consumer in CHANGE_CONSUMERS)
+    if not low_water:
+        return 0
+    result = await db.execute(delete(ChangeEvent).where(ChangeEvent.id <= low_water))
+    return result.rowcount or 0
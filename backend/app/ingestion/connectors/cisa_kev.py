@@ -1,7 +1,9 @@
+import hashlib
 import httpx
 import logging
-from typing import List
+from typing import List, Optional
 from tenacity import retry, stop_after_attempt, wait_exponential
+from app.ingestion.metrics import timed_get, retry_recorder
 
 logger = logging.getLogger("vulnguard.cisa_kev")
 
@@ -11,14 +13,38 @@ KEV_URL = "https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulner
 class CISAKEVConnector:
     """Connector for CISA Known Exploited Vulnerabilities catalog."""
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=2, min=4, max=30))
     async def fetch_kev_catalog(self) -> List[dict]:
         """Fetch the full KEV catalog."""
+        catalog = await self.fetch_kev_catalog_if_changed()
+        return catalog["entries"]
+
+    @retry(
+        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=2, min=4, max=30),
+        before_sleep=retry_recorder("cisa_kev"),
+    )
+    async def fetch_kev_catalog_if_changed(
+        self, etag: Optional[str] = None, content_hash: Optional[str] = None
+    ) -> dict:
+        """Fetch the KEV catalog unless it matches the given ETag or content hash.
+
+        Returns ``{"changed", "etag", "content_hash", "entries"}``; ``entries`` is empty
+        when the catalog is unchanged.
+        """
+        headers = {"If-None-Match": etag} if etag else {}
         async with httpx.AsyncClient() as client:
-            response = await client.get(KEV_URL, timeout=30.0)
+            response = await timed_get(client, "cisa_kev", KEV_URL, headers=headers, timeout=30.0)
+            if response.status_code == 304:
+                logger.info("KEV catalog not modified (ETag match)")
+                return {"changed": False, "etag": etag, "content_hash": content_hash, "entries": []}
             response.raise_for_status()
-            data = response.json()
 
+        new_etag = response.headers.get("ETag")
+        new_hash = hashlib.sha256(response.content).hexdigest()
+        if content_hash and new_hash == content_hash:
+            logger.info("KEV catalog not modified (content hash match)")
+            return {"changed": False, "etag": new_etag, "content_hash": new_hash, "entries": []}
+
+        data = response.json()
         vulnerabilities = data.get("vulnerabilities", [])
         logger.info(f"Fetched {len(vulnerabilities)} KEV entries from CISA")
 
@@ -36,5 +62,5 @@ class CISAKEVConnector:
                 "known_ransomware_use": v.get("knownRansomwareCampaignUse", "Unknown"),
                 "notes": v.get("notes", ""),
             })
-        
-        return results
+
+        return {"changed": True, "etag": new_etag, "content_hash": new_hash, "entries": results}
@@ -4,6 +4,7 @@ import logging
 from typing import List, Dict
 from tenacity import retry, stop_after_attempt, wait_exponential
 from app.config import settings
+from app.ingestion.metrics import timed_get, retry_recorder
 
 logger = logging.getLogger("vulnguard.exploitdb")
 
@@ -20,7 +21,10 @@ class ExploitDBConnector:
             headers["Authorization"] = f"token {settings.GITHUB_TOKEN}"
         return headers
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=2, min=4, max=30))
+    @retry(
+        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=2, min=4, max=30),
+        before_sleep=retry_recorder("exploitdb"),
+    )
     async def search_github_pocs(self, cve_id: str) -> List[Dict]:
         """Search GitHub for PoC exploits matching a CVE ID."""
         results = []
@@ -31,8 +35,9 @@ class ExploitDBConnector:
                 "order": "desc",
                 "per_page": 10,
             }
-            response = await client.get(
-                GITHUB_SEARCH_URL, params=params, headers=self._github_headers(), timeout=30.0
+            response = await timed_get(
+                client, "exploitdb", GITHUB_SEARCH_URL,
+                params=params, headers=self._github_headers(), timeout=30.0,
             )
             response.raise_for_status()
             data = response.json()
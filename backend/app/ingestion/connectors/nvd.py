@@ -2,13 +2,17 @@ import httpx
 import asyncio
 import logging
 from datetime import datetime, timedelta
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
 from tenacity import retry, stop_after_attempt, wait_exponential
 from app.config import settings
+from app.ingestion.fast_decode import decode_nvd_page
+from app.ingestion.metrics import timed_get, retry_recorder, record_rate_limit_sleep, stage
 
 logger = logging.getLogger("vulnguard.nvd")
 
 NVD_BASE_URL = "https://services.nvd.nist.gov/rest/json/cves/2.0"
+NVD_PAGE_SIZE = 2000
+NVD_MAX_RANGE_DAYS = 120  # API rejects lastMod ranges wider than this
 
 
 class NVDConnector:
@@ -24,45 +28,79 @@ class NVDConnector:
             headers["apiKey"] = self.api_key
         return headers
 
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=2, min=4, max=30))
+    @retry(
+        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=2, min=4, max=30),
+        before_sleep=retry_recorder("nvd"),
+    )
     async def _fetch_page(self, client: httpx.AsyncClient, params: dict) -> dict:
-        response = await client.get(
-            NVD_BASE_URL, params=params, headers=self._headers(), timeout=60.0
+        response = await timed_get(
+            client, "nvd", NVD_BASE_URL, params=params, headers=self._headers(), timeout=60.0
         )
         response.raise_for_status()
         return response.json()
 
-    async def fetch_recent_cves(self, days_back: int = 7, max_results: int = 2000) -> List[dict]:
-        """Fetch CVEs modified in the last N days."""
-        end = datetime.utcnow()
-        start = end - timedelta(days=days_back)
+    @retry(
+        stop=stop_after_attempt(3), wait=wait_exponential(multiplier=2, min=4, max=30),
+        before_sleep=retry_recorder("nvd"),
+    )
+    async def _fetch_page_content(self, client: httpx.AsyncClient, params: dict) -> bytes:
+        response = await timed_get(
+            client, "nvd", NVD_BASE_URL, params=params, headers=self._headers(), timeout=60.0
+        )
+        response.raise_for_status()
+        return response.content
+
+    async def iter_modified_pages(
+        self, start: datetime, end: datetime, start_index: int = 0, normalize: bool = False
+    ) -> AsyncIterator[Tuple[int, int, List[dict]]]:
+        """Yield (next_start_index, total_results, vulnerabilities) for CVEs modified in [start, end].
 
+        Paging begins at ``start_index`` so an interrupted window can be resumed.
+        With ``normalize=True`` pages are yielded as normalized CVE rows, decoded
+        through the typed fast path when ``NVD_FAST_DECODE`` is on.
+        """
         params = {
             "lastModStartDate": start.strftime("%Y-%m-%dT%H:%M:%S.000"),
             "lastModEndDate": end.strftime("%Y-%m-%dT%H:%M:%S.000"),
-            "resultsPerPage": 100,
-            "startIndex": 0,
+            "resultsPerPage": NVD_PAGE_SIZE,
+            "startIndex": start_index,
         }
 
-        all_cves = []
         async with httpx.AsyncClient() as client:
-            while len(all_cves) < max_results:
+            while True:
                 logger.info(f"Fetching NVD page at index {params['startIndex']}")
-                data = await self._fetch_page(client, params)
-                
-                vulns = data.get("vulnerabilities", [])
+                if normalize:
+                    with stage("fetch", source="nvd"):
+                        content = await self._fetch_page_content(client, params)
+                    with stage("normalize", source="nvd") as normalized:
+                        total, vulns = decode_nvd_page(content, fast=settings.NVD_FAST_DECODE)
+                        normalized["records"] = len(vulns)
+                else:
+                    data = await self._fetch_page(client, params)
+                    vulns = data.get("vulnerabilities", [])
+                    total = data.get("totalResults", 0)
                 if not vulns:
                     break
-                
-                all_cves.extend(vulns)
-                total = data.get("totalResults", 0)
-                
-                if len(all_cves) >= total:
-                    break
-                
+
                 params["startIndex"] += len(vulns)
+                yield params["startIndex"], total, vulns
+
+                if params["startIndex"] >= total:
+                    break
+                record_rate_limit_sleep("nvd", self.rate_delay)
                 await asyncio.sleep(self.rate_delay)
 
+    async def fetch_recent_cves(self, days_back: int = 7, max_results: int = 2000) -> List[dict]:
+        """Fetch CVEs modified in the last N days."""
+        end = datetime.utcnow()
+        start = end - timedelta(days=days_back)
+
+        all_cves = []
+        async for _, _, vulns in self.iter_modified_pages(start, end):
+            all_cves.extend(vulns)
+            if len(all_cves) >= max_results:
+                break
+
         logger.info(f"Fetched {len(all_cves)} CVEs from NVD")
         return all_cves
 
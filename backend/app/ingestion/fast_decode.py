@@ -0,0 +1,148 @@
+"""
+Optional fast path for NVD pages: decode raw response bytes straight into
+slotted msgspec structs and normalize them in batch. Fields we never store
+are not declared, so the decoder skips them without building dicts.
+
+Produces exactly the same rows as ``normalize_cve_data``; falls back to
+that function (with orjson/json decoding) when msgspec is not installed.
+"""
+import json
+import logging
+from typing import List, Optional, Tuple
+from app.ingestion.normalizer import normalize_cve_data, normalize_vendor, parse_datetime
+
+logger = logging.getLogger("vulnguard.ingestion.fast_decode")
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional dependency
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _loads(content: bytes):
+    return orjson.loads(content) if orjson else json.loads(content)
+
+
+if msgspec:
+
+    class _Description(msgspec.Struct):
+        lang: Optional[str] = ""
+        value: Optional[str] = ""
+
+    class _CVSSData(msgspec.Struct, rename="camel"):
+        base_score: Optional[float] = 0.0
+        vector_string: Optional[str] = ""
+        base_severity: Optional[str] = ""
+        attack_vector: Optional[str] = ""
+        attack_complexity: Optional[str] = ""
+        privileges_required: Optional[str] = ""
+        user_interaction: Optional[str] = ""
+        scope: Optional[str] = ""
+
+    class _CVSSMetric(msgspec.Struct, rename="camel"):
+        cvss_data: Optional[_CVSSData] = None
+
+    class _Metrics(msgspec.Struct):
+        cvssMetricV31: Optional[List[_CVSSMetric]] = None
+        cvssMetricV30: Optional[List[_CVSSMetric]] = None
+
+    class _CPEMatch(msgspec.Struct):
+        criteria: Optional[str] = ""
+
+    class _ConfigNode(msgspec.Struct, rename="camel"):
+        cpe_match: List[_CPEMatch] = []
+
+    class _Configuration(msgspec.Struct):
+        nodes: List[_ConfigNode] = []
+
+    class _Reference(msgspec.Struct):
+        url: Optional[str] = ""
+
+    class _CVEItem(msgspec.Struct, rename="camel"):
+        id: Optional[str] = ""
+        published: Optional[str] = None
+        last_modified: Optional[str] = None
+        descriptions: List[_Description] = []
+        metrics: Optional[_Metrics] = None
+        configurations: List[_Configuration] = []
+        references: List[_Reference] = []
+
+    class _Vulnerability(msgspec.Struct):
+        cve: _CVEItem
+
+    class _NVDPage(msgspec.Struct, rename="camel"):
+        total_results: int = 0
+        vulnerabilities: List[_Vulnerability] = []
+
+    _page_decoder = msgspec.json.Decoder(_NVDPage)
+
+
+def _normalize_struct(cve) -> dict:
+    """Struct counterpart of ``normalize_cve_data``."""
+    descriptions = cve.descriptions
+    desc = next(
+        (d.value for d in descriptions if d.lang == "en"),
+        descriptions[0].value if descriptions else "",
+    )
+
+    row = {
+        "cve_id": cve.id,
+        "description": desc,
+        "published_date": parse_datetime(cve.published),
+        "last_modified_date": parse_datetime(cve.last_modified),
+    }
+
+    metrics = cve.metrics
+    if metrics:
+        for metric_list in (metrics.cvssMetricV31, metrics.cvssMetricV30):
+            if metric_list:
+                inner = metric_list[0].cvss_data
+                if inner and inner.base_score:
+                    row["cvss_v3_score"] = inner.base_score
+                    row["cvss_v3_vector"] = inner.vector_string
+                    row["cvss_v3_severity"] = inner.base_severity
+                    row["attack_vector"] = inner.attack_vector
+                    row["attack_complexity"] = inner.attack_complexity
+                    row["privileges_required"] = inner.privileges_required
+                    row["user_interaction"] = inner.user_interaction
+                    row["scope"] = inner.scope
+                    break
+
+    cpes = []
+    vendor = ""
+    product = ""
+    for config in cve.configurations:
+        for node in config.nodes:
+            for match in node.cpe_match:
+                cpe_str = match.criteria
+                cpes.append(cpe_str)
+                if not vendor and cpe_str:
+                    parts = cpe_str.split(":")
+                    if len(parts) >= 5:
+                        vendor = normalize_vendor(parts[3])
+                        product = parts[4]
+
+    row["affected_cpes"] = cpes
+    row["vendor"] = vendor
+    row["product"] = product
+    row["references"] = [r.url for r in cve.references]
+    return row
+
+
+def fast_decode_available() -> bool:
+    return msgspec is not None
+
+
+def decode_nvd_page(content: bytes, fast: bool = True) -> Tuple[int, List[dict]]:
+    """Decode one NVD API 2.0 response body into (totalResults, normalized rows)."""
+    if fast and msgspec is not None:
+        page = _page_decoder.decode(content)
+        return page.total_results, [_normalize_struct(v.cve) for v in page.vulnerabilities]
+
+    data = _loads(content)
+    return data.get("totalResults", 0), [normalize_cve_data(v) for v in data.get("vulnerabilities", [])]
@@ -0,0 +1,160 @@
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Optional
+from app.database import async_session
+from app.ingestion.models import IngestionRun
+from app.metrics import metrics
+
+logger = logging.getLogger("vulnguard.ingestion.metrics")
+
+
+class RunStats:
+    """Counters for a single ingestion run; flushed to ``ingestion_runs`` at the end."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.started_at = datetime.utcnow()
+        self._t0 = time.perf_counter()
+        self.http_requests = 0
+        self.http_errors = 0
+        self.bytes_downloaded = 0
+        self.retries = 0
+        self.rate_limit_sleep_seconds = 0.0
+        self.stages: Dict[str, Dict] = {}
+
+    def add_stage(self, stage: str, seconds: float, records: int):
+        s = self.stages.setdefault(stage, {"seconds": 0.0, "calls": 0, "records": 0})
+        s["seconds"] += seconds
+        s["calls"] += 1
+        s["records"] += records
+
+    def stage_summary(self) -> Dict:
+        return {
+            name: {
+                "seconds": round(s["seconds"], 4),
+                "calls": s["calls"],
+                "records": s["records"],
+                "records_per_second": round(s["records"] / s["seconds"], 1) if s["seconds"] > 0 else None,
+            }
+            for name, s in self.stages.items()
+        }
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._t0
+
+
+_current_run: ContextVar[Optional[RunStats]] = ContextVar("ingestion_run", default=None)
+
+
+def record_http(source: str, seconds: float, num_bytes: int, status_code: int = 200):
+    metrics.observe("ingestion_http_request_seconds", seconds, source=source)
+    metrics.inc("ingestion_http_requests_total", source=source, status=status_code)
+    metrics.inc("ingestion_bytes_downloaded_total", num_bytes, source=source)
+    run = _current_run.get()
+    if run:
+        run.http_requests += 1
+        run.bytes_downloaded += num_bytes
+        if status_code >= 400:
+            run.http_errors += 1
+
+
+async def timed_get(client, source: str, url: str, **kwargs):
+    """``client.get`` that records latency, status and response size for ``source``."""
+    t0 = time.perf_counter()
+    response = await client.get(url, **kwargs)
+    record_http(source, time.perf_counter() - t0, len(response.content), response.status_code)
+    return response
+
+
+def record_retry(source: str):
+    metrics.inc("ingestion_retries_total", source=source)
+    run = _current_run.get()
+    if run:
+        run.retries += 1
+
+
+def retry_recorder(source: str):
+    """tenacity ``before_sleep`` hook counting retries for a source."""
+    return lambda retry_state: record_retry(source)
+
+
+def record_rate_limit_sleep(source: str, seconds: float):
+    metrics.inc("ingestion_rate_limit_sleeps_total", source=source)
+    metrics.inc("ingestion_rate_limit_sleep_seconds_total", seconds, source=source)
+    run = _current_run.get()
+    if run:
+        run.rate_limit_sleep_seconds += seconds
+
+
+@contextmanager
+def stage(name: str, records: int = 0, source: Optional[str] = None):
+    """Time a pipeline stage (fetch, normalize, db_write, ...) for the current run.
+
+    ``records`` may be updated through the yielded dict when only known afterwards.
+    """
+    info = {"records": records}
+    t0 = time.perf_counter()
+    try:
+        yield info
+    finally:
+        seconds = time.perf_counter() - t0
+        run = _current_run.get()
+        src = source or (run.source if run else "unknown")
+        metrics.observe("ingestion_stage_seconds", seconds, source=src, stage=name)
+        metrics.inc("ingestion_stage_records_total", info["records"], source=src, stage=name)
+        if run:
+            run.add_stage(name, seconds, info["records"])
+
+
+async def _save_run(run: RunStats, status: str, result: Optional[Dict], error: Optional[str]):
+    result = result or {}
+    try:
+        async with async_session() as db:
+            db.add(IngestionRun(
+                source=run.source,
+                status=status,
+                started_at=run.started_at,
+                finished_at=datetime.utcnow(),
+                duration_seconds=round(run.elapsed, 3),
+                records_created=result.get("created", 0),
+                records_updated=result.get("updated", 0),
+                http_requests=run.http_requests,
+                http_errors=run.http_errors,
+                bytes_downloaded=run.bytes_downloaded,
+                retries=run.retries,
+                rate_limit_sleep_seconds=round(run.rate_limit_sleep_seconds, 3),
+                stages=run.stage_summary(),
+                error=error,
+            ))
+            await db.commit()
+    except Exception as e:
+        logger.warning(f"Could not persist ingestion run for {run.source}: {e}")
+
+
+def instrumented_run(source: str):
+    """Decorator for ``_ingest_*`` coroutines: collects run stats and stores them in ``ingestion_runs``."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            run = RunStats(source)
+            token = _current_run.set(run)
+            try:
+                result = await fn(*args, **kwargs)
+            except Exception as exc:
+                metrics.inc("ingestion_runs_total", source=source, status="failed")
+                await _save_run(run, "failed", None, str(exc)[:2000])
+                raise
+            finally:
+                _current_run.reset(token)
+                metrics.observe("ingestion_run_seconds", run.elapsed, source=source)
+
+            metrics.inc("ingestion_runs_total", source=source, status="success")
+            await _save_run(run, "success", result if isinstance(result, dict) else None, None)
+            return result
+        return wrapper
+    return decorator
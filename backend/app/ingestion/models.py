@@ -97,3 +97,72 @@ class EPSSScore(Base):
     __table_args__ = (
         Index("ix_epss_cve_date", "cve_id", "date", unique=True),
     )
+
+
+class SyncState(Base):
+    """Per-source ingestion checkpoint shared by the NVD, KEV, EPSS and ExploitDB tasks."""
+    __tablename__ = "ingestion_sync_state"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String(50), unique=True, index=True, nullable=False)  # nvd, cisa_kev, epss, exploitdb
+
+    # High-water mark of the last fully synced window (NVD lastModEndDate, EPSS score date, ...)
+    last_mod_end_date = Column(DateTime, nullable=True)
+
+    # In-flight window, kept so a crashed run resumes where it stopped
+    window_start_date = Column(DateTime, nullable=True)
+    window_end_date = Column(DateTime, nullable=True)
+    start_index = Column(Integer, default=0)
+
+    # Conditional fetch markers for whole-document feeds
+    etag = Column(String(255), nullable=True)
+    content_hash = Column(String(64), nullable=True)
+
+    status = Column(String(20), default="idle")  # idle, running, partial, failed
+    last_error = Column(Text, nullable=True)
+    last_success_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ChangeEvent(Base):
+    """Durable CVE change log written by ingestion and consumed by downstream tasks."""
+    __tablename__ = "cve_change_events"
+
+    id = Column(Integer, primary_key=True, index=True)  # monotonic; consumers track the last id they processed
+    cve_id = Column(String(20), index=True, nullable=False)
+    change_type = Column(String(20), nullable=False)  # new, cvss, epss, kev, exploit
+    source = Column(String(50))  # nvd, cisa_kev, epss, exploitdb
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class ChangeConsumerOffset(Base):
+    """Last change event id processed by each downstream consumer."""
+    __tablename__ = "change_consumer_offsets"
+
+    id = Column(Integer, primary_key=True, index=True)
+    consumer = Column(String(50), unique=True, index=True, nullable=False)  # matching, risk, ml, graph
+    last_event_id = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class IngestionRun(Base):
+    """Per-run ingestion instrumentation history."""
+    __tablename__ = "ingestion_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String(50), index=True, nullable=False)
+    status = Column(String(20))  # success, failed
+    started_at = Column(DateTime, default=datetime.utcnow, index=True)
+    finished_at = Column(DateTime)
+    duration_seconds = Column(Float)
+
+    records_created = Column(Integer, default=0)
+    records_updated = Column(Integer, default=0)
+    http_requests = Column(Integer, default=0)
+    http_errors = Column(Integer, default=0)
+    bytes_downloaded = Column(Integer, default=0)
+    retries = Column(Integer, default=0)
+    rate_limit_sleep_seconds = Column(Float, default=0.0)
+
+    stages = Column(JSON, default={})  # stage -> {seconds, calls, records, records_per_second}
+    error = Column(Text, nullable=True)
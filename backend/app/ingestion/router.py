@@ -1,14 +1,16 @@
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, or_
 from typing import Optional
 from app.database import get_db
 from app.auth.dependencies import get_current_user, require_role
 from app.auth.models import User, UserRole
-from app.ingestion.models import CVE, Exploit, KEVEntry
+from app.ingestion.models import CVE, Exploit, KEVEntry, IngestionRun
 from app.ingestion.schemas import (
-    CVEResponse, CVEListResponse, ExploitResponse, IngestionStatusResponse,
+    CVEResponse, CVEListResponse, ExploitResponse, IngestionStatusResponse, IngestionRunResponse,
 )
+from app.metrics import metrics
 from app.ingestion.tasks import ingest_nvd_cves, ingest_cisa_kev, ingest_epss_scores, search_exploits
 
 router = APIRouter(prefix="/api/cves", tags=["Vulnerability Intelligence"])
@@ -131,3 +133,30 @@ async def trigger_epss_ingestion(
         source="epss", status="queued", records_processed=0,
         last_ingested=None, message=f"Task {task.id} queued"
     )
+
+
+@router.get("/ingest/metrics")
+async def ingestion_metrics(
+    format: str = Query("json", enum=["json", "prometheus"]),
+    current_user: User = Depends(get_current_user),
+):
+    """Per-source HTTP latency, bytes, retries, rate-limit sleeps and stage throughput (this process)."""
+    if format == "prometheus":
+        return PlainTextResponse(metrics.render_prometheus("ingestion_"))
+    return metrics.snapshot("ingestion_")
+
+
+@router.get("/ingest/runs", response_model=list[IngestionRunResponse])
+async def ingestion_runs(
+    source: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Recent ingestion runs with per-stage timings, newest first."""
+    query = select(IngestionRun)
+    if source:
+        query = query.where(IngestionRun.source == source)
+    query = query.order_by(IngestionRun.started_at.desc()).limit(limit)
+    result = await db.execute(query)
+    return result.scalars().all()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 from datetime import datetime
 
 
@@ -68,3 +68,24 @@ class ExploitResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class IngestionRunResponse(BaseModel):
+    id: int
+    source: str
+    status: Optional[str]
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    duration_seconds: Optional[float]
+    records_created: int
+    records_updated: int
+    http_requests: int
+    http_errors: int
+    bytes_downloaded: int
+    retries: int
+    rate_limit_sleep_seconds: float
+    stages: Optional[Dict[str, Any]]
+    error: Optional[str]
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,76 @@
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import async_session
+from app.ingestion.models import SyncState
+
+logger = logging.getLogger("vulnguard.ingestion.sync_state")
+
+# A run that has not touched its checkpoint for this long is considered crashed
+STALE_RUN_AFTER = timedelta(minutes=30)
+
+
+async def get_sync_state(db: AsyncSession, source: str) -> SyncState:
+    """Load the checkpoint row for a source, creating it on first use."""
+    result = await db.execute(select(SyncState).where(SyncState.source == source))
+    state = result.scalar_one_or_none()
+    if not state:
+        state = SyncState(source=source, start_index=0, status="idle")
+        db.add(state)
+        await db.flush()
+    return state
+
+
+def is_running_elsewhere(state: SyncState, now: Optional[datetime] = None) -> bool:
+    """True if another run holds this source and its checkpoint is still fresh."""
+    if state.status != "running" or not state.updated_at:
+        return False
+    return (now or datetime.utcnow()) - state.updated_at < STALE_RUN_AFTER
+
+
+def has_pending_window(state: SyncState) -> bool:
+    """True if a previous run stopped before finishing its window."""
+    return state.window_start_date is not None and state.window_end_date is not None
+
+
+def begin_window(state: SyncState, start: datetime, end: datetime):
+    state.window_start_date = start
+    state.window_end_date = end
+    state.start_index = 0
+
+
+def mark_running(state: SyncState):
+    state.status = "running"
+    state.last_error = None
+    state.updated_at = datetime.utcnow()
+
+
+def mark_partial(state: SyncState):
+    """Release a run that stopped at its per-run cap; the window and index are kept for the next run."""
+    state.status = "partial"
+    state.updated_at = datetime.utcnow()
+
+
+def mark_success(state: SyncState, last_mod_end_date: Optional[datetime] = None):
+    """Close the in-flight window and advance the high-water mark."""
+    if last_mod_end_date is not None:
+        state.last_mod_end_date = last_mod_end_date
+    state.window_start_date = None
+    state.window_end_date = None
+    state.start_index = 0
+    state.status = "idle"
+    state.last_success_at = datetime.utcnow()
+
+
+async def record_sync_failure(source: str, error: Exception):
+    """Flag a source as failed in a fresh session; the window and index are kept for resume."""
+    try:
+        async with async_session() as db:
+            state = await get_sync_state(db, source)
+            state.status = "failed"
+            state.last_error = str(error)[:2000]
+            await db.commit()
+    except Exception as e:
+        logger.warning(f"Could not record sync failure for {source}: {e}")
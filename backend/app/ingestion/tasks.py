@@ -1,20 +1,38 @@
 import logging
-from datetime import datetime
-from sqlalchemy import select
+from datetime import datetime, timedelta
+from typing import List, Tuple
+from sqlalchemy import select, update, or_
 from app.celery_app import celery
 from app.database import async_session
 from app.ingestion.models import CVE, KEVEntry, EPSSScore, Exploit
-from app.ingestion.connectors.nvd import NVDConnector
+from app.ingestion.connectors.nvd import NVDConnector, NVD_MAX_RANGE_DAYS
 from app.ingestion.connectors.cisa_kev import CISAKEVConnector
 from app.ingestion.connectors.epss import EPSSConnector
 from app.ingestion.connectors.exploitdb import ExploitDBConnector
-from app.ingestion.normalizer import normalize_cve_data, parse_datetime
+from app.ingestion.normalizer import parse_datetime
+from app.ingestion.changelog import (
+    record_changes, prune_change_log,
+    CHANGE_NEW, CHANGE_CVSS, CHANGE_EPSS, CHANGE_KEV, CHANGE_EXPLOIT,
+)
+from app.ingestion.metrics import instrumented_run, stage
+from app.ingestion.sync_state import (
+    get_sync_state, is_running_elsewhere, has_pending_window,
+    begin_window, mark_running, mark_partial, mark_success, record_sync_failure,
+)
 import asyncio
 import threading
 import logging
 
 logger = logging.getLogger("vulnguard.ingestion.tasks")
 
+EPSS_BATCH_SIZE = 100
+EXPLOIT_BATCH_SIZE = 10
+EXPLOIT_MAX_PER_RUN = 100  # code searches are rate limited; the rest of the window continues in a follow-up run
+EXPLOIT_CONTINUE_COUNTDOWN = 60
+
+# Window start used when a source should walk every CVE rather than recent changes
+EPOCH = datetime(1970, 1, 1)
+
 def run_async(coro):
     """Helper to run async functions in sync Celery tasks."""
     try:
@@ -52,7 +70,10 @@ def run_async(coro):
 
 @celery.task(name="app.ingestion.tasks.ingest_nvd_cves", bind=True, max_retries=3)
 def ingest_nvd_cves(self, days_back: int = 7):
-    """Ingest CVEs from NVD."""
+    """Ingest CVEs from NVD modified since the last checkpoint.
+
+    ``days_back`` only sizes the first window, when no checkpoint exists yet.
+    """
     try:
         return run_async(_ingest_nvd(days_back))
     except Exception as exc:
@@ -60,36 +81,87 @@ def ingest_nvd_cves(self, days_back: int = 7):
         self.retry(countdown=60, exc=exc)
 
 
+async def _upsert_cves(db, normalized_rows: List[dict]) -> Tuple[int, int]:
+    """Insert or update a page of normalized NVD records. Returns (created, updated)."""
+    cve_ids = [n["cve_id"] for n in normalized_rows]
+
+    result = await db.execute(select(CVE).where(CVE.cve_id.in_(cve_ids)))
+    existing = {c.cve_id: c for c in result.scalars().all()}
+
+    created, updated = 0, 0
+    changes = []
+    for normalized in normalized_rows:
+        cve_id = normalized["cve_id"]
+        cve = existing.get(cve_id)
+        if cve:
+            old_cvss = (cve.cvss_v3_score, cve.cvss_v3_vector)
+            for k, v in normalized.items():
+                if v is not None and k != "cve_id":
+                    setattr(cve, k, v)
+            if (cve.cvss_v3_score, cve.cvss_v3_vector) != old_cvss:
+                changes.append((cve_id, CHANGE_CVSS))
+            updated += 1
+        else:
+            cve = CVE(**normalized)
+            db.add(cve)
+            existing[cve_id] = cve
+            changes.append((cve_id, CHANGE_NEW))
+            created += 1
+
+    await record_changes(db, changes, source="nvd")
+    return created, updated
+
+
+@instrumented_run("nvd")
 async def _ingest_nvd(days_back: int):
     connector = NVDConnector()
-    raw_cves = await connector.fetch_recent_cves(days_back=days_back)
+    created, updated = 0, 0
 
-    async with async_session() as db:
-        # Get existing CVE IDs
-        result = await db.execute(select(CVE.cve_id))
-        existing = {row[0] for row in result.fetchall()}
-
-        created, updated = 0, 0
-        for raw in raw_cves:
-            normalized = normalize_cve_data(raw)
-            cve_id = normalized["cve_id"]
-
-            if cve_id in existing:
-                # Update existing
-                result = await db.execute(select(CVE).where(CVE.cve_id == cve_id))
-                cve = result.scalar_one_or_none()
-                if cve:
-                    for k, v in normalized.items():
-                        if v is not None and k != "cve_id":
-                            setattr(cve, k, v)
-                    updated += 1
+    try:
+        async with async_session() as db:
+            state = await get_sync_state(db, "nvd")
+            if is_running_elsewhere(state):
+                logger.info("NVD sync already running, skipping")
+                return {"source": "nvd", "skipped": True, "created": 0, "updated": 0}
+
+            now = datetime.utcnow()
+            if has_pending_window(state):
+                logger.info(
+                    f"Resuming NVD window {state.window_start_date} → {state.window_end_date} "
+                    f"at index {state.start_index}"
+                )
             else:
-                cve = CVE(**normalized)
-                db.add(cve)
-                existing.add(cve_id)
-                created += 1
-
-        await db.commit()
+                start = state.last_mod_end_date or (now - timedelta(days=days_back))
+                begin_window(state, start, min(now, start + timedelta(days=NVD_MAX_RANGE_DAYS)))
+            mark_running(state)
+            await db.commit()
+
+            while True:
+                async for next_index, total, rows in connector.iter_modified_pages(
+                    state.window_start_date, state.window_end_date, state.start_index or 0,
+                    normalize=True,
+                ):
+                    with stage("db_write", records=len(rows)):
+                        page_created, page_updated = await _upsert_cves(db, rows)
+                        # Page data and checkpoint are committed together
+                        state.start_index = next_index
+                        await db.commit()
+                    created += page_created
+                    updated += page_updated
+
+                window_end = state.window_end_date
+                mark_success(state, last_mod_end_date=window_end)
+                if window_end >= now:
+                    await db.commit()
+                    break
+
+                # Caught up with one window; advance through the next one
+                begin_window(state, window_end, min(now, window_end + timedelta(days=NVD_MAX_RANGE_DAYS)))
+                mark_running(state)
+                await db.commit()
+    except Exception as exc:
+        await record_sync_failure("nvd", exc)
+        raise
 
     msg = f"NVD ingestion complete: {created} created, {updated} updated"
     logger.info(msg)
@@ -106,37 +178,76 @@ def ingest_cisa_kev(self):
         self.retry(countdown=60, exc=exc)
 
 
+async def _flag_kev_cves(db):
+    """Mark every CVE listed in kev_entries that is not yet flagged, in one statement."""
+    unflagged = CVE.is_kev == False, CVE.cve_id.in_(select(KEVEntry.cve_id))
+    cve_ids = [row[0] for row in (await db.execute(select(CVE.cve_id).where(*unflagged))).fetchall()]
+    if not cve_ids:
+        return 0
+
+    kev_date = (
+        select(KEVEntry.date_added)
+        .where(KEVEntry.cve_id == CVE.cve_id)
+        .scalar_subquery()
+    )
+    await db.execute(
+        update(CVE)
+        .where(*unflagged)
+        .values(is_kev=True, kev_date_added=kev_date)
+        .execution_options(synchronize_session=False)
+    )
+    await record_changes(db, [(cve_id, CHANGE_KEV) for cve_id in cve_ids], source="cisa_kev")
+    return len(cve_ids)
+
+
+@instrumented_run("cisa_kev")
 async def _ingest_kev():
     connector = CISAKEVConnector()
-    entries = await connector.fetch_kev_catalog()
-
-    async with async_session() as db:
-        result = await db.execute(select(KEVEntry.cve_id))
-        existing = {row[0] for row in result.fetchall()}
-
-        created = 0
-        for entry in entries:
-            # Parse dates
-            entry["date_added"] = parse_datetime(entry.get("date_added"))
-            entry["due_date"] = parse_datetime(entry.get("due_date"))
-
-            if entry["cve_id"] not in existing:
-                db.add(KEVEntry(**entry))
-                existing.add(entry["cve_id"])
-                created += 1
-
-            # Also mark in CVE table
-            cve_result = await db.execute(select(CVE).where(CVE.cve_id == entry["cve_id"]))
-            cve = cve_result.scalar_one_or_none()
-            if cve:
-                cve.is_kev = True
-                cve.kev_date_added = entry["date_added"]
 
-        await db.commit()
+    try:
+        async with async_session() as db:
+            state = await get_sync_state(db, "cisa_kev")
+            etag, content_hash = state.etag, state.content_hash
+            await db.commit()
+
+        with stage("fetch") as fetched:
+            catalog = await connector.fetch_kev_catalog_if_changed(etag=etag, content_hash=content_hash)
+            fetched["records"] = len(catalog["entries"])
+
+        async with async_session() as db:
+            with stage("db_write", records=len(catalog["entries"])):
+                state = await get_sync_state(db, "cisa_kev")
+                created = 0
+
+                if catalog["changed"]:
+                    result = await db.execute(select(KEVEntry.cve_id))
+                    existing = {row[0] for row in result.fetchall()}
+
+                    for entry in catalog["entries"]:
+                        if entry["cve_id"] in existing:
+                            continue
+                        # Parse dates
+                        entry["date_added"] = parse_datetime(entry.get("date_added"))
+                        entry["due_date"] = parse_datetime(entry.get("due_date"))
+                        db.add(KEVEntry(**entry))
+                        existing.add(entry["cve_id"])
+                        created += 1
+                    await db.flush()
+
+                # Also mark in CVE table; catches CVEs ingested after their KEV entry
+                flagged = await _flag_kev_cves(db)
+
+                state.etag = catalog["etag"]
+                state.content_hash = catalog["content_hash"]
+                mark_success(state)
+                await db.commit()
+    except Exception as exc:
+        await record_sync_failure("cisa_kev", exc)
+        raise
 
-    msg = f"KEV ingestion complete: {created} new entries"
+    msg = f"KEV ingestion complete: {created} new entries, {flagged} CVEs flagged"
     logger.info(msg)
-    return {"source": "cisa_kev", "created": created}
+    return {"source": "cisa_kev", "created": created, "flagged": flagged, "unchanged": not catalog["changed"]}
 
 
 @celery.task(name="app.ingestion.tasks.ingest_epss_scores", bind=True, max_retries=3)
@@ -149,38 +260,86 @@ def ingest_epss_scores(self):
         self.retry(countdown=60, exc=exc)
 
 
+@instrumented_run("epss")
 async def _ingest_epss():
-    connector = EPSSConnector()
-
-    async with async_session() as db:
-        # Get CVE IDs that need EPSS scores
-        result = await db.execute(select(CVE.cve_id))
-        cve_ids = [row[0] for row in result.fetchall()]
+    """Walk CVEs in id order, checkpointing the last CVE.id scored.
 
-    scores = await connector.fetch_epss_scores(cve_ids[:1000])
-
-    async with async_session() as db:
-        updated = 0
-        for score_data in scores:
-            cve_result = await db.execute(
-                select(CVE).where(CVE.cve_id == score_data["cve_id"])
-            )
-            cve = cve_result.scalar_one_or_none()
-            if cve:
-                cve.epss_score = score_data["epss_score"]
-                cve.epss_percentile = score_data["percentile"]
-                updated += 1
-
-            # Also store in EPSS table
-            epss_entry = EPSSScore(
-                cve_id=score_data["cve_id"],
-                epss_score=score_data["epss_score"],
-                percentile=score_data["percentile"],
-                date=datetime.utcnow(),
-            )
-            db.add(epss_entry)
+    EPSS is republished daily, so the first run of a day walks every CVE; later
+    runs that day only score CVEs ingested since the last completed walk.
+    """
+    connector = EPSSConnector()
+    updated = 0
 
-        await db.commit()
+    try:
+        async with async_session() as db:
+            state = await get_sync_state(db, "epss")
+            if is_running_elsewhere(state):
+                logger.info("EPSS sync already running, skipping")
+                return {"source": "epss", "skipped": True, "updated": 0}
+
+            today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+            if not has_pending_window(state):
+                if state.last_mod_end_date and state.last_mod_end_date >= today:
+                    begin_window(state, state.last_success_at or EPOCH, today)
+                else:
+                    begin_window(state, EPOCH, today)
+            mark_running(state)
+            await db.commit()
+
+            while True:
+                result = await db.execute(
+                    select(CVE)
+                    .where(CVE.id > (state.start_index or 0), CVE.ingested_at >= state.window_start_date)
+                    .order_by(CVE.id)
+                    .limit(EPSS_BATCH_SIZE)
+                )
+                batch = result.scalars().all()
+                if not batch:
+                    mark_success(state, last_mod_end_date=state.window_end_date)
+                    await db.commit()
+                    break
+
+                by_id = {c.cve_id: c for c in batch}
+                with stage("fetch") as fetched:
+                    scores = await connector.fetch_epss_scores(list(by_id))
+                    fetched["records"] = len(scores)
+                with stage("db_write", records=len(scores)):
+                    score_dates = {
+                        s["cve_id"]: (parse_datetime(s.get("date")) or today).replace(tzinfo=None)
+                        for s in scores
+                    }
+                    existing_result = await db.execute(
+                        select(EPSSScore.cve_id, EPSSScore.date).where(EPSSScore.cve_id.in_(list(score_dates)))
+                    )
+                    existing = {(row[0], row[1]) for row in existing_result.fetchall()}
+
+                    changes = []
+                    for score_data in scores:
+                        cve = by_id.get(score_data["cve_id"])
+                        if cve:
+                            if abs((cve.epss_score or 0.0) - score_data["epss_score"]) > 1e-6:
+                                changes.append((cve.cve_id, CHANGE_EPSS))
+                            cve.epss_score = score_data["epss_score"]
+                            cve.epss_percentile = score_data["percentile"]
+                            updated += 1
+
+                        # Also store in EPSS table, one row per CVE per score date
+                        score_date = score_dates[score_data["cve_id"]]
+                        if (score_data["cve_id"], score_date) not in existing:
+                            db.add(EPSSScore(
+                                cve_id=score_data["cve_id"],
+                                epss_score=score_data["epss_score"],
+                                percentile=score_data["percentile"],
+                                date=score_date,
+                            ))
+                            existing.add((score_data["cve_id"], score_date))
+
+                    await record_changes(db, changes, source="epss")
+                    state.start_index = batch[-1].id
+                    await db.commit()
+    except Exception as exc:
+        await record_sync_failure("epss", exc)
+        raise
 
     msg = f"EPSS ingestion complete: {updated} CVEs updated"
     logger.info(msg)
@@ -188,32 +347,133 @@ async def _ingest_epss():
 
 
 @celery.task(name="app.ingestion.tasks.search_exploits")
-def search_exploits(cve_ids: list):
-    """Search for exploits for given CVE IDs."""
-    return run_async(_search_exploits(cve_ids))
-
-
+def search_exploits(cve_ids: list = None):
+    """Search for exploits for given CVE IDs, or for CVEs changed since the last checkpoint."""
+    if cve_ids:
+        return run_async(_search_exploits(cve_ids))
+    result = run_async(_search_exploits_incremental())
+    # Eager (local) execution would recurse once per capped run; the next scheduled run resumes instead
+    if result.get("partial") and not celery.conf.task_always_eager:
+        search_exploits.apply_async(countdown=EXPLOIT_CONTINUE_COUNTDOWN)
+    return result
+
+
+async def _store_exploits(db, exploits: List[dict]) -> int:
+    """Add exploit rows not already known by (cve_id, source_url) and flag their CVEs."""
+    if not exploits:
+        return 0
+
+    cve_ids = list({e["cve_id"] for e in exploits})
+    result = await db.execute(
+        select(Exploit.cve_id, Exploit.source_url).where(Exploit.cve_id.in_(cve_ids))
+    )
+    seen = {(row[0], row[1]) for row in result.fetchall()}
+    result = await db.execute(select(CVE).where(CVE.cve_id.in_(cve_ids)))
+    cves = {c.cve_id: c for c in result.scalars().all()}
+
+    created = 0
+    changes = set()
+    for exploit_data in exploits:
+        key = (exploit_data["cve_id"], exploit_data.get("source_url"))
+        if key in seen:
+            continue
+        seen.add(key)
+        exploit_data["published_date"] = parse_datetime(exploit_data.get("published_date"))
+
+        db.add(Exploit(**exploit_data))
+        created += 1
+
+        # Mark CVE as having public exploit
+        cve = cves.get(exploit_data["cve_id"])
+        if cve:
+            maturity = exploit_data.get("maturity", "poc")
+            if not cve.has_public_exploit or cve.exploit_maturity != maturity:
+                changes.add((cve.cve_id, CHANGE_EXPLOIT))
+            cve.has_public_exploit = True
+            cve.exploit_maturity = maturity
+
+    await record_changes(db, changes, source="exploitdb")
+    return created
+
+
+@instrumented_run("exploitdb")
 async def _search_exploits(cve_ids: list):
     connector = ExploitDBConnector()
     exploits = await connector.bulk_search_pocs(cve_ids)
 
     async with async_session() as db:
-        created = 0
-        for exploit_data in exploits:
-            exploit_data["published_date"] = parse_datetime(exploit_data.get("published_date"))
-            
-            db.add(Exploit(**exploit_data))
-            created += 1
+        created = await _store_exploits(db, exploits)
+        await db.commit()
 
-            # Mark CVE as having public exploit
-            cve_result = await db.execute(
-                select(CVE).where(CVE.cve_id == exploit_data["cve_id"])
-            )
-            cve = cve_result.scalar_one_or_none()
-            if cve:
-                cve.has_public_exploit = True
-                cve.exploit_maturity = exploit_data.get("maturity", "poc")
+    return {"source": "exploitdb", "created": created}
 
-        await db.commit()
+
+@instrumented_run("exploitdb")
+async def _search_exploits_incremental():
+    """Search PoCs for CVEs new or modified in NVD since the exploitdb checkpoint, resuming by CVE.id."""
+    connector = ExploitDBConnector()
+    created, processed = 0, 0
+
+    try:
+        async with async_session() as db:
+            state = await get_sync_state(db, "exploitdb")
+            if is_running_elsewhere(state):
+                logger.info("Exploit search already running, skipping")
+                return {"source": "exploitdb", "skipped": True, "created": 0}
+
+            if not has_pending_window(state):
+                begin_window(state, state.last_mod_end_date or EPOCH, datetime.utcnow())
+            mark_running(state)
+            await db.commit()
+
+            while processed < EXPLOIT_MAX_PER_RUN:
+                result = await db.execute(
+                    select(CVE.id, CVE.cve_id)
+                    .where(
+                        CVE.id > (state.start_index or 0),
+                        # NVD-side changes only; enrichment writes (EPSS, KEV) must not re-queue CVEs
+                        or_(
+                            CVE.ingested_at > state.window_start_date,
+                            CVE.last_modified_date > state.window_start_date,
+                        ),
+                        CVE.ingested_at <= state.window_end_date,
+                    )
+                    .order_by(CVE.id)
+                    .limit(EXPLOIT_BATCH_SIZE)
+                )
+                batch = result.fetchall()
+                if not batch:
+                    mark_success(state, last_mod_end_date=state.window_end_date)
+                    await db.commit()
+                    break
+
+                with stage("fetch") as fetched:
+                    exploits = await connector.bulk_search_pocs([row[1] for row in batch])
+                    fetched["records"] = len(exploits)
+                with stage("db_write", records=len(exploits)):
+                    created += await _store_exploits(db, exploits)
+                    state.start_index = batch[-1][0]
+                    await db.commit()
+                processed += len(batch)
+            else:
+                mark_partial(state)
+                await db.commit()
+                return {"source": "exploitdb", "created": created, "partial": True}
+    except Exception as exc:
+        await record_sync_failure("exploitdb", exc)
+        raise
 
     return {"source": "exploitdb", "created": created}
+
+
+@celery.task(name="app.ingestion.tasks.prune_change_events")
+def prune_change_events():
+    """Drop change events that every downstream consumer has processed."""
+    return run_async(_prune_change_events())
+
+
+async def _prune_change_events():
+    async with async_session() as db:
+        deleted = await prune_change_log(db)
+        await db.commit()
+    return {"deleted": deleted}
@@ -1,11 +1,13 @@
 import logging
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.database import init_db
 from app.middleware.audit import AuditLogMiddleware
 from app.middleware.rate_limit import RateLimitMiddleware
+from app.graph.neo4j_client import GraphDatabaseError, GraphUnavailableError, GraphQueryTimeoutError
 
 # Routers
 from app.auth.router import router as auth_router
@@ -66,6 +68,18 @@ app.include_router(risk_router)
 app.include_router(remediation_router)
 
 
+# ── Errors ──
+@app.exception_handler(GraphDatabaseError)
+async def graph_database_error(request: Request, exc: GraphDatabaseError):
+    if isinstance(exc, GraphUnavailableError):
+        status_code = 503
+    elif isinstance(exc, GraphQueryTimeoutError):
+        status_code = 504
+    else:
+        status_code = 502
+    return JSONResponse(status_code=status_code, content={"detail": f"Graph database error: {exc}"})
+
+
 # ── Health Check ──
 @app.get("/health", tags=["System"])
 async def health():
@@ -1,11 +1,13 @@
 import logging
-from sqlalchemy import select
+from collections import defaultdict
+from sqlalchemy import select, update, func
 from app.celery_app import celery
 from app.database import async_session
 from app.assets.models import Asset, InstalledSoftware
 from app.ingestion.models import CVE
 from app.matching.models import VulnerabilityMatch
 from app.matching.engine import VulnerabilityMatcher
+from app.ingestion.changelog import consume_changes, CHANGE_NEW, CHANGE_CVSS
 import asyncio
 
 logger = logging.getLogger("vulnguard.matching.tasks")
@@ -126,3 +128,91 @@ async def _run_matching(asset_id: int = None):
 
     logger.info(f"Matching complete: {total_matches} new matches found")
     return {"total_matches": total_matches}
+
+
+@celery.task(name="app.matching.tasks.match_changed_cves", bind=True, max_retries=2)
+def match_changed_cves(self):
+    """Match only CVEs recorded as new or re-scored in the ingestion change log."""
+    try:
+        return run_async(consume_changes(
+            "matching", _match_cve_changes, change_types={CHANGE_NEW, CHANGE_CVSS},
+        ))
+    except Exception as exc:
+        logger.error(f"Incremental matching failed: {exc}")
+        self.retry(countdown=120, exc=exc)
+
+
+async def _match_cve_changes(db, changes: dict) -> int:
+    matcher = VulnerabilityMatcher()
+    new_ids = [cve_id for cve_id, types in changes.items() if CHANGE_NEW in types]
+    rescored_ids = [cve_id for cve_id, types in changes.items() if CHANGE_CVSS in types]
+    created = 0
+    touched_assets = set()
+
+    if new_ids:
+        cves = (await db.execute(select(CVE).where(CVE.cve_id.in_(new_ids)))).scalars().all()
+        cve_dicts = [
+            {
+                "cve_id": c.cve_id,
+                "vendor": c.vendor,
+                "product": c.product,
+                "affected_cpes": c.affected_cpes or [],
+                "cvss_v3_score": c.cvss_v3_score,
+            }
+            for c in cves
+        ]
+
+        software_by_asset = defaultdict(list)
+        for s in (await db.execute(select(InstalledSoftware))).scalars().all():
+            software_by_asset[s.asset_id].append(
+                {"name": s.name, "vendor": s.vendor, "version": s.version, "cpe": s.cpe}
+            )
+
+        existing_result = await db.execute(
+            select(VulnerabilityMatch.asset_id, VulnerabilityMatch.cve_id)
+            .where(VulnerabilityMatch.cve_id.in_(new_ids))
+        )
+        existing = {(row[0], row[1]) for row in existing_result.fetchall()}
+
+        for asset_id, sw_dicts in software_by_asset.items():
+            for match in matcher.bulk_match(sw_dicts, cve_dicts):
+                if (asset_id, match["cve_id"]) in existing:
+                    continue
+                existing.add((asset_id, match["cve_id"]))
+                db.add(VulnerabilityMatch(
+                    asset_id=asset_id,
+                    cve_id=match["cve_id"],
+                    software_name=match.get("software_name", ""),
+                    software_version=match.get("software_version", ""),
+                    match_confidence=match["confidence"],
+                    match_type=match["match_type"],
+                    cvss_score=match.get("cvss_score", 0),
+                ))
+                touched_assets.add(asset_id)
+                created += 1
+        await db.flush()
+
+    if rescored_ids:
+        cvss = select(CVE.cvss_v3_score).where(CVE.cve_id == VulnerabilityMatch.cve_id).scalar_subquery()
+        await db.execute(
+            update(VulnerabilityMatch)
+            .where(VulnerabilityMatch.cve_id.in_(rescored_ids))
+            .values(cvss_score=cvss)
+            .execution_options(synchronize_session=False)
+        )
+
+    if touched_assets:
+        match_count = (
+            select(func.count(VulnerabilityMatch.id))
+            .where(VulnerabilityMatch.asset_id == Asset.id)
+            .scalar_subquery()
+        )
+        await db.execute(
+            update(Asset)
+            .where(Asset.id.in_(touched_assets))
+            .values(vulnerability_count=match_count)
+            .execution_options(synchronize_session=False)
+        )
+
+    logger.info(f"Incremental matching: {created} new matches for {len(new_ids)} new CVEs")
+    return created
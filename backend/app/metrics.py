@@ -0,0 +1,100 @@
+"""
+Minimal in-process metrics registry (counters + fixed-bucket histograms).
+
+Values are per process; the /metrics style endpoints expose a snapshot as
+JSON or Prometheus text exposition format.
+"""
+import threading
+from bisect import bisect_left
+from typing import Dict, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, buckets=DEFAULT_BUCKETS, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = series[key] = _Histogram(buckets)
+            hist.observe(value)
+
+    def snapshot(self, prefix: str = "") -> Dict:
+        """JSON-friendly view of every series whose name starts with ``prefix``."""
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(k), "value": v} for k, v in series.items()]
+                for name, series in self._counters.items() if name.startswith(prefix)
+            }
+            histograms = {
+                name: [
+                    {
+                        "labels": dict(k),
+                        "count": h.count,
+                        "sum": round(h.sum, 6),
+                        "buckets": dict(zip([*map(str, h.buckets), "+Inf"], h.counts)),
+                    }
+                    for k, h in series.items()
+                ]
+                for name, series in self._histograms.items() if name.startswith(prefix)
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def render_prometheus(self, prefix: str = "") -> str:
+        def fmt(labels: Dict) -> str:
+            if not labels:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+        snap = self.snapshot(prefix)
+        lines = []
+        for name, series in snap["counters"].items():
+            lines.append(f"# TYPE {name} counter")
+            lines.extend(f"{name}{fmt(s['labels'])} {s['value']}" for s in series)
+        for name, series in snap["histograms"].items():
+            lines.append(f"# TYPE {name} histogram")
+            for s in series:
+                cumulative = 0
+                for le, count in s["buckets"].items():
+                    cumulative += count
+                    lines.append(f"{name}_bucket{fmt({**s['labels'], 'le': le})} {cumulative}")
+                lines.append(f"{name}_sum{fmt(s['labels'])} {s['sum']}")
+                lines.append(f"{name}_count{fmt(s['labels'])} {s['count']}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
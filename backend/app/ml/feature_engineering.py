@@ -4,8 +4,21 @@ import pandas as pd
 from datetime import datetime
 from typing import Dict, List, Optional
 
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
 logger = logging.getLogger("vulnguard.ml.features")
 
+# Timestamps in this canonical ISO 8601 form (after a UTC offset is stripped) are
+# parsed in one vectorized pass; any other string goes through the same
+# datetime.fromisoformat call as extract_features, so both accept exactly the same input.
+ISO_TIMESTAMP = r"^\d{4}-\d{2}-\d{2}(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?)?$"
+UTC_OFFSET = r"(?:Z|[+-](?:[01]\d|2[0-3]):[0-5]\d)$"
+EXPLOIT_MATURITY_MAP = {"none": 0, "poc": 1, "functional": 2, "weaponized": 3}
+
 
 class FeatureEngineer:
     """Extract ML features from CVE data for exploit prediction."""
@@ -28,9 +41,9 @@ class FeatureEngineer:
         features = {}
 
         # Base metrics
-        features["cvss_score"] = float(cve_data.get("cvss_v3_score", 0))
-        features["epss_score"] = float(cve_data.get("epss_score", 0))
-        features["epss_percentile"] = float(cve_data.get("epss_percentile", 0))
+        features["cvss_score"] = float(cve_data.get("cvss_v3_score") or 0)
+        features["epss_score"] = float(cve_data.get("epss_score") or 0)
+        features["epss_percentile"] = float(cve_data.get("epss_percentile") or 0)
 
         # Binary flags
         features["is_kev"] = 1.0 if cve_data.get("is_kev") else 0.0
@@ -74,7 +87,7 @@ class FeatureEngineer:
 
         # Exploit maturity encoding
         maturity = (cve_data.get("exploit_maturity") or "none").lower()
-        features["exploit_maturity"] = {"none": 0, "poc": 1, "functional": 2, "weaponized": 3}.get(maturity, 0)
+        features["exploit_maturity"] = EXPLOIT_MATURITY_MAP.get(maturity, 0)
 
         # Vendor popularity
         vendor = (cve_data.get("vendor") or "").lower()
@@ -101,16 +114,153 @@ class FeatureEngineer:
 
     def build_dataframe(self, cve_records: List[Dict]) -> pd.DataFrame:
         """Build a feature DataFrame from CVE records."""
-        rows = []
-        for cve in cve_records:
-            features = self.extract_features(cve)
-            features["cve_id"] = cve.get("cve_id", "")
-            features["label"] = 1.0 if cve.get("is_kev") else 0.0  # Ground truth
-            rows.append(features)
-
-        df = pd.DataFrame(rows)
+        if not cve_records:
+            return pd.DataFrame()
+        return self.build_frame(pd.DataFrame(cve_records))
+
+    def build_frame(self, cves) -> pd.DataFrame:
+        """Feature columns plus ``cve_id`` and ``label`` for a CVE DataFrame or Arrow table."""
+        cves, reference_count = self._pandas(cves)
+        df = self._features(cves, reference_count)
+        df["cve_id"] = cves["cve_id"].fillna("").to_numpy() if "cve_id" in cves else ""
+        df["label"] = df["is_kev"]  # Ground truth
         return df
 
+    # ── Columnar API ──
+
+    def extract_frame(self, cves) -> pd.DataFrame:
+        """Features for every row of a CVE DataFrame or Arrow table in vectorized passes.
+
+        Columns use the ``extract_features`` input names; absent columns and
+        null values count as missing. The result equals ``extract_features``
+        row by row (``datetime.utcnow()`` is read once for the whole frame).
+        """
+        return self._features(*self._pandas(cves))
+
+    @staticmethod
+    def _pandas(cves):
+        """(DataFrame, reference counts or None); Arrow list lengths are counted before conversion."""
+        if pa is None or not isinstance(cves, pa.Table):
+            return cves, None
+        reference_count = None
+        if "references" in cves.column_names and pa.types.is_list(cves.schema.field("references").type):
+            lengths = pc.fill_null(pc.list_value_length(cves["references"]), 0)
+            reference_count = lengths.to_numpy(zero_copy_only=False).astype(np.float64)
+            cves = cves.drop_columns(["references"])
+        return cves.to_pandas(), reference_count
+
+    def _features(self, cves: pd.DataFrame, reference_count: Optional[np.ndarray]) -> pd.DataFrame:
+        index = cves.index
+        cves = cves.reset_index(drop=True)
+        n = len(cves)
+        features = {
+            "cvss_score": self._number(self._column(cves, "cvss_v3_score")),
+            "epss_score": self._number(self._column(cves, "epss_score")),
+            "epss_percentile": self._number(self._column(cves, "epss_percentile")),
+            "is_kev": self._flag(self._column(cves, "is_kev")),
+            "has_public_exploit": self._flag(self._column(cves, "has_public_exploit")),
+            "attack_vector": self._encode(self._column(cves, "attack_vector"), self.ATTACK_VECTOR_MAP),
+            "attack_complexity": self._encode(self._column(cves, "attack_complexity"), self.COMPLEXITY_MAP),
+            "privileges_required": self._encode(self._column(cves, "privileges_required"), self.PRIVILEGES_MAP),
+            "user_interaction": self._encode(self._column(cves, "user_interaction"), self.INTERACTION_MAP),
+            "scope": self._encode(self._column(cves, "scope"), self.SCOPE_MAP),
+        }
+
+        published = self._published(self._column(cves, "published_date")).to_numpy()
+        known = ~np.isnat(published)
+        days = np.zeros(n, dtype=np.int64)
+        now = np.datetime64(datetime.utcnow(), "us")
+        days[known] = (now - published[known]) // np.timedelta64(1, "D")
+        features["days_since_disclosure"] = np.where(known, np.maximum(days, 0), 365).astype(np.float64)
+        features["is_recent"] = (known & (days <= 30)).astype(np.float64)
+
+        features["exploit_maturity"] = self._encode(
+            self._column(cves, "exploit_maturity"), EXPLOIT_MATURITY_MAP, lower=True
+        )
+        popular = dict.fromkeys(self.POPULAR_VENDORS, 1)
+        features["vendor_popularity"] = self._encode(
+            self._column(cves, "vendor"), popular, lower=True
+        ).astype(np.float64)
+        if reference_count is None:
+            reference_count = np.array(
+                [len(refs) if isinstance(refs, list) else 0 for refs in self._column(cves, "references")],
+                dtype=np.float64,
+            )
+        features["reference_count"] = reference_count
+
+        features["network_exploitable"] = (features["attack_vector"] >= 3).astype(np.float64)
+        features["no_auth_required"] = (features["privileges_required"] >= 3).astype(np.float64)
+        features["ease_of_exploit"] = (
+            features["attack_vector"] * 0.3 +
+            features["attack_complexity"] * 0.2 +
+            features["privileges_required"] * 0.2 +
+            features["user_interaction"] * 0.15 +
+            features["network_exploitable"] * 0.15
+        )
+        return pd.DataFrame(features, index=index)
+
+    @staticmethod
+    def _column(cves: pd.DataFrame, name: str) -> pd.Series:
+        if name in cves:
+            return cves[name]
+        return pd.Series(None, index=cves.index, dtype=object)
+
+    @staticmethod
+    def _number(column: pd.Series) -> np.ndarray:
+        return column.astype(np.float64).fillna(0.0).to_numpy()
+
+    @staticmethod
+    def _flag(column: pd.Series) -> np.ndarray:
+        return (column.notna() & column.astype(bool)).to_numpy(dtype=np.float64)
+
+    @staticmethod
+    def _encode(column: pd.Series, mapping: Dict, lower: bool = False) -> np.ndarray:
+        """Vectorized ``mapping.get((value or "").upper(), 0)``: each distinct value is looked up once."""
+        codes, uniques = pd.factorize(column)
+        table = np.zeros(len(uniques) + 1, dtype=np.int64)  # last slot: missing (code -1)
+        for i, value in enumerate(uniques):
+            if isinstance(value, str):
+                table[i] = mapping.get(value.lower() if lower else value.upper(), 0)
+        return table[codes]
+
+    @staticmethod
+    def _published(column: pd.Series) -> pd.Series:
+        """``published_date`` as naive wall-clock timestamps; NaT when missing or unparseable.
+
+        Like ``extract_features``, a UTC offset is dropped rather than applied.
+        """
+        if pd.api.types.is_datetime64_any_dtype(column):
+            if column.dt.tz is not None:
+                column = column.dt.tz_localize(None)
+            return column.astype("datetime64[us]")
+
+        parsed = pd.Series(pd.NaT, index=column.index, dtype="datetime64[us]")
+        is_text = column.apply(isinstance, args=(str,)).astype(bool)
+        text = column[is_text].astype(str)
+        text = text[text.str.len() > 0]
+        stripped = text.str.replace(UTC_OFFSET, "", regex=True)
+        canonical = stripped.str.match(ISO_TIMESTAMP).astype(bool)
+        parsed.loc[stripped.index[canonical]] = pd.to_datetime(
+            stripped[canonical], format="ISO8601", errors="coerce"
+        )
+
+        def fromisoformat(value: str):
+            try:
+                return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+            except ValueError:
+                return None
+
+        others = text[~canonical]
+        if len(others):
+            unique = {value: fromisoformat(value) for value in others.unique()}
+            parsed.loc[others.index] = pd.to_datetime(others.map(unique), errors="coerce")
+        dates = column[~is_text & column.notna()]
+        if len(dates):
+            parsed.loc[dates.index] = pd.to_datetime(
+                [value.replace(tzinfo=None) for value in dates], errors="coerce"
+            )
+        return parsed
+
     @staticmethod
     def get_feature_columns() -> List[str]:
         return [
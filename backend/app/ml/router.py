@@ -100,9 +100,9 @@ async def top_predictions(
     )
     cves = result.scalars().all()
 
-    predictions = []
+    cve_records = []
     for cve in cves:
-        cve_data = {
+        cve_records.append({
             "cve_id": cve.cve_id,
             "cvss_v3_score": cve.cvss_v3_score,
             "epss_score": cve.epss_score,
@@ -115,9 +115,5 @@ async def top_predictions(
             "scope": cve.scope,
             "exploit_maturity": cve.exploit_maturity,
             "vendor": cve.vendor,
-        }
-        pred = predictor.predict(cve_data)
-        pred["cve_id"] = cve.cve_id
-        predictions.append(pred)
-
-    return sorted(predictions, key=lambda x: x["exploit_probability"], reverse=True)
+        })
+    return predictor.predict_batch(cve_records)
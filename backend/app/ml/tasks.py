@@ -1,9 +1,13 @@
 import logging
-from sqlalchemy import select
+import time
+import pandas as pd
+from sqlalchemy import select, update, bindparam
 from app.celery_app import celery
 from app.database import async_session
 from app.ingestion.models import CVE
 from app.ml.train import ExploitPredictor
+from app.ingestion.changelog import consume_changes
+from app.risk.dependencies import DIRTY_CVE, mark_dirty
 import asyncio
 
 logger = logging.getLogger("vulnguard.ml.tasks")
@@ -27,51 +31,77 @@ def retrain_model(self):
         self.retry(countdown=300, exc=exc)
 
 
+# CVE columns the feature pipeline reads, keyed by the extract_features input names
+FEATURE_SOURCE_COLUMNS = (
+    CVE.id, CVE.cve_id, CVE.cvss_v3_score, CVE.epss_score, CVE.epss_percentile, CVE.is_kev,
+    CVE.has_public_exploit, CVE.attack_vector, CVE.attack_complexity, CVE.privileges_required,
+    CVE.user_interaction, CVE.scope, CVE.published_date, CVE.exploit_maturity, CVE.vendor,
+    CVE.references,
+)
+WRITE_CHUNK_SIZE = 5000
+
+# Core executemany by primary key; skips the ORM bulk-update bookkeeping
+STORE_PREDICTION = (
+    update(CVE.__table__)
+    .where(CVE.__table__.c.id == bindparam("cve_pk"))
+    .values(
+        predicted_exploit_probability=bindparam("probability"),
+        prediction_confidence=bindparam("confidence"),
+    )
+)
+
+
+async def load_cve_frame(db, *where) -> pd.DataFrame:
+    """Feature source columns and the stored prediction for the matching CVEs, without loading ORM objects."""
+    result = await db.execute(
+        select(*FEATURE_SOURCE_COLUMNS, CVE.predicted_exploit_probability).where(*where)
+    )
+    return pd.DataFrame([tuple(r) for r in result.all()], columns=list(result.keys()))
+
+
+async def store_predictions(db, predictor: ExploitPredictor, cves: pd.DataFrame) -> int:
+    """Score ``cves`` in chunked batches and write the results back with bulk UPDATEs by primary key.
+
+    The Core UPDATE skips the ORM flush hooks, so CVEs whose probability
+    changed are marked dirty for risk rescoring in the same transaction.
+    """
+    if cves.empty:
+        return 0
+    probabilities = predictor.predict_proba(cves)
+    rows, changed = [], []
+    for cve_pk, cve_id, previous, proba in zip(
+        cves["id"], cves["cve_id"], cves["predicted_exploit_probability"], probabilities
+    ):
+        probability = round(float(proba), 4)
+        rows.append({
+            "cve_pk": int(cve_pk),
+            "probability": probability,
+            "confidence": round(float(max(proba, 1 - proba)), 4),
+        })
+        if pd.isna(previous) or float(previous) != probability:
+            changed.append(cve_id)
+    for start in range(0, len(rows), WRITE_CHUNK_SIZE):
+        await db.execute(STORE_PREDICTION, rows[start:start + WRITE_CHUNK_SIZE])
+    await mark_dirty(db, DIRTY_CVE, changed)
+    return len(rows)
+
+
 async def _retrain():
     async with async_session() as db:
-        result = await db.execute(select(CVE))
-        cves = result.scalars().all()
-
-    cve_dicts = [
-        {
-            "cve_id": c.cve_id,
-            "cvss_v3_score": c.cvss_v3_score,
-            "epss_score": c.epss_score,
-            "epss_percentile": c.epss_percentile,
-            "is_kev": c.is_kev,
-            "has_public_exploit": c.has_public_exploit,
-            "attack_vector": c.attack_vector,
-            "attack_complexity": c.attack_complexity,
-            "privileges_required": c.privileges_required,
-            "user_interaction": c.user_interaction,
-            "scope": c.scope,
-            "published_date": c.published_date,
-            "exploit_maturity": c.exploit_maturity,
-            "vendor": c.vendor,
-            "references": c.references,
-        }
-        for c in cves
-    ]
+        cves = await load_cve_frame(db)
 
     predictor = ExploitPredictor()
-    metrics = predictor.train(cve_dicts)
+    metrics = predictor.train(cves)
 
     # Update predictions in database
     if predictor.model is not None:
+        started = time.perf_counter()
         async with async_session() as db:
-            updated = 0
-            for cve_dict in cve_dicts:
-                prediction = predictor.predict(cve_dict)
-                cve_result = await db.execute(
-                    select(CVE).where(CVE.cve_id == cve_dict["cve_id"])
-                )
-                cve = cve_result.scalar_one_or_none()
-                if cve:
-                    cve.predicted_exploit_probability = prediction["exploit_probability"]
-                    cve.prediction_confidence = prediction["confidence"]
-                    updated += 1
+            metrics["predictions_updated"] = await store_predictions(db, predictor, cves)
             await db.commit()
-            metrics["predictions_updated"] = updated
+        logger.info(
+            f"Stored {metrics['predictions_updated']} predictions in {time.perf_counter() - started:.2f}s"
+        )
 
     return metrics
 
@@ -81,3 +111,22 @@ def predict_single(cve_data: dict):
     """Predict exploit likelihood for a single CVE."""
     predictor = ExploitPredictor()
     return predictor.predict(cve_data)
+
+
+@celery.task(name="app.ml.tasks.predict_changed_cves", bind=True, max_retries=2)
+def predict_changed_cves(self):
+    """Refresh predictions only for CVEs in the ingestion change log."""
+    try:
+        return run_async(consume_changes("ml", _predict_cve_changes))
+    except Exception as exc:
+        logger.error(f"Incremental prediction failed: {exc}")
+        self.retry(countdown=300, exc=exc)
+
+
+async def _predict_cve_changes(db, changes: dict) -> int:
+    predictor = ExploitPredictor()
+    if predictor.model is None:
+        return 0
+
+    cves = await load_cve_frame(db, CVE.cve_id.in_(list(changes)))
+    return await store_predictions(db, predictor, cves)
@@ -22,6 +22,8 @@ logger = logging.getLogger("vulnguard.ml.train")
 MODEL_DIR = os.path.join(os.path.dirname(__file__), "saved_models")
 os.makedirs(MODEL_DIR, exist_ok=True)
 
+PREDICT_CHUNK_SIZE = 50_000  # rows per predict_proba call; bounds the feature matrix copy
+
 
 class ExploitPredictor:
     """Train and serve exploit likelihood prediction models."""
@@ -48,11 +50,14 @@ class ExploitPredictor:
             except Exception as e:
                 logger.warning(f"Failed to load model: {e}")
 
-    def train(self, cve_records: list) -> Dict:
-        """Train the exploit prediction model."""
+    def train(self, cve_records) -> Dict:
+        """Train the exploit prediction model on CVE records or a CVE DataFrame."""
         logger.info(f"Training on {len(cve_records)} CVE records")
 
-        df = self.feature_engineer.build_dataframe(cve_records)
+        if isinstance(cve_records, pd.DataFrame):
+            df = self.feature_engineer.build_frame(cve_records)
+        else:
+            df = self.feature_engineer.build_dataframe(cve_records)
         
         if len(df) < 50:
             logger.warning("Insufficient data for training")
@@ -146,14 +151,46 @@ class ExploitPredictor:
         }
 
     def predict_batch(self, cve_records: list) -> list:
-        """Predict for multiple CVEs."""
+        """Predict for multiple CVEs from one feature matrix, highest probability first."""
+        if not cve_records:
+            return []
+        if self.model is None:
+            results = []
+            for cve in cve_records:
+                prediction = self._heuristic_predict(cve)
+                prediction["cve_id"] = cve.get("cve_id", "")
+                results.append(prediction)
+            return sorted(results, key=lambda x: x["exploit_probability"], reverse=True)
+
+        features = self.feature_engineer.extract_frame(pd.DataFrame(cve_records))
+        probabilities = self._predict_features(features)
         results = []
-        for cve in cve_records:
-            prediction = self.predict(cve)
-            prediction["cve_id"] = cve.get("cve_id", "")
-            results.append(prediction)
+        for cve, row, proba in zip(cve_records, features.to_dict("records"), probabilities):
+            results.append({
+                "exploit_probability": round(float(proba), 4),
+                "confidence": round(float(max(proba, 1 - proba)), 4),
+                "risk_level": self._risk_level(proba),
+                "model_type": self.model_type,
+                "key_factors": self._explain_prediction(row),
+                "cve_id": cve.get("cve_id", ""),
+            })
         return sorted(results, key=lambda x: x["exploit_probability"], reverse=True)
 
+    def predict_proba(self, cves) -> np.ndarray:
+        """Exploit probability for every row of a CVE DataFrame or Arrow table (trained model only)."""
+        if self.model is None:
+            raise ValueError("No trained exploit prediction model")
+        return self._predict_features(self.feature_engineer.extract_frame(cves))
+
+    def _predict_features(self, features: pd.DataFrame) -> np.ndarray:
+        X = features[self.feature_columns].fillna(0)
+        if X.empty:
+            return np.zeros(0)
+        return np.concatenate([
+            self.model.predict_proba(X.iloc[start:start + PREDICT_CHUNK_SIZE])[:, 1]
+            for start in range(0, len(X), PREDICT_CHUNK_SIZE)
+        ])
+
     def _heuristic_predict(self, cve_data: Dict) -> Dict:
         """Fallback heuristic when no trained model is available."""
         score = 0.0
@@ -0,0 +1,339 @@
+"""
+Patch-set optimizer: which package upgrades buy the most risk reduction.
+
+Open findings are grouped into patch actions by (package, installed
+version). Upgrading the package on one host closes the action's findings
+there at a cost of one patch job, so an action can be rolled out to only
+part of its hosts. Hosts are chosen with lazy (CELF) greedy: each action
+sits in the heap under its best per-host marginal fleet-risk reduction
+(ties broken by progress on the pairs holding the host's max, see
+``plan``), stale entries are re-evaluated only when they reach the top,
+and a fresh action takes every host that beats the next heap entry in one
+step while the job, host and action budgets allow.
+
+Marginal reductions are exact under the scoring model: removing an
+action's matches lowers each touched asset's match count, closes pairs
+with no remaining match, and the asset's score becomes the max over its
+surviving pairs (RiskBatch.rescore). All state is flat arrays over the
+simulator's RiskMatrix plus two CSR indexes (action -> matches,
+asset -> pairs), so one evaluation touches only the affected assets, and
+hosts are independent: patching one host never changes another's gain.
+"""
+import heapq
+import logging
+import time
+from typing import Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.risk.simulator import RiskMatrix
+
+logger = logging.getLogger("vulnguard.remediation.optimizer")
+
+PLAN_ASSET_LIMIT = 50  # asset ids listed per action in the response
+TOP_PAIRS_SCANNED = 4  # per asset, before falling back to all of its pairs
+
+
+def _csr(keys: np.ndarray, n_rows: int):
+    """(order, ptr) so that order[ptr[k]:ptr[k+1]] are the positions with key k."""
+    order = np.argsort(keys, kind="stable")
+    ptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_rows), out=ptr[1:])
+    return order, ptr
+
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray):
+    """Flattened positions of the slices [start, start+length), and the slice each came from."""
+    local = np.repeat(np.arange(len(starts)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return np.repeat(starts, lengths) + offsets, local
+
+
+class PatchOptimizer:
+    def __init__(self, matrix: RiskMatrix):
+        self.matrix = matrix
+        open_idx = np.flatnonzero(matrix.match_open)
+        self.open_idx = open_idx
+
+        # Actions: (package, installed version) over open findings
+        keys = matrix.match_package[open_idx] * max(len(matrix.version_index), 1) + matrix.match_version[open_idx]
+        codes, uniques = pd.factorize(keys, sort=False)
+        self.n_actions = len(uniques)
+        self.action_order, self.action_ptr = _csr(codes, self.n_actions)
+        self.action_match = open_idx  # action_order indexes into this
+        self.match_action = codes  # per open match
+        self.asset_order, self.asset_ptr = _csr(matrix.match_asset[open_idx], len(matrix.asset_ids))
+        versions = np.empty(len(matrix.version_index), dtype=object)
+        for version, code in matrix.version_index.items():
+            versions[code] = version
+        first = open_idx[self.action_order[self.action_ptr[:-1]]] if self.n_actions else np.zeros(0, dtype=np.int64)
+        self.action_package = matrix.package_names[first]
+        self.action_version = versions[matrix.match_version[first]] if self.n_actions else np.zeros(0, dtype=object)
+
+        # asset -> pairs, each asset's pairs ordered by current score (best first)
+        _, self.pair_ptr = _csr(matrix.pair_asset, len(matrix.asset_ids))
+        self._dec = np.zeros(len(matrix.pair_asset), dtype=np.int64)  # scratch, kept all-zero
+
+    def _matches(self, action: int, done: np.ndarray, hosts: Optional[np.ndarray] = None) -> np.ndarray:
+        """Open matches of an action on the hosts it has not been applied to yet.
+
+        ``hosts`` restricts them to those hosts, once the host budget is spent.
+        """
+        positions = self.action_order[self.action_ptr[action]:self.action_ptr[action + 1]]
+        positions = positions[~done[positions]]
+        if hosts is not None:
+            positions = positions[hosts[self.matrix.match_asset[self.action_match[positions]]]]
+        return self.action_match[positions]
+
+    def _actions_on(self, assets: np.ndarray) -> np.ndarray:
+        """Actions with an open match on any of ``assets``."""
+        starts = self.asset_ptr[assets]
+        positions, _ = _ranges(starts, self.asset_ptr[assets + 1] - starts)
+        return np.unique(self.match_action[self.asset_order[positions]])
+
+    def _best_surviving(self, assets, new_count, live, pair_score, pair_order, limit=None):
+        """Max rescored surviving pair per asset, scanning at most ``limit`` best pairs each.
+
+        Also returns, per asset, whether the scan was conclusive: a pair's
+        score only falls when its asset's count falls, so once the best
+        rescored pair beats the current score of the first unscanned pair,
+        no later pair can win.
+        """
+        starts = self.pair_ptr[assets]
+        lengths = self.pair_ptr[assets + 1] - starts
+        if limit is not None:
+            lengths = np.minimum(lengths, limit)
+        positions, local = _ranges(starts, lengths)
+        candidates = pair_order[positions]
+
+        alive = live[candidates] - self._dec[candidates] > 0
+        best = np.zeros(len(assets))
+        if alive.any():
+            np.maximum.at(
+                best, local[alive],
+                self.matrix.batch.rescore(new_count[local[alive]], candidates[alive]),
+            )
+        if limit is None:
+            return best, np.ones(len(assets), dtype=bool)
+        has_next = self.pair_ptr[assets + 1] - starts > limit
+        next_score = np.full(len(assets), -1.0)
+        next_score[has_next] = pair_score[pair_order[starts[has_next] + limit]]
+        return best, best >= next_score
+
+    def _reorder(self, assets, live, count, pair_score, pair_order) -> None:
+        """Refresh pair scores on ``assets`` after a change and re-sort their CSR segments."""
+        starts = self.pair_ptr[assets]
+        lengths = self.pair_ptr[assets + 1] - starts
+        positions, local = _ranges(starts, lengths)
+        pairs = pair_order[positions]
+        fresh = np.where(
+            live[pairs] > 0,
+            self.matrix.batch.rescore(count[self.matrix.pair_asset[pairs]], pairs),
+            -1.0,  # closed pairs sort last
+        )
+        pair_score[pairs] = fresh
+        pair_order[positions] = pairs[np.lexsort((-fresh, local))]
+
+    def _evaluate(self, matches: np.ndarray, live, count, score, pair_score, pair_order) -> Dict:
+        """Per-host effect of removing ``matches``: each host's new count, score and gain."""
+        m = self.matrix
+        assets, removed = np.unique(m.match_asset[matches], return_counts=True)
+        pairs, dec = np.unique(m.match_pair[matches], return_counts=True)
+        new_count = count[assets] - removed
+
+        self._dec[pairs] = dec
+        new_score, exact = self._best_surviving(assets, new_count, live, pair_score, pair_order, TOP_PAIRS_SCANNED)
+        if not exact.all():
+            rest = np.flatnonzero(~exact)
+            new_score[rest], _ = self._best_surviving(assets[rest], new_count[rest], live, pair_score, pair_order)
+        self._dec[pairs] = 0
+
+        # Progress on the pairs holding each host's max, weighted by the share of their
+        # matches removed: ranks hosts whose max is also held by another package
+        local = np.searchsorted(assets, m.pair_asset[pairs])
+        at_max = pair_score[pairs] >= score[assets][local] - 1e-9
+        relief = np.bincount(
+            local[at_max], weights=(pair_score[pairs] * dec / np.maximum(live[pairs], 1))[at_max],
+            minlength=len(assets),
+        )
+        return {
+            "gains": score[assets] - new_score,
+            "relief": relief,
+            "assets": assets,
+            "removed": removed,
+            "new_count": new_count,
+            "new_score": new_score,
+            "pairs": pairs,
+            "dec": dec,
+        }
+
+    @staticmethod
+    def _keys(ev: Dict, hosts: np.ndarray, hosts_left):
+        """Per-host (gain, relief) of an evaluation; hosts beyond the host budget get neither."""
+        if hosts_left > 0:
+            return ev["gains"], ev["relief"]
+        allowed = hosts[ev["assets"]]
+        return np.where(allowed, ev["gains"], 0.0), np.where(allowed, ev["relief"], 0.0)
+
+    @staticmethod
+    def _push(heap, action: int, gains: np.ndarray, relief: np.ndarray, round_no: int) -> None:
+        """Queue an action under its best host by (gain, relief), even when that is zero."""
+        if not len(gains):
+            return
+        best = np.lexsort((relief, gains))[-1]
+        heapq.heappush(heap, (-gains[best], -relief[best], action, round_no))
+
+    def plan(
+        self,
+        max_jobs: Optional[int] = None,
+        max_hosts: Optional[int] = None,
+        max_actions: Optional[int] = None,
+    ) -> Dict:
+        """Greedy patch plan within the budgets.
+
+        Fleet risk is a sum of per-asset maxima, so gains are not
+        diminishing: when two packages tie at an asset's max, neither has
+        any gain on its own, and an action can gain only after another was
+        applied. Hosts are therefore ranked by gain and then by relief,
+        their progress on the pairs holding the asset's max; actions with
+        neither are parked until a step touches one of their hosts. A
+        zero-gain host step is kept only if its host's score drops later in
+        the plan.
+        """
+        started = time.perf_counter()
+        m = self.matrix
+        live = np.bincount(m.match_pair, minlength=len(m.pair_asset)).astype(np.int64)
+        count = m.base_count.copy()
+        score = m.asset_score.copy()
+        pair_score = m.pair_score.copy()
+        pair_order = np.lexsort((-pair_score, m.pair_asset))
+        done = np.zeros(len(self.action_match), dtype=bool)  # per open match: its host was patched
+        fleet_before = float(score.sum())
+        max_jobs = max_jobs if max_jobs is not None else np.inf
+        max_hosts = max_hosts if max_hosts is not None else np.inf
+        max_actions = max_actions if max_actions is not None else np.inf
+
+        heap, evaluations = [], {}
+        hosts_total = np.zeros(self.n_actions, dtype=np.int64)
+        for action in range(self.n_actions):
+            ev = evaluations[action] = self._evaluate(
+                self._matches(action, done), live, count, score, pair_score, pair_order
+            )
+            hosts_total[action] = len(ev["assets"])
+            self._push(heap, action, ev["gains"], ev["relief"], 0)
+        evaluated = self.n_actions
+
+        hosts = np.zeros(len(m.asset_ids), dtype=bool)
+        jobs_used, hosts_used, round_no, picked, steps, parked = 0, 0, 0, set(), [], set()
+        while heap and jobs_used < max_jobs:
+            _, _, action, stamp = heapq.heappop(heap)
+            if action not in picked and len(picked) >= max_actions:
+                continue
+            if stamp != round_no:  # stale marginal: re-evaluate against the current state
+                ev = evaluations[action] = self._evaluate(
+                    self._matches(action, done, hosts if hosts_used >= max_hosts else None),
+                    live, count, score, pair_score, pair_order,
+                )
+                evaluated += 1
+                self._push(heap, action, *self._keys(ev, hosts, max_hosts - hosts_used), round_no)
+                continue
+
+            # Every host that would be popped before the next heap entry is taken in this step
+            ev = evaluations[action]
+            gains, relief = self._keys(ev, hosts, max_hosts - hosts_used)
+            if not (gains > 0).any() and not (relief > 0).any():
+                parked.add(action)  # nothing to do yet; re-checked once a step touches its hosts
+                continue
+            take = np.lexsort((-relief, -gains))
+            useful = (gains[take] > 0) | (relief[take] > 0)
+            if heap:
+                next_gain, next_relief = -heap[0][0], -heap[0][1]
+                useful &= (gains[take] > next_gain) | ((gains[take] == next_gain) & (relief[take] >= next_relief))
+            take = take[useful]
+            new_hosts = ~hosts[ev["assets"][take]]
+            take = take[~new_hosts | (np.cumsum(new_hosts) <= max_hosts - hosts_used)]
+            take = take[:int(min(max_jobs - jobs_used, len(take)))]
+
+            assets = ev["assets"][take]
+            on = np.isin(m.pair_asset[ev["pairs"]], assets)
+            pairs = ev["pairs"][on]
+            live[pairs] -= ev["dec"][on]
+            count[assets] = ev["new_count"][take]
+            score[assets] = ev["new_score"][take]
+            self._reorder(assets, live, count, pair_score, pair_order)
+            positions = self.action_order[self.action_ptr[action]:self.action_ptr[action + 1]]
+            done[positions[np.isin(m.match_asset[self.action_match[positions]], assets)]] = True
+            hosts_used += int((~hosts[assets]).sum())
+            hosts[assets] = True
+            jobs_used += len(assets)
+            round_no += 1
+            picked.add(action)
+            closed = pairs[live[pairs] == 0]
+            steps.append((
+                action, assets, ev["removed"][take],
+                np.bincount(np.searchsorted(ev["assets"], m.pair_asset[closed]), minlength=len(ev["assets"]))[take],
+                gains[take], float(score.sum()),
+            ))
+
+            # The action's other hosts are unaffected by this step; requeue them fresh
+            ev = evaluations[action] = self._evaluate(
+                self._matches(action, done, hosts if hosts_used >= max_hosts else None),
+                live, count, score, pair_score, pair_order,
+            )
+            evaluated += 1
+            self._push(heap, action, *self._keys(ev, hosts, max_hosts - hosts_used), round_no)
+            # Only actions sharing a host with this step can have gained anything
+            for other in parked.intersection(self._actions_on(assets).tolist()):
+                parked.discard(other)
+                heapq.heappush(heap, (0.0, 0.0, other, -1))
+
+        # Drop zero-gain host steps after their host's last score drop: patching
+        # fewer findings never raises a score, so every step's result is unchanged
+        last_drop = np.full(len(m.asset_ids), -1)
+        for index, (_, assets, _, _, gains, _) in enumerate(steps):
+            last_drop[assets[gains > 0]] = index
+        kept = []
+        for index, (action, assets, findings, closed, gains, fleet_after) in enumerate(steps):
+            keep = (gains > 0) | (last_drop[assets] > index)
+            if keep.any():
+                kept.append((action, assets[keep], findings[keep], closed[keep], gains[keep], fleet_after))
+        steps = kept
+        hosts = np.zeros(len(m.asset_ids), dtype=bool)
+        for step in steps:
+            hosts[step[1]] = True
+
+        # One entry per action in order of first pick, summing its steps
+        actions = {}
+        for action, assets, findings, closed, gain, fleet_after in steps:
+            entry = actions.setdefault(action, {
+                "package": self.action_package[action],
+                "installed_version": self.action_version[action],
+                "hosts": 0,
+                "hosts_total": int(hosts_total[action]),
+                "asset_ids": [],
+                "findings_closed": 0,
+                "cves_closed": 0,
+                "risk_reduction": 0.0,
+            })
+            entry["hosts"] += len(assets)
+            entry["asset_ids"].extend(m.asset_ids[assets].tolist())
+            entry["findings_closed"] += int(findings.sum())
+            entry["cves_closed"] += int(closed.sum())
+            entry["risk_reduction"] += float(gain.sum())
+            entry["fleet_risk_after"] = fleet_after
+        for entry in actions.values():
+            entry["asset_ids"] = entry["asset_ids"][:PLAN_ASSET_LIMIT]
+            entry["risk_reduction"] = round(entry["risk_reduction"], 2)
+            entry["fleet_risk_after"] = round(entry["fleet_risk_after"], 2)
+
+        fleet_after = steps[-1][5] if steps else fleet_before
+        return {
+            "actions": list(actions.values()),
+            "jobs": sum(len(step[1]) for step in steps),
+            "hosts": int(hosts.sum()),
+            "fleet_risk_before": round(fleet_before, 2),
+            "fleet_risk_after": round(fleet_after, 2),
+            "risk_reduction": round(fleet_before - fleet_after, 2),
+            "candidate_actions": self.n_actions,
+            "evaluations": evaluated,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
@@ -1,3 +1,4 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
@@ -11,6 +12,8 @@ from app.remediation.models import PatchJob, PatchStatus
 from app.remediation.schemas import PatchJobCreate, PatchJobResponse, PatchApproval, PatchSchedule
 from app.remediation.scripts.linux_patch import generate_apt_patch, generate_yum_patch
 from app.remediation.scripts.windows_patch import generate_windows_patch
+from app.remediation.optimizer import PatchOptimizer
+from app.risk.simulator import get_matrix
 
 router = APIRouter(prefix="/api/remediation", tags=["Automated Remediation"])
 
@@ -34,6 +37,23 @@ async def list_patch_jobs(
     return result.scalars().all()
 
 
+@router.get("/optimize")
+async def optimize_patch_plan(
+    max_jobs: Optional[int] = Query(None, ge=1),
+    max_hosts: Optional[int] = Query(None, ge=1),
+    max_actions: Optional[int] = Query(25, ge=1, le=500),
+    refresh: bool = False,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Package upgrades that cut the most fleet risk within a job / host budget."""
+    matrix = await get_matrix(db, refresh=refresh)
+    # CPU-bound for seconds on large fleets: keep it off the event loop
+    return await asyncio.to_thread(
+        PatchOptimizer(matrix).plan, max_jobs=max_jobs, max_hosts=max_hosts, max_actions=max_actions,
+    )
+
+
 @router.post("/jobs", response_model=PatchJobResponse, status_code=201)
 async def create_patch_job(
     job_data: PatchJobCreate,
@@ -0,0 +1,57 @@
+"""
+Per-asset cache of risk detail responses.
+
+Entries are keyed by asset and validated against a fingerprint of
+everything the scores depend on: the asset row, its match set and the
+last update of any matched CVE. A changed fingerprint drops every cached
+page for that asset. The fingerprint is a single indexed aggregate, so a
+hit costs one small query instead of a join and a scoring pass.
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class AssetResultCache:
+    """Bounded LRU over assets, each holding up to ``max_entries_per_asset`` results."""
+
+    def __init__(self, max_assets: int = 512, max_entries_per_asset: int = 16):
+        self.max_assets = max_assets
+        self.max_entries_per_asset = max_entries_per_asset
+        self._assets: "OrderedDict[int, tuple]" = OrderedDict()  # asset_id -> (fingerprint, OrderedDict)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, asset_id: int, fingerprint: Hashable, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._assets.get(asset_id)
+            if entry is None or entry[0] != fingerprint or key not in entry[1]:
+                self.misses += 1
+                return None
+            self._assets.move_to_end(asset_id)
+            entry[1].move_to_end(key)
+            self.hits += 1
+            return entry[1][key]
+
+    def put(self, asset_id: int, fingerprint: Hashable, key: Hashable, value: Any) -> None:
+        with self._lock:
+            entry = self._assets.get(asset_id)
+            if entry is None or entry[0] != fingerprint:
+                entry = (fingerprint, OrderedDict())
+                self._assets[asset_id] = entry
+            self._assets.move_to_end(asset_id)
+            results = entry[1]
+            results[key] = value
+            results.move_to_end(key)
+            while len(results) > self.max_entries_per_asset:
+                results.popitem(last=False)
+            while len(self._assets) > self.max_assets:
+                self._assets.popitem(last=False)
+
+    def invalidate(self, asset_id: Optional[int] = None) -> None:
+        with self._lock:
+            if asset_id is None:
+                self._assets.clear()
+            else:
+                self._assets.pop(asset_id, None)
@@ -0,0 +1,133 @@
+"""
+Dependency tracking for incremental risk rescoring.
+
+A (asset, CVE) risk score depends on:
+  - CVE fields: EPSS, ML exploit probability, CVSS, KEV, public exploit
+  - asset fields: criticality, network zone, internet exposure, business unit
+  - the asset's match count (attack path factor)
+
+ORM flush hooks watch those fields and record the owning asset or CVE in
+``risk_dirty_entities`` inside the same transaction as the change. The
+``flush_dirty_risk_scores`` task drains that table in batches and rescores
+only the affected rows. Other Core writes of tracked fields call
+``mark_dirty`` themselves.
+
+Ingestion is the exception: NVD, EPSS and exploit updates go through the
+ORM and KEV flags through a Core UPDATE, but all of them record their CVE
+changes in the ingestion change log, whose ``risk`` consumer rescores
+them. CVE changes in sessions that called ``record_changes`` are therefore
+not tracked here, so each change is rescored once.
+"""
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Set
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.database import is_sqlite
+from app.assets.models import Asset
+from app.ingestion.models import CVE
+from app.ingestion.changelog import CHANGES_LOGGED
+from app.matching.models import VulnerabilityMatch
+from app.risk.models import RiskDirtyEntity
+
+logger = logging.getLogger("vulnguard.risk.dependencies")
+
+DIRTY_ASSET = "asset"
+DIRTY_CVE = "cve"
+
+ASSET_RISK_FIELDS = ("criticality", "network_zone", "is_internet_facing", "business_unit")
+CVE_RISK_FIELDS = (
+    "epss_score", "predicted_exploit_probability", "cvss_v3_score", "is_kev", "has_public_exploit",
+)
+MATCH_KEY_FIELDS = ("asset_id", "cve_id")
+DIRTY_WRITE_CHUNK_SIZE = 5000
+
+_SESSION_KEY = "risk_dirty"
+
+
+def _changed(obj, fields) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in fields)
+
+
+def _pending(session: Session) -> Dict[str, Set[str]]:
+    return session.info.setdefault(_SESSION_KEY, {DIRTY_ASSET: set(), DIRTY_CVE: set()})
+
+
+def _mark_match(dirty: Dict[str, Set[str]], match: VulnerabilityMatch) -> None:
+    # A match added or removed changes its asset's count, and so every score on
+    # that asset; a re-pointed match also changes the asset it moved away from.
+    previous = inspect(match).attrs.asset_id.history.deleted or ()
+    for asset_id in (match.asset_id, *previous):
+        if asset_id is not None:
+            dirty[DIRTY_ASSET].add(str(asset_id))
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_dirty(session: Session, flush_context, instances) -> None:
+    """Note which assets / CVEs this flush touches while attribute history is still available."""
+    dirty = _pending(session)
+    cves_logged = session.info.get(CHANGES_LOGGED, False)
+
+    for obj in session.new:
+        if isinstance(obj, VulnerabilityMatch):
+            _mark_match(dirty, obj)
+
+    for obj in session.dirty:
+        if isinstance(obj, Asset) and obj.id is not None and _changed(obj, ASSET_RISK_FIELDS):
+            dirty[DIRTY_ASSET].add(str(obj.id))
+        elif isinstance(obj, CVE) and not cves_logged and obj.cve_id and _changed(obj, CVE_RISK_FIELDS):
+            dirty[DIRTY_CVE].add(obj.cve_id)
+        elif isinstance(obj, VulnerabilityMatch) and _changed(obj, MATCH_KEY_FIELDS):
+            _mark_match(dirty, obj)
+
+    for obj in session.deleted:
+        if isinstance(obj, VulnerabilityMatch):
+            _mark_match(dirty, obj)
+        elif isinstance(obj, Asset) and obj.id is not None:
+            dirty[DIRTY_ASSET].add(str(obj.id))
+
+
+def _dirty_rows(dirty: Dict[str, Iterable[str]]) -> List[Dict]:
+    now = datetime.utcnow()
+    return [
+        {"entity_type": entity_type, "entity_key": key, "marked_at": now}
+        for entity_type, keys in dirty.items()
+        for key in keys
+    ]
+
+
+def _upsert_dirty():
+    stmt = (sqlite.insert if is_sqlite else postgresql.insert)(RiskDirtyEntity)
+    return stmt.on_conflict_do_update(
+        index_elements=["entity_type", "entity_key"],
+        set_={"marked_at": stmt.excluded.marked_at},
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _persist_dirty(session: Session, flush_context) -> None:
+    """Upsert the collected keys into risk_dirty_entities in the flush's transaction."""
+    dirty = session.info.pop(_SESSION_KEY, None)
+    if not dirty:
+        return
+    rows = _dirty_rows(dirty)
+    if rows:
+        session.connection().execute(_upsert_dirty(), rows)
+
+
+async def mark_dirty(db: AsyncSession, entity_type: str, keys: Iterable[str]) -> int:
+    """Record dirty keys for writes that bypass the ORM (Core executemany), in the caller's transaction."""
+    rows = _dirty_rows({entity_type: [str(k) for k in keys]})
+    for start in range(0, len(rows), DIRTY_WRITE_CHUNK_SIZE):
+        await db.execute(_upsert_dirty(), rows[start:start + DIRTY_WRITE_CHUNK_SIZE])
+    return len(rows)
+
+
+def _discard_pending(session: Session, *args) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+event.listen(Session, "after_rollback", _discard_pending)
@@ -1,9 +1,28 @@
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence
 from datetime import datetime
+import numpy as np
+import pandas as pd
+from sqlalchemy import case, func
 
 logger = logging.getLogger("vulnguard.risk.engine")
 
+RISK_LEVELS = np.array(["MINIMAL", "LOW", "MEDIUM", "HIGH", "CRITICAL"], dtype=object)
+RISK_LEVEL_THRESHOLDS = np.array([20.0, 40.0, 60.0, 80.0])
+
+# Column names accepted by calculate_columns / calculate_frame, with per-row defaults
+FACTOR_COLUMNS = {
+    "exploit_probability": 0.0,
+    "cvss_score": 0.0,
+    "asset_criticality": "medium",
+    "network_zone": "internal",
+    "is_internet_facing": False,
+    "business_unit": "unassigned",
+    "vulnerability_count": 1,
+    "has_exploit": False,
+    "is_kev": False,
+}
+
 
 class RiskScoringEngine:
     """
@@ -146,21 +165,303 @@ class RiskScoringEngine:
 
     def calculate_batch(self, items: List[Dict]) -> List[Dict]:
         """Calculate risk for multiple asset-vulnerability pairs."""
-        results = []
-        for item in items:
-            score = self.calculate_risk(
-                exploit_probability=item.get("exploit_probability", 0),
-                cvss_score=item.get("cvss_score", 0),
-                asset_criticality=item.get("asset_criticality", "medium"),
-                network_zone=item.get("network_zone", "internal"),
-                is_internet_facing=item.get("is_internet_facing", False),
-                business_unit=item.get("business_unit", "unassigned"),
-                vulnerability_count=item.get("vulnerability_count", 1),
-                has_exploit=item.get("has_exploit", False),
-                is_kev=item.get("is_kev", False),
-            )
-            score["asset_id"] = item.get("asset_id")
-            score["cve_id"] = item.get("cve_id")
-            results.append(score)
-        
-        return sorted(results, key=lambda x: x["risk_score"], reverse=True)
+        if not items:
+            return []
+        columns = {
+            name: [item.get(name, default) for item in items]
+            for name, default in FACTOR_COLUMNS.items()
+        }
+        batch = self.calculate_columns(
+            **columns,
+            asset_id=[item.get("asset_id") for item in items],
+            cve_id=[item.get("cve_id") for item in items],
+        )
+        return batch.to_dicts(batch.order())
+
+    # ── Columnar API ──
+
+    @staticmethod
+    def _lookup(values, mapping: Dict[str, float], default: float, n: int, lower: bool = False) -> np.ndarray:
+        """Vectorized ``mapping.get(value, default)`` via a hash map over the column."""
+        if isinstance(values, str) or values is None:
+            key = values.lower() if lower and values else values
+            return np.full(n, mapping.get(key, default), dtype=np.float64)
+        series = pd.Series(values, copy=False)
+        if lower:
+            series = series.str.lower()
+        return series.map(mapping).fillna(default).to_numpy(dtype=np.float64)
+
+    @staticmethod
+    def _round2(values: np.ndarray) -> np.ndarray:
+        """``round(x, 2)`` per element; ties near .xx5 defer to Python's exact rounding."""
+        rounded = np.round(values, 2)
+        scaled = values * 100
+        ties = np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6)
+        for i in ties:
+            rounded[i] = round(float(values[i]), 2)
+        return rounded
+
+    @staticmethod
+    def _column(values, n: int, dtype) -> np.ndarray:
+        arr = np.asarray(values, dtype=dtype)
+        return np.broadcast_to(arr, (n,)) if arr.ndim == 0 else arr
+
+    def calculate_columns(
+        self,
+        exploit_probability,
+        cvss_score,
+        asset_criticality,
+        network_zone,
+        is_internet_facing,
+        business_unit,
+        vulnerability_count=1,
+        has_exploit=False,
+        is_kev=False,
+        asset_id: Optional[Sequence] = None,
+        cve_id: Optional[Sequence] = None,
+    ) -> "RiskBatch":
+        """Score N pairs from column arrays (or scalars broadcast to N) in one vectorized pass.
+
+        Same formula as ``calculate_risk``; breakdown dicts are only built for
+        the rows later requested from the returned ``RiskBatch``.
+        """
+        n = len(np.atleast_1d(np.asarray(exploit_probability, dtype=np.float64)))
+
+        exploit_probability = self._column(exploit_probability, n, np.float64)
+        cvss_score = self._column(cvss_score, n, np.float64)
+        vulnerability_count = self._column(vulnerability_count, n, np.float64)
+        is_internet_facing = self._column(is_internet_facing, n, bool)
+        has_exploit = self._column(has_exploit, n, bool)
+        is_kev = self._column(is_kev, n, bool)
+
+        exploit_factor = np.minimum(exploit_probability, 1.0)
+        criticality_factor = self._lookup(asset_criticality, self.CRITICALITY_WEIGHTS, 0.5, n)
+        attack_path_factor = np.minimum(
+            (cvss_score / 10) * np.minimum(1.0 + (vulnerability_count - 1) * 0.05, 2.0), 1.0
+        )
+        exposure_factor = self._lookup(network_zone, self.ZONE_EXPOSURE, 0.4, n)
+        exposure_factor = np.where(is_internet_facing, np.maximum(exposure_factor, 0.9), exposure_factor)
+        business_factor = self._lookup(business_unit, self.BUSINESS_IMPACT, 0.3, n, lower=True)
+        urgency_boost = np.minimum(1.0 + is_kev * 0.3 + has_exploit * 0.2, 1.5)
+
+        raw_score = (
+            exploit_factor * 0.30 +
+            criticality_factor * 0.20 +
+            attack_path_factor * 0.20 +
+            exposure_factor * 0.15 +
+            business_factor * 0.15
+        ) * urgency_boost
+        risk_score = self._round2(np.minimum(raw_score * 100, 100))
+
+        return RiskBatch(
+            risk_score=risk_score,
+            level_index=np.searchsorted(RISK_LEVEL_THRESHOLDS, risk_score, side="right"),
+            factors={
+                "exploit_probability": exploit_factor,
+                "asset_criticality": criticality_factor,
+                "attack_path_weight": attack_path_factor,
+                "exposure_factor": exposure_factor,
+                "business_impact": business_factor,
+                "urgency_boost": urgency_boost,
+            },
+            inputs={
+                "asset_criticality": asset_criticality,
+                "cvss_score": cvss_score,
+                "vulnerability_count": vulnerability_count,
+                "network_zone": network_zone,
+                "is_internet_facing": is_internet_facing,
+                "business_unit": business_unit,
+                "asset_id": asset_id,
+                "cve_id": cve_id,
+            },
+        )
+
+    def calculate_frame(self, df: pd.DataFrame) -> "RiskBatch":
+        """``calculate_columns`` over a DataFrame whose columns use the FACTOR_COLUMNS names."""
+        columns = {
+            name: df[name].to_numpy() if name in df else default
+            for name, default in FACTOR_COLUMNS.items()
+        }
+        return self.calculate_columns(
+            **columns,
+            asset_id=df["asset_id"].to_numpy() if "asset_id" in df else None,
+            cve_id=df["cve_id"].to_numpy() if "cve_id" in df else None,
+        )
+
+    # ── SQL ──
+
+    def sql_score_expression(
+        self,
+        predicted_exploit_probability,
+        epss_score,
+        cvss_score,
+        has_exploit,
+        is_kev,
+        asset_criticality: str,
+        network_zone: str,
+        is_internet_facing: bool,
+        business_unit: str,
+        vulnerability_count: int = 1,
+    ):
+        """Unrounded risk score (0–100) for one asset as a SQL expression over CVE columns.
+
+        Lets the database order and filter an asset's findings by score; exact
+        rounded scores and breakdowns still come from ``calculate_columns``.
+        """
+        def cap(expr, upper):
+            return case((expr > upper, upper), else_=expr)
+
+        predicted = func.coalesce(predicted_exploit_probability, 0)
+        exploit_factor = cap(
+            case((predicted != 0, predicted), else_=func.coalesce(epss_score, 0)), 1.0
+        )
+        path_multiplier = min(1.0 + (vulnerability_count - 1) * 0.05, 2.0)
+        attack_path_factor = cap(func.coalesce(cvss_score, 0) / 10.0 * path_multiplier, 1.0)
+
+        exposure = self.ZONE_EXPOSURE.get(network_zone, 0.4)
+        if is_internet_facing:
+            exposure = max(exposure, 0.9)
+        asset_part = (
+            self.CRITICALITY_WEIGHTS.get(asset_criticality, 0.5) * 0.20 +
+            exposure * 0.15 +
+            self.BUSINESS_IMPACT.get(business_unit.lower(), 0.3) * 0.15
+        )
+        urgency_boost = cap(
+            1.0 + case((is_kev == True, 0.3), else_=0.0) + case((has_exploit == True, 0.2), else_=0.0),  # noqa: E712
+            1.5,
+        )
+        raw_score = (exploit_factor * 0.30 + attack_path_factor * 0.20 + asset_part) * urgency_boost
+        return cap(raw_score * 100, 100.0)
+
+
+# Raw inputs echoed in a breakdown next to the factor values
+BREAKDOWN_INPUTS = (
+    "asset_criticality", "cvss_score", "vulnerability_count",
+    "network_zone", "is_internet_facing", "business_unit",
+)
+
+
+class RiskBatch:
+    """Columnar scores from ``RiskScoringEngine.calculate_columns``."""
+
+    WEIGHTS = {
+        "exploit_probability": 0.30,
+        "asset_criticality": 0.20,
+        "attack_path_weight": 0.20,
+        "exposure_factor": 0.15,
+        "business_impact": 0.15,
+    }
+
+    def __init__(self, risk_score: np.ndarray, level_index: np.ndarray, factors: Dict, inputs: Dict):
+        self.risk_score = risk_score
+        self.level_index = level_index
+        self.factors = factors
+        self.inputs = inputs
+        self.calculated_at = datetime.utcnow().isoformat()
+
+    def __len__(self) -> int:
+        return len(self.risk_score)
+
+    @property
+    def risk_level(self) -> np.ndarray:
+        return RISK_LEVELS[self.level_index]
+
+    def rescore(self, vulnerability_count, indices: Optional[np.ndarray] = None) -> np.ndarray:
+        """Scores of the given rows if their asset's match count were ``vulnerability_count``.
+
+        Only the attack path factor depends on the count, so this reuses the
+        other stored factors and is pure array arithmetic.
+        """
+        if indices is None:
+            indices = slice(None)
+        f = self.factors
+        cvss = np.asarray(self.inputs["cvss_score"], dtype=np.float64)[indices]
+        counts = np.asarray(vulnerability_count, dtype=np.float64)
+        attack_path_factor = np.minimum((cvss / 10) * np.minimum(1.0 + (counts - 1) * 0.05, 2.0), 1.0)
+        w = self.WEIGHTS
+        raw_score = (
+            f["exploit_probability"][indices] * w["exploit_probability"] +
+            f["asset_criticality"][indices] * w["asset_criticality"] +
+            attack_path_factor * w["attack_path_weight"] +
+            f["exposure_factor"][indices] * w["exposure_factor"] +
+            f["business_impact"][indices] * w["business_impact"]
+        ) * f["urgency_boost"][indices]
+        return RiskScoringEngine._round2(np.minimum(raw_score * 100, 100))
+
+    def order(self, limit: Optional[int] = None) -> np.ndarray:
+        """Row indices by descending score (stable); only the top ``limit`` are fully sorted."""
+        if limit is not None and limit < len(self):
+            top = np.argpartition(-self.risk_score, limit - 1)[:limit]
+            return top[np.argsort(-self.risk_score[top], kind="stable")]
+        return np.argsort(-self.risk_score, kind="stable")
+
+    def _input(self, name: str, i: int):
+        values = self.inputs.get(name)
+        if values is None:
+            return None
+        if isinstance(values, str) or not hasattr(values, "__len__"):
+            return values  # scalar broadcast to every row
+        value = values[i]
+        return value.item() if isinstance(value, np.generic) else value
+
+    def breakdown(self, i: int) -> Dict:
+        """Per-row breakdown, identical in shape to ``calculate_risk``."""
+        return self.render_breakdown(
+            {name: float(values[i]) for name, values in self.factors.items()},
+            {name: self._input(name, i) for name in BREAKDOWN_INPUTS},
+        )
+
+    @classmethod
+    def render_breakdown(cls, f: Dict[str, float], inputs: Dict) -> Dict:
+        """Breakdown dict from factor values and raw inputs (e.g. stored factor columns)."""
+        w = cls.WEIGHTS
+        return {
+            "exploit_probability": {
+                "value": round(f["exploit_probability"], 4),
+                "weight": w["exploit_probability"],
+                "contribution": round(f["exploit_probability"] * w["exploit_probability"] * 100, 2),
+            },
+            "asset_criticality": {
+                "value": round(f["asset_criticality"], 4),
+                "weight": w["asset_criticality"],
+                "input": inputs.get("asset_criticality"),
+                "contribution": round(f["asset_criticality"] * w["asset_criticality"] * 100, 2),
+            },
+            "attack_path_weight": {
+                "value": round(f["attack_path_weight"], 4),
+                "weight": w["attack_path_weight"],
+                "cvss_score": inputs.get("cvss_score"),
+                "vulnerability_count": int(inputs.get("vulnerability_count") or 1),
+                "contribution": round(f["attack_path_weight"] * w["attack_path_weight"] * 100, 2),
+            },
+            "exposure_factor": {
+                "value": round(f["exposure_factor"], 4),
+                "weight": w["exposure_factor"],
+                "network_zone": inputs.get("network_zone"),
+                "is_internet_facing": bool(inputs.get("is_internet_facing")),
+                "contribution": round(f["exposure_factor"] * w["exposure_factor"] * 100, 2),
+            },
+            "business_impact": {
+                "value": round(f["business_impact"], 4),
+                "weight": w["business_impact"],
+                "business_unit": inputs.get("business_unit"),
+                "contribution": round(f["business_impact"] * w["business_impact"] * 100, 2),
+            },
+            "urgency_boost": round(f["urgency_boost"], 2),
+        }
+
+    def to_dict(self, i: int) -> Dict:
+        return {
+            "risk_score": float(self.risk_score[i]),
+            "risk_level": RISK_LEVELS[self.level_index[i]],
+            "breakdown": self.breakdown(i),
+            "calculated_at": self.calculated_at,
+            "asset_id": self._input("asset_id", i),
+            "cve_id": self._input("cve_id", i),
+        }
+
+    def to_dicts(self, indices: Optional[Sequence[int]] = None) -> List[Dict]:
+        """Result dicts (with breakdowns) for the requested rows only."""
+        if indices is None:
+            indices = range(len(self))
+        return [self.to_dict(int(i)) for i in indices]
@@ -0,0 +1,142 @@
+"""
+Materialized risk heatmap.
+
+``risk_heatmap_summary`` holds one row per business unit with asset counts
+per risk bucket, so the dashboard reads O(business units) rows. A unit's
+row is recomputed with a single GROUP BY whenever one of its assets'
+risk_score or business_unit changes: through ORM flushes (hooks below) or
+through the bulk score refresh in app.risk.tasks.
+"""
+import logging
+from typing import Iterable, List, Optional, Set
+from sqlalchemy import select, delete, func, case, event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.database import is_sqlite
+from app.assets.models import Asset
+from app.risk.models import RiskHeatmapSummary
+
+logger = logging.getLogger("vulnguard.risk.heatmap")
+
+UNASSIGNED = "unassigned"
+HEATMAP_FIELDS = ("critical", "high", "medium", "low", "total_assets")
+
+_business_unit = func.coalesce(func.nullif(Asset.business_unit, ""), UNASSIGNED)
+_score = func.coalesce(Asset.risk_score, 0)
+
+_SESSION_KEY = "risk_heatmap_dirty"
+
+
+def _bucket(condition):
+    return func.sum(case((condition, 1), else_=0))
+
+
+def heatmap_select(business_units: Optional[Iterable[str]] = None):
+    """Bucketed asset counts per business unit, computed in the database."""
+    stmt = select(
+        _business_unit.label("business_unit"),
+        _bucket(_score >= 80).label("critical"),
+        _bucket((_score >= 60) & (_score < 80)).label("high"),
+        _bucket((_score >= 40) & (_score < 60)).label("medium"),
+        _bucket(_score < 40).label("low"),
+        func.count(Asset.id).label("total_assets"),
+    ).group_by(_business_unit)
+    if business_units is not None:
+        stmt = stmt.where(_business_unit.in_(list(business_units)))
+    return stmt
+
+
+def _refresh_statements(business_units: Optional[Iterable[str]] = None) -> List:
+    """Upsert the recomputed rows, then drop rows of units that no longer have assets.
+
+    Concurrent refreshes of the same unit both land on ON CONFLICT instead
+    of racing a DELETE and INSERT on the primary key.
+    """
+    fill = (sqlite.insert if is_sqlite else postgresql.insert)(RiskHeatmapSummary).from_select(
+        ["business_unit", *HEATMAP_FIELDS], heatmap_select(business_units)
+    )
+    fill = fill.on_conflict_do_update(
+        index_elements=["business_unit"],
+        set_={name: fill.excluded[name] for name in (*HEATMAP_FIELDS, "updated_at")},
+    )
+    clear = delete(RiskHeatmapSummary).where(RiskHeatmapSummary.business_unit.not_in(select(_business_unit)))
+    if business_units is not None:
+        clear = clear.where(RiskHeatmapSummary.business_unit.in_(list(business_units)))
+    return [fill, clear]
+
+
+async def refresh_heatmap(db: AsyncSession, business_units: Optional[Iterable[str]] = None) -> None:
+    """Recompute summary rows for the given units (all units when None) in the caller's transaction."""
+    if business_units is not None:
+        business_units = list(business_units)
+        if not business_units:
+            return
+    for stmt in _refresh_statements(business_units):
+        await db.execute(stmt)
+
+
+async def business_units_of(db: AsyncSession, asset_ids: Iterable[int]) -> Set[str]:
+    result = await db.execute(
+        select(_business_unit).where(Asset.id.in_(list(asset_ids))).distinct()
+    )
+    return set(result.scalars().all())
+
+
+async def read_heatmap(db: AsyncSession) -> List[dict]:
+    rows = (await db.execute(
+        select(RiskHeatmapSummary).order_by(RiskHeatmapSummary.business_unit)
+    )).scalars().all()
+    if not rows:
+        # First read after deploy (or an empty fleet): materialize once
+        await refresh_heatmap(db)
+        await db.commit()
+        rows = (await db.execute(
+            select(RiskHeatmapSummary).order_by(RiskHeatmapSummary.business_unit)
+        )).scalars().all()
+    return [
+        {"business_unit": r.business_unit, **{name: getattr(r, name) for name in HEATMAP_FIELDS}}
+        for r in rows
+    ]
+
+
+# ── ORM maintenance ──
+
+def _unit(value) -> str:
+    return value or UNASSIGNED
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_units(session: Session, flush_context, instances) -> None:
+    units = session.info.setdefault(_SESSION_KEY, set())
+    for obj in session.new:
+        if isinstance(obj, Asset):
+            units.add(_unit(obj.business_unit))
+    for obj in session.deleted:
+        if isinstance(obj, Asset):
+            units.add(_unit(obj.business_unit))
+    for obj in session.dirty:
+        if not isinstance(obj, Asset):
+            continue
+        state = inspect(obj)
+        bu_history = state.attrs.business_unit.history
+        if bu_history.has_changes() or state.attrs.risk_score.history.has_changes():
+            units.add(_unit(obj.business_unit))
+            units.update(_unit(old) for old in bu_history.deleted or ())
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_units(session: Session, flush_context) -> None:
+    units = session.info.pop(_SESSION_KEY, None)
+    if not units:
+        return
+    connection = session.connection()
+    for stmt in _refresh_statements(units):
+        connection.execute(stmt)
+
+
+def _discard_pending(session: Session, *args) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+event.listen(Session, "after_rollback", _discard_pending)
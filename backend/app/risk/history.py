@@ -0,0 +1,177 @@
+"""
+Risk history: daily snapshots rolled up into weekly and monthly points.
+
+Each day ``snapshot`` writes one ``day`` row per asset (its risk_score) and
+one per business unit (mean/max/min score, critical and total asset
+counts). ``downsample`` folds complete weeks older than
+DAILY_RETENTION_DAYS into ``week`` rows and weeks older than
+WEEKLY_RETENTION_DAYS into ``month`` rows (a week belongs to the month it
+starts in). The granularities never overlap in time, so a trend query is a
+single index range scan over (scope, scope_key, granularity, period_start).
+"""
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+import pandas as pd
+from sqlalchemy import select, insert, delete, func, case, literal, cast, String, or_, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.assets.models import Asset
+from app.risk.heatmap import UNASSIGNED
+from app.risk.models import RiskHistory
+
+logger = logging.getLogger("vulnguard.risk.history")
+
+SCOPE_ASSET = "asset"
+SCOPE_BUSINESS_UNIT = "business_unit"
+
+DAY = "day"
+WEEK = "week"
+MONTH = "month"
+
+DAILY_RETENTION_DAYS = 90
+WEEKLY_RETENTION_DAYS = 365
+
+CRITICAL_THRESHOLD = 80
+
+HISTORY_FIELDS = ("avg_score", "max_score", "min_score", "critical_assets", "total_assets")
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+async def snapshot(db: AsyncSession, day: Optional[date] = None) -> Dict:
+    """Write (or overwrite) the ``day`` rows for every asset and business unit."""
+    day = day or datetime.utcnow().date()
+    await db.execute(
+        delete(RiskHistory).where(RiskHistory.granularity == DAY, RiskHistory.period_start == day)
+    )
+
+    columns = ["scope", "scope_key", "granularity", "period_start", *HISTORY_FIELDS, "samples"]
+    score = func.coalesce(Asset.risk_score, 0.0)
+    is_critical = case((score >= CRITICAL_THRESHOLD, 1.0), else_=0.0)
+
+    assets = await db.execute(insert(RiskHistory).from_select(columns, select(
+        literal(SCOPE_ASSET), cast(Asset.id, String), literal(DAY), literal(day),
+        score, score, score, is_critical, literal(1.0), literal(1),
+    )))
+
+    business_unit = func.coalesce(func.nullif(Asset.business_unit, ""), UNASSIGNED)
+    units = await db.execute(insert(RiskHistory).from_select(columns, select(
+        literal(SCOPE_BUSINESS_UNIT), business_unit, literal(DAY), literal(day),
+        func.avg(score), func.max(score), func.min(score),
+        func.sum(is_critical), func.count(Asset.id) * 1.0, literal(1),
+    ).group_by(business_unit)))
+
+    logger.info(f"Risk history snapshot for {day}: {assets.rowcount} assets, {units.rowcount} business units")
+    return {"day": day.isoformat(), "assets": assets.rowcount, "business_units": units.rowcount}
+
+
+async def _rollup(db: AsyncSession, source: str, target: str, cutoff: date, period_of) -> int:
+    """Fold ``source`` rows before ``cutoff`` into ``target`` rows, sample-weighted."""
+    rows = (await db.execute(
+        select(RiskHistory).where(RiskHistory.granularity == source, RiskHistory.period_start < cutoff)
+    )).scalars().all()
+    if not rows:
+        return 0
+
+    df = pd.DataFrame([
+        {"id": r.id, "scope": r.scope, "scope_key": r.scope_key, "period": period_of(r.period_start),
+         "samples": r.samples or 1, **{name: getattr(r, name) or 0.0 for name in HISTORY_FIELDS}}
+        for r in rows
+    ])
+
+    # Merge into any rollup already written for the same periods
+    existing = (await db.execute(
+        select(RiskHistory).where(
+            RiskHistory.granularity == target,
+            RiskHistory.period_start.in_(df["period"].unique().tolist()),
+        )
+    )).scalars().all()
+    if existing:
+        df = pd.concat([df, pd.DataFrame([
+            {"id": r.id, "scope": r.scope, "scope_key": r.scope_key, "period": r.period_start,
+             "samples": r.samples or 1, **{name: getattr(r, name) or 0.0 for name in HISTORY_FIELDS}}
+            for r in existing
+        ])], ignore_index=True)
+
+    weighted = ["avg_score", "critical_assets", "total_assets"]
+    for name in weighted:
+        df[name] = df[name] * df["samples"]
+    grouped = df.groupby(["scope", "scope_key", "period"], sort=False).agg(
+        avg_score=("avg_score", "sum"),
+        max_score=("max_score", "max"),
+        min_score=("min_score", "min"),
+        critical_assets=("critical_assets", "sum"),
+        total_assets=("total_assets", "sum"),
+        samples=("samples", "sum"),
+    ).reset_index()
+    for name in weighted:
+        grouped[name] = grouped[name] / grouped["samples"]
+
+    await db.execute(delete(RiskHistory).where(RiskHistory.id.in_(df["id"].tolist())))
+    await db.execute(insert(RiskHistory), [
+        {"scope": g.scope, "scope_key": g.scope_key, "granularity": target, "period_start": g.period,
+         "avg_score": round(float(g.avg_score), 2), "max_score": float(g.max_score),
+         "min_score": float(g.min_score), "critical_assets": round(float(g.critical_assets), 2),
+         "total_assets": round(float(g.total_assets), 2), "samples": int(g.samples)}
+        for g in grouped.itertuples(index=False)
+    ])
+    return len(rows)
+
+
+async def downsample(db: AsyncSession, today: Optional[date] = None) -> Dict:
+    """Roll old daily rows into weeks and old weekly rows into months."""
+    today = today or datetime.utcnow().date()
+    days = await _rollup(db, DAY, WEEK, week_start(today - timedelta(days=DAILY_RETENTION_DAYS)), week_start)
+    weeks = await _rollup(db, WEEK, MONTH, month_start(today - timedelta(days=WEEKLY_RETENTION_DAYS)), month_start)
+    logger.info(f"Risk history downsampled: {days} daily rows to weeks, {weeks} weekly rows to months")
+    return {"daily_rolled_up": days, "weekly_rolled_up": weeks}
+
+
+def _range_filter(start: date, end: date):
+    # A rollup row counts when its period overlaps [start, end]
+    return and_(
+        RiskHistory.period_start <= end,
+        or_(
+            and_(RiskHistory.granularity == DAY, RiskHistory.period_start >= start),
+            and_(RiskHistory.granularity == WEEK, RiskHistory.period_start >= week_start(start)),
+            and_(RiskHistory.granularity == MONTH, RiskHistory.period_start >= month_start(start)),
+        ),
+    )
+
+
+def _point(r: RiskHistory) -> Dict:
+    return {
+        "period_start": r.period_start.isoformat(),
+        "granularity": r.granularity,
+        **{name: getattr(r, name) for name in HISTORY_FIELDS},
+        "samples": r.samples,
+    }
+
+
+async def trend(db: AsyncSession, scope: str, scope_key: str, start: date, end: date) -> List[Dict]:
+    """Points for one asset or business unit between ``start`` and ``end``, oldest first."""
+    rows = (await db.execute(
+        select(RiskHistory)
+        .where(RiskHistory.scope == scope, RiskHistory.scope_key == scope_key, _range_filter(start, end))
+        .order_by(RiskHistory.period_start)
+    )).scalars().all()
+    return [_point(r) for r in rows]
+
+
+async def trends_by_scope(db: AsyncSession, scope: str, start: date, end: date) -> Dict[str, List[Dict]]:
+    """Points for every key of a scope (e.g. all business units), oldest first."""
+    rows = (await db.execute(
+        select(RiskHistory)
+        .where(RiskHistory.scope == scope, _range_filter(start, end))
+        .order_by(RiskHistory.scope_key, RiskHistory.period_start)
+    )).scalars().all()
+    series: Dict[str, List[Dict]] = {}
+    for r in rows:
+        series.setdefault(r.scope_key, []).append(_point(r))
+    return series
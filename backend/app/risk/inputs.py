@@ -0,0 +1,76 @@
+"""
+Risk score inputs loaded set-based: one join of matches, assets and CVEs.
+
+Shared by the recalculation tasks, the what-if simulator and the patch
+optimizer so they all score exactly the same (asset, CVE) inputs.
+"""
+import pandas as pd
+from sqlalchemy import select, func
+from app.assets.models import Asset
+from app.ingestion.models import CVE
+from app.matching.models import VulnerabilityMatch
+
+
+def enum_value(value, default: str) -> str:
+    # pandas stores missing strings as NaN, which is truthy
+    if not value or value != value:
+        return default
+    return value.value if hasattr(value, "value") else value
+
+
+def pair_select(*criteria, count_assets=None):
+    """Matches joined to their asset and CVE, with the asset's match count.
+
+    Every input of a risk score in one statement; ``count_assets`` narrows the
+    per-asset count aggregation to the assets a caller is about to score.
+    """
+    counts = select(
+        VulnerabilityMatch.asset_id,
+        func.count(VulnerabilityMatch.id).label("vulnerability_count"),
+    ).group_by(VulnerabilityMatch.asset_id)
+    if count_assets is not None:
+        counts = counts.where(VulnerabilityMatch.asset_id.in_(count_assets))
+    counts = counts.subquery()
+
+    return (
+        select(
+            VulnerabilityMatch.id.label("match_id"),
+            VulnerabilityMatch.asset_id,
+            VulnerabilityMatch.cve_id,
+            VulnerabilityMatch.software_name,
+            VulnerabilityMatch.software_version,
+            VulnerabilityMatch.status,
+            Asset.criticality,
+            Asset.network_zone,
+            Asset.is_internet_facing,
+            Asset.business_unit,
+            CVE.predicted_exploit_probability,
+            CVE.epss_score,
+            CVE.cvss_v3_score,
+            CVE.has_public_exploit,
+            CVE.is_kev,
+            counts.c.vulnerability_count,
+        )
+        .select_from(VulnerabilityMatch)
+        .join(Asset, Asset.id == VulnerabilityMatch.asset_id)
+        .join(CVE, CVE.cve_id == VulnerabilityMatch.cve_id)
+        .join(counts, counts.c.asset_id == VulnerabilityMatch.asset_id)
+        .where(*criteria)
+    )
+
+
+def pair_frame(rows) -> pd.DataFrame:
+    """``pair_select`` rows as a DataFrame with engine-ready input columns (one row per match)."""
+    df = pd.DataFrame([r._mapping for r in rows])
+
+    # Same fallbacks as the per-row callers (``x or default``)
+    predicted = df["predicted_exploit_probability"]
+    df["exploit_probability"] = predicted.where(predicted.fillna(0) != 0, df["epss_score"]).fillna(0.0)
+    df["cvss_score"] = df["cvss_v3_score"].fillna(0.0)
+    df["asset_criticality"] = df["criticality"].map(lambda v: enum_value(v, "medium"))
+    df["network_zone"] = df["network_zone"].map(lambda v: enum_value(v, "internal"))
+    df["business_unit"] = df["business_unit"].map(lambda v: enum_value(v, "unassigned"))
+    df["is_internet_facing"] = df["is_internet_facing"].fillna(False).astype(bool)
+    df["has_exploit"] = df["has_public_exploit"].fillna(False).astype(bool)
+    df["is_kev"] = df["is_kev"].fillna(False).astype(bool)
+    return df
@@ -1,10 +1,25 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, JSON, ForeignKey, UniqueConstraint, Index
 from app.database import Base
 
 
+# RiskBatch factor name -> RiskScore column
+RISK_FACTOR_COLUMNS = {
+    "exploit_probability": "exploit_probability_factor",
+    "asset_criticality": "criticality_factor",
+    "attack_path_weight": "attack_path_factor",
+    "exposure_factor": "exposure_factor",
+    "business_impact": "business_impact_factor",
+    "urgency_boost": "urgency_boost",
+}
+
+
 class RiskScore(Base):
     __tablename__ = "risk_scores"
+    __table_args__ = (
+        # One current score per (asset, CVE); recalculation upserts on this key
+        UniqueConstraint("asset_id", "cve_id", name="uq_risk_scores_asset_cve"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     asset_id = Column(Integer, ForeignKey("assets.id"), index=True)
@@ -13,14 +28,67 @@ class RiskScore(Base):
     risk_score = Column(Float, nullable=False)
     risk_level = Column(String(20))
     
-    # Breakdown
-    exploit_probability_factor = Column(Float)
-    criticality_factor = Column(Float)
-    attack_path_factor = Column(Float)
-    exposure_factor = Column(Float)
-    business_impact_factor = Column(Float)
-    urgency_boost = Column(Float, default=1.0)
-    
-    breakdown_json = Column(JSON)
+    # Breakdown, stored as factor columns; the breakdown dict is rendered on read
+    exploit_probability_factor = Column(Float(precision=24))
+    criticality_factor = Column(Float(precision=24))
+    attack_path_factor = Column(Float(precision=24))
+    exposure_factor = Column(Float(precision=24))
+    business_impact_factor = Column(Float(precision=24))
+    urgency_boost = Column(Float(precision=24), default=1.0)
+    cvss_score = Column(Float(precision=24))
+    vulnerability_count = Column(Integer)
+
+    breakdown_json = Column(JSON)  # legacy rows only; see migrate_risk_scores.py
     
     calculated_at = Column(DateTime, default=datetime.utcnow)
+
+
+# Top-K reads (ORDER BY risk_score DESC LIMIT k) walk this index instead of sorting the table
+Index("ix_risk_scores_risk_score_desc", RiskScore.risk_score.desc())
+
+
+class RiskDirtyEntity(Base):
+    """An asset or CVE whose risk inputs changed and whose scores await a rescore."""
+    __tablename__ = "risk_dirty_entities"
+    __table_args__ = (
+        UniqueConstraint("entity_type", "entity_key", name="uq_risk_dirty_entity"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity_type = Column(String(10), nullable=False)  # asset, cve
+    entity_key = Column(String(50), nullable=False)  # asset id or CVE id
+    marked_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
+class RiskHeatmapSummary(Base):
+    """Per-business-unit asset counts by risk bucket; maintained from Asset.risk_score."""
+    __tablename__ = "risk_heatmap_summary"
+
+    business_unit = Column(String(100), primary_key=True)  # "unassigned" for assets without one
+    critical = Column(Integer, default=0)
+    high = Column(Integer, default=0)
+    medium = Column(Integer, default=0)
+    low = Column(Integer, default=0)
+    total_assets = Column(Integer, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class RiskHistory(Base):
+    """Risk snapshot rollups: one row per (scope, key, granularity, period)."""
+    __tablename__ = "risk_history"
+    __table_args__ = (
+        UniqueConstraint("scope", "scope_key", "granularity", "period_start", name="uq_risk_history_period"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    scope = Column(String(20), nullable=False)  # asset, business_unit
+    scope_key = Column(String(100), nullable=False)  # asset id or business unit name
+    granularity = Column(String(10), nullable=False)  # day, week, month
+    period_start = Column(Date, nullable=False)
+
+    avg_score = Column(Float, default=0.0)
+    max_score = Column(Float, default=0.0)
+    min_score = Column(Float, default=0.0)
+    critical_assets = Column(Float, default=0.0)  # mean count per sample (business_unit scope)
+    total_assets = Column(Float, default=0.0)
+    samples = Column(Integer, default=1)  # daily snapshots folded into this row
@@ -1,3 +1,4 @@
+from celery.result import AsyncResult
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func
@@ -7,45 +8,114 @@ from app.auth.models import User
 from app.assets.models import Asset
 from app.ingestion.models import CVE
 from app.matching.models import VulnerabilityMatch
-from app.risk.engine import RiskScoringEngine
-from app.risk.models import RiskScore
+from app.risk.cache import AssetResultCache
+from app.risk.engine import RiskScoringEngine, RiskBatch
+from app.risk.models import RiskScore, RISK_FACTOR_COLUMNS
+from app.risk.heatmap import read_heatmap
+from app.risk.topk import stream_top_k
+from app.risk.schemas import SimulationRequest
+from app.risk.simulator import get_matrix
+from app.risk import history
+from app.risk.tasks import recalculate_all_risks
+from app.celery_app import celery
+from datetime import datetime, timedelta
 from typing import Optional
 
 router = APIRouter(prefix="/api/risk", tags=["Risk Scoring"])
 
 risk_engine = RiskScoringEngine()
+detail_cache = AssetResultCache()
+
+
+def _stored_breakdown(score: RiskScore, asset: Optional[Asset]) -> Optional[dict]:
+    """Render a stored score's breakdown from its factor columns (legacy rows keep their JSON)."""
+    if score.exploit_probability_factor is None:
+        return score.breakdown_json
+    factors = {name: getattr(score, column) or 0.0 for name, column in RISK_FACTOR_COLUMNS.items()}
+    inputs = {
+        # float32 column; CVSS has one decimal
+        "cvss_score": round(score.cvss_score, 1) if score.cvss_score is not None else None,
+        "vulnerability_count": score.vulnerability_count,
+    }
+    if asset is not None:
+        inputs.update(
+            asset_criticality=(asset.criticality.value if hasattr(asset.criticality, 'value') else asset.criticality) if asset.criticality else "medium",
+            network_zone=(asset.network_zone.value if hasattr(asset.network_zone, 'value') else asset.network_zone) if asset.network_zone else "internal",
+            is_internet_facing=asset.is_internet_facing,
+            business_unit=asset.business_unit or "unassigned",
+        )
+    return RiskBatch.render_breakdown(factors, inputs)
 
 
 @router.get("/scores")
 async def get_risk_scores(
     business_unit: Optional[str] = None,
     min_score: float = Query(0, ge=0, le=100),
-    limit: int = Query(50, le=200),
+    limit: int = Query(50, ge=1, le=200),
+    risk_level: Optional[str] = None,
+    is_kev: Optional[bool] = None,
+    has_exploit: Optional[bool] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """Get risk scores ordered by severity."""
-    query = select(RiskScore).where(RiskScore.risk_score >= min_score)
-    query = query.order_by(RiskScore.risk_score.desc()).limit(limit)
-    result = await db.execute(query)
-    scores = result.scalars().all()
+    query = (
+        select(RiskScore, Asset)
+        .outerjoin(Asset, Asset.id == RiskScore.asset_id)
+        .where(RiskScore.risk_score >= min_score, RiskScore.cve_id.isnot(None))
+    )
+    if business_unit:
+        if business_unit == "unassigned":
+            query = query.where(func.coalesce(Asset.business_unit, "").in_(["", "unassigned"]))
+        else:
+            query = query.where(Asset.business_unit == business_unit)
+    if risk_level:
+        query = query.where(RiskScore.risk_level == risk_level.upper())
+
+    if is_kev is None and has_exploit is None:
+        # Walks ix_risk_scores_risk_score_desc and stops after ``limit`` rows
+        query = query.order_by(RiskScore.risk_score.desc()).limit(limit)
+        scores = (await db.execute(query)).all()
+    else:
+        # Cross-table filter: stream the qualifying rows through a bounded heap
+        query = query.join(CVE, CVE.cve_id == RiskScore.cve_id)
+        if is_kev is not None:
+            query = query.where(CVE.is_kev == is_kev)
+        if has_exploit is not None:
+            query = query.where(CVE.has_public_exploit == has_exploit)
+        scores = await stream_top_k(db, query, limit, key=lambda row: row[0].risk_score)
     
     return [
         {
             "asset_id": s.asset_id,
+            "hostname": asset.hostname if asset else None,
+            "business_unit": asset.business_unit if asset else None,
             "cve_id": s.cve_id,
             "risk_score": s.risk_score,
             "risk_level": s.risk_level,
-            "breakdown": s.breakdown_json,
+            "breakdown": _stored_breakdown(s, asset),
             "calculated_at": s.calculated_at,
         }
-        for s in scores
+        for s, asset in scores
     ]
 
 
+# Sort keys for an asset's vulnerability_risks; "risk_score" is built per asset
+DETAIL_SORT_COLUMNS = {
+    "cvss_score": CVE.cvss_v3_score,
+    "epss_score": CVE.epss_score,
+    "published_date": CVE.published_date,
+    "cve_id": VulnerabilityMatch.cve_id,
+}
+
+
 @router.get("/asset/{asset_id}")
 async def asset_risk_detail(
     asset_id: int,
+    sort_by: str = Query("risk_score", pattern="^(risk_score|cvss_score|epss_score|published_date|cve_id)$"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
@@ -57,43 +127,110 @@ async def asset_risk_detail(
         from fastapi import HTTPException
         raise HTTPException(404, "Asset not found")
 
-    # Get matched vulns
-    matches = await db.execute(
-        select(VulnerabilityMatch).where(VulnerabilityMatch.asset_id == asset_id)
+    # Fingerprint of every score input: asset row, match set, matched CVE updates
+    match_count, last_match_id, cve_count, cves_updated = (await db.execute(
+        select(
+            func.count(VulnerabilityMatch.id),
+            func.max(VulnerabilityMatch.id),
+            func.count(CVE.id),
+            func.max(CVE.updated_at),
+        )
+        .select_from(VulnerabilityMatch)
+        .outerjoin(CVE, CVE.cve_id == VulnerabilityMatch.cve_id)
+        .where(VulnerabilityMatch.asset_id == asset_id)
+    )).one()
+    fingerprint = (asset.updated_at, match_count, last_match_id, cve_count, cves_updated)
+    cache_key = (sort_by, order, offset, limit)
+    cached = detail_cache.get(asset_id, fingerprint, cache_key)
+    if cached is not None:
+        return cached
+
+    asset_inputs = {
+        "asset_criticality": (asset.criticality.value if hasattr(asset.criticality, 'value') else asset.criticality) if asset.criticality else "medium",
+        "network_zone": (asset.network_zone.value if hasattr(asset.network_zone, 'value') else asset.network_zone) if asset.network_zone else "internal",
+        "is_internet_facing": bool(asset.is_internet_facing),
+        "business_unit": asset.business_unit or "unassigned",
+        "vulnerability_count": match_count,
+    }
+    score_expr = risk_engine.sql_score_expression(
+        CVE.predicted_exploit_probability, CVE.epss_score, CVE.cvss_v3_score,
+        CVE.has_public_exploit, CVE.is_kev, **asset_inputs,
     )
-    match_list = matches.scalars().all()
+    sort_expr = score_expr if sort_by == "risk_score" else DETAIL_SORT_COLUMNS[sort_by]
+    sort_expr = sort_expr.desc() if order == "desc" else sort_expr.asc()
+
+    # One join for the requested page; the database orders and slices it
+    rows = (await db.execute(
+        select(
+            VulnerabilityMatch.cve_id,
+            CVE.description,
+            CVE.predicted_exploit_probability,
+            CVE.epss_score,
+            CVE.cvss_v3_score,
+            CVE.has_public_exploit,
+            CVE.is_kev,
+        )
+        .select_from(VulnerabilityMatch)
+        .join(CVE, CVE.cve_id == VulnerabilityMatch.cve_id)
+        .where(VulnerabilityMatch.asset_id == asset_id)
+        .order_by(sort_expr, VulnerabilityMatch.id)
+        .offset(offset)
+        .limit(limit)
+    )).all()
 
-    # Calculate risk for each match
     scored_vulns = []
-    for m in match_list:
-        cve_result = await db.execute(select(CVE).where(CVE.cve_id == m.cve_id))
-        cve = cve_result.scalar_one_or_none()
-        if cve:
-            score = risk_engine.calculate_risk(
-                exploit_probability=cve.predicted_exploit_probability or cve.epss_score or 0,
-                cvss_score=cve.cvss_v3_score or 0,
-                asset_criticality=(asset.criticality.value if hasattr(asset.criticality, 'value') else asset.criticality) if asset.criticality else "medium",
-                network_zone=(asset.network_zone.value if hasattr(asset.network_zone, 'value') else asset.network_zone) if asset.network_zone else "internal",
-                is_internet_facing=asset.is_internet_facing,
-                business_unit=asset.business_unit or "unassigned",
-                vulnerability_count=len(match_list),
-                has_exploit=cve.has_public_exploit,
-                is_kev=cve.is_kev,
-            )
-            score["cve_id"] = cve.cve_id
-            score["cve_description"] = (cve.description or "")[:200]
+    if rows:
+        batch = risk_engine.calculate_columns(
+            exploit_probability=[r.predicted_exploit_probability or r.epss_score or 0 for r in rows],
+            cvss_score=[r.cvss_v3_score or 0 for r in rows],
+            has_exploit=[bool(r.has_public_exploit) for r in rows],
+            is_kev=[bool(r.is_kev) for r in rows],
+            asset_id=asset.id,
+            cve_id=[r.cve_id for r in rows],
+            **asset_inputs,
+        )
+        for i, r in enumerate(rows):
+            score = batch.to_dict(i)
+            score["cve_description"] = (r.description or "")[:200]
             scored_vulns.append(score)
 
-    scored_vulns.sort(key=lambda x: x["risk_score"], reverse=True)
+    # Overall score is the top finding, whatever page was asked for
+    if sort_by == "risk_score" and order == "desc" and offset == 0:
+        top = rows[0] if rows else None
+    else:
+        top = (await db.execute(
+            select(CVE.predicted_exploit_probability, CVE.epss_score, CVE.cvss_v3_score,
+                   CVE.has_public_exploit, CVE.is_kev)
+            .select_from(VulnerabilityMatch)
+            .join(CVE, CVE.cve_id == VulnerabilityMatch.cve_id)
+            .where(VulnerabilityMatch.asset_id == asset_id)
+            .order_by(score_expr.desc(), VulnerabilityMatch.id)
+            .limit(1)
+        )).first() if cve_count else None
+    overall = None
+    if top:
+        overall = risk_engine.calculate_columns(
+            exploit_probability=top.predicted_exploit_probability or top.epss_score or 0,
+            cvss_score=top.cvss_v3_score or 0,
+            has_exploit=bool(top.has_public_exploit),
+            is_kev=bool(top.is_kev),
+            **asset_inputs,
+        )
 
-    return {
+    response = {
         "asset_id": asset.id,
         "hostname": asset.hostname,
-        "overall_risk_score": scored_vulns[0]["risk_score"] if scored_vulns else 0,
-        "overall_risk_level": scored_vulns[0]["risk_level"] if scored_vulns else "MINIMAL",
+        "overall_risk_score": float(overall.risk_score[0]) if overall else 0,
+        "overall_risk_level": overall.risk_level[0] if overall else "MINIMAL",
         "vulnerability_risks": scored_vulns,
-        "total_vulnerabilities": len(scored_vulns),
+        "total_vulnerabilities": cve_count,
+        "sort_by": sort_by,
+        "order": order,
+        "offset": offset,
+        "limit": limit,
     }
+    detail_cache.put(asset_id, fingerprint, cache_key, response)
+    return response
 
 
 @router.get("/heatmap")
@@ -102,75 +239,83 @@ async def risk_heatmap(
     current_user: User = Depends(get_current_user),
 ):
     """Get risk heatmap data grouped by business unit."""
-    result = await db.execute(select(Asset))
-    assets = result.scalars().all()
-
-    heatmap = {}
-    for asset in assets:
-        bu = asset.business_unit or "unassigned"
-        if bu not in heatmap:
-            heatmap[bu] = {"critical": 0, "high": 0, "medium": 0, "low": 0, "total_assets": 0}
-        
-        heatmap[bu]["total_assets"] += 1
-        score = asset.risk_score or 0
-        if score >= 80:
-            heatmap[bu]["critical"] += 1
-        elif score >= 60:
-            heatmap[bu]["high"] += 1
-        elif score >= 40:
-            heatmap[bu]["medium"] += 1
-        else:
-            heatmap[bu]["low"] += 1
+    return await read_heatmap(db)
+
+
+def _trend_range(days: int):
+    end = datetime.utcnow().date()
+    return end - timedelta(days=days), end
+
+
+@router.get("/trends/business-units")
+async def business_unit_trends(
+    days: int = Query(90, ge=1, le=3650),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Risk trend for every business unit over the last ``days`` days."""
+    start, end = _trend_range(days)
+    return await history.trends_by_scope(db, history.SCOPE_BUSINESS_UNIT, start, end)
+
+
+@router.get("/trends/business-unit/{business_unit}")
+async def business_unit_trend(
+    business_unit: str,
+    days: int = Query(90, ge=1, le=3650),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Risk trend for one business unit."""
+    start, end = _trend_range(days)
+    points = await history.trend(db, history.SCOPE_BUSINESS_UNIT, business_unit, start, end)
+    return {"business_unit": business_unit, "days": days, "points": points}
+
+
+@router.get("/trends/asset/{asset_id}")
+async def asset_trend(
+    asset_id: int,
+    days: int = Query(90, ge=1, le=3650),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Risk trend for one asset."""
+    start, end = _trend_range(days)
+    points = await history.trend(db, history.SCOPE_ASSET, str(asset_id), start, end)
+    return {"asset_id": asset_id, "days": days, "points": points}
 
-    return [{"business_unit": k, **v} for k, v in heatmap.items()]
+
+@router.post("/simulate")
+async def simulate_patches(
+    request: SimulationRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """What-if: fleet risk if the given (asset, package) findings were patched."""
+    matrix = await get_matrix(db, refresh=request.refresh)
+    return matrix.simulate(
+        [r.model_dump() for r in request.removals], asset_limit=request.asset_limit
+    )
 
 
 @router.get("/calculate")
 async def calculate_all_risks(
-    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Recalculate all risk scores."""
-    # Get all assets with their matches
-    assets = (await db.execute(select(Asset))).scalars().all()
-    total_calculated = 0
-
-    for asset in assets:
-        matches = (await db.execute(
-            select(VulnerabilityMatch).where(VulnerabilityMatch.asset_id == asset.id)
-        )).scalars().all()
-
-        max_score = 0
-        for m in matches:
-            cve = (await db.execute(select(CVE).where(CVE.cve_id == m.cve_id))).scalar_one_or_none()
-            if not cve:
-                continue
-
-            result = risk_engine.calculate_risk(
-                exploit_probability=cve.predicted_exploit_probability or cve.epss_score or 0,
-                cvss_score=cve.cvss_v3_score or 0,
-                asset_criticality=(asset.criticality.value if hasattr(asset.criticality, 'value') else asset.criticality) if asset.criticality else "medium",
-                network_zone=(asset.network_zone.value if hasattr(asset.network_zone, 'value') else asset.network_zone) if asset.network_zone else "internal",
-                is_internet_facing=asset.is_internet_facing,
-                business_unit=asset.business_unit or "unassigned",
-                vulnerability_count=len(matches),
-                has_exploit=cve.has_public_exploit,
-                is_kev=cve.is_kev,
-            )
-
-            # Store individual risk score
-            risk_entry = RiskScore(
-                asset_id=asset.id,
-                cve_id=cve.cve_id,
-                risk_score=result["risk_score"],
-                risk_level=result["risk_level"],
-                breakdown_json=result["breakdown"],
-            )
-            db.add(risk_entry)
-            max_score = max(max_score, result["risk_score"])
-            total_calculated += 1
-
-        asset.risk_score = max_score
-
-    await db.commit()
-    return {"total_calculated": total_calculated}
+    """Queue a full-fleet risk recalculation."""
+    task = recalculate_all_risks.delay()
+    return {"status": "queued", "task_id": task.id}
+
+
+@router.get("/calculate/{task_id}")
+async def calculate_status(
+    task_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """Progress of a queued recalculation."""
+    result = AsyncResult(task_id, app=celery)
+    response = {"task_id": task_id, "state": result.state}
+    if result.state == "PROGRESS":
+        response["progress"] = result.info
+    elif result.successful():
+        response["result"] = result.result
+    return response
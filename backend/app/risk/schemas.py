@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import Optional, List
+
+
+class SimulatedRemoval(BaseModel):
+    package: str
+    version: Optional[str] = None  # only findings on this installed version
+    asset_ids: Optional[List[int]] = None  # None = every asset with the package
+
+
+class SimulationRequest(BaseModel):
+    removals: List[SimulatedRemoval]
+    asset_limit: int = Field(100, ge=1, le=5000)
+    refresh: bool = False  # reload the in-memory matrix first
@@ -0,0 +1,219 @@
+"""
+In-memory what-if risk simulation.
+
+``RiskMatrix`` loads the fleet's match/risk inputs once (one join via
+app.risk.inputs) into flat numpy arrays: one entry per match row, one per
+unique (asset, CVE) pair and one per asset. ``simulate`` then applies
+hypothetical removals of (asset, package) findings: removed matches lower
+their asset's match count, a pair disappears once none of its matches
+remain, and only the surviving pairs on touched assets are rescored with
+the shared RiskScoringEngine. Asset scores are the max over their pairs,
+as in the stored Asset.risk_score.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.assets.models import Asset
+from app.risk.engine import RiskScoringEngine, FACTOR_COLUMNS
+from app.risk.inputs import pair_select, pair_frame
+
+logger = logging.getLogger("vulnguard.risk.simulator")
+
+MATRIX_MAX_AGE_SECONDS = 300
+CRITICAL_THRESHOLD = 80
+
+risk_engine = RiskScoringEngine()
+
+
+def _codes(values: pd.Series):
+    codes, uniques = pd.factorize(values, sort=False)
+    return codes.astype(np.int64), {v: i for i, v in enumerate(uniques)}
+
+
+class RiskMatrix:
+    """Fleet risk inputs as flat arrays, with baseline pair and asset scores."""
+
+    def __init__(self, df: pd.DataFrame, assets: List[tuple]):
+        self.loaded_at = time.time()
+
+        # Assets (every asset, matched or not)
+        self.asset_ids = np.array([a[0] for a in assets], dtype=np.int64)
+        self.hostnames = [a[1] for a in assets]
+        self.asset_index = {asset_id: i for i, asset_id in enumerate(self.asset_ids.tolist())}
+        bu_codes, self.bu_index = _codes(pd.Series([a[2] or "unassigned" for a in assets], dtype=object))
+        self.asset_bu = bu_codes
+        self.bu_names = [str(name) for name in self.bu_index]
+        n_assets = len(self.asset_ids)
+
+        # Match rows
+        if df.empty:
+            df = pd.DataFrame(columns=["asset_id", "cve_id", "software_name", "software_version", "vulnerability_count"])
+        df = df[df["asset_id"].isin(self.asset_index)].reset_index(drop=True)
+        self.match_asset = df["asset_id"].map(self.asset_index).to_numpy(dtype=np.int64)
+        packages = df["software_name"].fillna("").str.lower()
+        self.match_package, self.package_index = _codes(packages)
+        self.match_version, self.version_index = _codes(df["software_version"].fillna(""))
+        self.package_names = df["software_name"].fillna("").to_numpy(dtype=object)
+        status = df["status"] if "status" in df else pd.Series("open", index=df.index)
+        self.match_open = (status.fillna("open") == "open").to_numpy()
+
+        # Unique (asset, CVE) pairs; matches point at their pair
+        cve_codes, cve_index = _codes(df["cve_id"])
+        self.match_pair, _ = _codes(pd.Series(self.match_asset * max(len(cve_index), 1) + cve_codes))
+        first = np.unique(self.match_pair, return_index=True)[1]
+        pairs = df.iloc[first].reset_index(drop=True)
+        self.pair_asset = self.match_asset[first]
+        self.pair_cve = pairs["cve_id"].to_numpy(dtype=object)
+
+        # Match count per asset as used by the scorer (includes matches without a CVE row)
+        self.base_count = np.zeros(n_assets, dtype=np.float64)
+        if len(pairs):
+            self.base_count[self.pair_asset] = pairs["vulnerability_count"].to_numpy(dtype=np.float64)
+
+        # Baseline factors; what-ifs only change match counts, so rescoring is RiskBatch.rescore
+        self.batch = risk_engine.calculate_columns(**{
+            name: pairs[name].to_numpy() if name in pairs else default
+            for name, default in FACTOR_COLUMNS.items()
+        })
+        self.pair_score = self.batch.risk_score
+        self.asset_score = self._asset_max(np.arange(len(pairs)), self.pair_score)
+
+    @property
+    def n_matches(self) -> int:
+        return len(self.match_asset)
+
+    def _score(self, pair_idx: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        if not len(pair_idx):
+            return np.zeros(0)
+        return self.batch.rescore(counts[self.pair_asset[pair_idx]], pair_idx)
+
+    def _asset_max(self, pair_idx: np.ndarray, scores: np.ndarray) -> np.ndarray:
+        result = np.zeros(len(self.asset_ids))
+        np.maximum.at(result, self.pair_asset[pair_idx], scores)
+        return result
+
+    def removal_mask(self, removals: Iterable[Dict]) -> np.ndarray:
+        """Boolean mask over match rows for ``{"package", "version"?, "asset_ids"?}`` removals."""
+        removed = np.zeros(self.n_matches, dtype=bool)
+        fleet_wide = []  # package codes removed everywhere: one isin pass for all of them
+        for removal in removals:
+            package = self.package_index.get((removal.get("package") or "").lower())
+            if package is None:
+                continue
+            version, asset_ids = removal.get("version"), removal.get("asset_ids")
+            if version is None and asset_ids is None:
+                fleet_wide.append(package)
+                continue
+            mask = self.match_package == package
+            if version is not None:
+                mask &= self.match_version == self.version_index.get(version, -1)
+            if asset_ids is not None:
+                idx = [self.asset_index[a] for a in asset_ids if a in self.asset_index]
+                mask &= np.isin(self.match_asset, idx)
+            removed |= mask
+        if fleet_wide:
+            removed |= np.isin(self.match_package, fleet_wide)
+        return removed
+
+    def asset_scores_after(self, removed: np.ndarray) -> np.ndarray:
+        """Asset scores once the masked match rows are gone."""
+        removed_per_asset = np.bincount(self.match_asset[removed], minlength=len(self.asset_ids))
+        touched = removed_per_asset > 0
+        if not touched.any():
+            return self.asset_score.copy()
+
+        counts = self.base_count - removed_per_asset
+        still_open = np.bincount(self.match_pair[~removed], minlength=len(self.pair_asset)) > 0
+        pair_idx = np.flatnonzero(touched[self.pair_asset] & still_open)
+
+        after = self.asset_score.copy()
+        after[touched] = 0.0
+        np.maximum.at(after, self.pair_asset[pair_idx], self._score(pair_idx, counts))
+        return after
+
+    def _bu_summary(self, scores: np.ndarray) -> Dict[str, np.ndarray]:
+        n = len(self.bu_names)
+        total = np.bincount(self.asset_bu, minlength=n)
+        max_risk = np.zeros(n)
+        np.maximum.at(max_risk, self.asset_bu, scores)
+        return {
+            "total_risk": np.bincount(self.asset_bu, weights=scores, minlength=n),
+            "avg_risk": np.bincount(self.asset_bu, weights=scores, minlength=n) / np.maximum(total, 1),
+            "max_risk": max_risk,
+            "critical_assets": np.bincount(self.asset_bu, weights=scores >= CRITICAL_THRESHOLD, minlength=n),
+        }
+
+    def simulate(self, removals: Iterable[Dict], asset_limit: int = 100) -> Dict:
+        started = time.perf_counter()
+        removed = self.removal_mask(list(removals))
+        after = self.asset_scores_after(removed)
+        before = self.asset_score
+
+        delta = after - before
+        changed = np.flatnonzero(delta != 0)
+        changed = changed[np.argsort(delta[changed], kind="stable")][:asset_limit]  # biggest drops first
+
+        bu_before, bu_after = self._bu_summary(before), self._bu_summary(after)
+        business_units = [
+            {
+                "business_unit": name,
+                **{f"{k}_before": round(float(bu_before[k][b]), 2) for k in bu_before},
+                **{f"{k}_after": round(float(bu_after[k][b]), 2) for k in bu_after},
+            }
+            for b, name in enumerate(self.bu_names)
+        ]
+        return {
+            "findings_removed": int(removed.sum()),
+            "assets_changed": int((delta != 0).sum()),
+            "fleet_risk_before": round(float(before.sum()), 2),
+            "fleet_risk_after": round(float(after.sum()), 2),
+            "assets": [
+                {
+                    "asset_id": int(self.asset_ids[i]),
+                    "hostname": self.hostnames[i],
+                    "business_unit": self.bu_names[self.asset_bu[i]],
+                    "risk_before": float(before[i]),
+                    "risk_after": float(after[i]),
+                    "delta": round(float(delta[i]), 2),
+                }
+                for i in changed
+            ],
+            "business_units": business_units,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+
+def _build_matrix(rows: list, assets: list) -> RiskMatrix:
+    df = pair_frame(rows) if rows else pd.DataFrame()
+    return RiskMatrix(df, [tuple(a) for a in assets])
+
+
+async def load_matrix(db: AsyncSession) -> RiskMatrix:
+    started = time.perf_counter()
+    rows = (await db.execute(pair_select())).all()
+    assets = (await db.execute(select(Asset.id, Asset.hostname, Asset.business_unit))).all()
+    # Factorizing and scoring the whole fleet is CPU-bound: build it off the event loop
+    matrix = await asyncio.to_thread(_build_matrix, rows, assets)
+    logger.info(
+        f"Loaded risk matrix: {matrix.n_matches} matches, {len(matrix.pair_asset)} pairs, "
+        f"{len(matrix.asset_ids)} assets in {time.perf_counter() - started:.2f}s"
+    )
+    return matrix
+
+
+_matrix: Optional[RiskMatrix] = None
+_matrix_lock = asyncio.Lock()
+
+
+async def get_matrix(db: AsyncSession, refresh: bool = False) -> RiskMatrix:
+    """Process-wide matrix, reloaded when older than MATRIX_MAX_AGE_SECONDS or on request."""
+    global _matrix
+    async with _matrix_lock:
+        if refresh or _matrix is None or time.time() - _matrix.loaded_at > MATRIX_MAX_AGE_SECONDS:
+            _matrix = await load_matrix(db)
+        return _matrix
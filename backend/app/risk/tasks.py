@@ -0,0 +1,303 @@
+import logging
+import asyncio
+import threading
+from datetime import datetime
+from sqlalchemy import select, update, delete, func, or_, null
+from sqlalchemy.dialects import postgresql, sqlite
+from app.celery_app import celery
+from app.database import async_session, is_sqlite
+from app.assets.models import Asset
+from app.ingestion.changelog import consume_changes
+from app.matching.models import VulnerabilityMatch
+from app.risk.engine import RiskScoringEngine
+from app.risk.models import RiskScore, RiskDirtyEntity, RISK_FACTOR_COLUMNS
+# Importing the tracker also registers its ORM flush hooks in this process
+from app.risk.dependencies import DIRTY_ASSET, DIRTY_CVE
+from app.risk.heatmap import refresh_heatmap, business_units_of
+from app.risk.inputs import pair_select, pair_frame
+from app.risk import history
+
+logger = logging.getLogger("vulnguard.risk.tasks")
+
+risk_engine = RiskScoringEngine()
+
+RECALC_CHUNK_SIZE = 5000
+DIRTY_FLUSH_BATCH_SIZE = 1000
+DIRTY_FLUSH_MAX_PER_RUN = 20000
+
+
+
+def run_async(coro):
+    """Helper to run async functions in sync Celery tasks."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+
+    if loop and loop.is_running():
+        result = None
+        error = None
+        def target():
+            nonlocal result, error
+            new_loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(new_loop)
+            try:
+                result = new_loop.run_until_complete(coro)
+            except Exception as e:
+                error = e
+            finally:
+                new_loop.close()
+
+        t = threading.Thread(target=target)
+        t.start()
+        t.join()
+        if error:
+            raise error
+        return result
+    else:
+        new_loop = asyncio.new_event_loop()
+        try:
+            return new_loop.run_until_complete(coro)
+        finally:
+            new_loop.close()
+
+
+def _score_rows(rows) -> list:
+    """Score joined pair rows in one vectorized pass; returns RiskScore value dicts."""
+    df = pair_frame(rows).drop_duplicates(subset=["asset_id", "cve_id"])  # several matched packages, one score
+    batch = risk_engine.calculate_frame(df)
+    columns = {
+        "asset_id": df["asset_id"].tolist(),
+        "cve_id": df["cve_id"].tolist(),
+        "risk_score": batch.risk_score.tolist(),
+        "risk_level": batch.risk_level.tolist(),
+        "cvss_score": df["cvss_score"].tolist(),
+        "vulnerability_count": df["vulnerability_count"].astype(int).tolist(),
+        **{column: batch.factors[name].tolist() for name, column in RISK_FACTOR_COLUMNS.items()},
+    }
+    # Numeric columns only: breakdowns are rendered from them when rows are read
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+async def _upsert_scores(db, values: list, calculated_at: datetime) -> None:
+    """Bulk insert-or-update RiskScore rows on (asset_id, cve_id)."""
+    if not values:
+        return
+    for row in values:
+        row["calculated_at"] = calculated_at
+    stmt = (sqlite.insert if is_sqlite else postgresql.insert)(RiskScore)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["asset_id", "cve_id"],
+        set_={
+            **{
+                name: stmt.excluded[name]
+                for name in (
+                    "risk_score", "risk_level", "calculated_at",
+                    "cvss_score", "vulnerability_count", *RISK_FACTOR_COLUMNS.values(),
+                )
+            },
+            "breakdown_json": null(),  # superseded by the factor columns
+        },
+    )
+    await db.execute(stmt, values)  # executemany
+
+
+async def _refresh_asset_scores(db, asset_ids=None) -> None:
+    """Set Asset.risk_score to the max of its pair scores in a single UPDATE."""
+    max_score = (
+        select(func.coalesce(func.max(RiskScore.risk_score), 0.0))
+        .where(RiskScore.asset_id == Asset.id)
+        .scalar_subquery()
+    )
+    stmt = update(Asset).values(risk_score=max_score).execution_options(synchronize_session=False)
+    if asset_ids is not None:
+        stmt = stmt.where(Asset.id.in_(asset_ids))
+    await db.execute(stmt)
+    # Core UPDATE bypasses the ORM hooks, so keep the heatmap summary in step here
+    units = None if asset_ids is None else await business_units_of(db, asset_ids)
+    await refresh_heatmap(db, units)
+
+
+@celery.task(name="app.risk.tasks.recalculate_all_risks", bind=True, max_retries=1)
+def recalculate_all_risks(self, chunk_size: int = RECALC_CHUNK_SIZE):
+    """Recalculate every (asset, CVE) risk score and refresh asset-level scores."""
+    task_id, is_eager = self.request.id, self.request.is_eager  # request context is thread-local
+
+    def report(processed: int, total: int):
+        logger.info(f"Risk recalculation: {processed}/{total} matches scored")
+        if not is_eager:
+            self.update_state(task_id=task_id, state="PROGRESS", meta={"processed": processed, "total": total})
+
+    try:
+        return run_async(_recalculate_all_risks(chunk_size, report))
+    except Exception as exc:
+        logger.error(f"Risk recalculation failed: {exc}")
+        self.retry(countdown=300, exc=exc)
+
+
+async def _recalculate_all_risks(chunk_size: int = RECALC_CHUNK_SIZE, progress=None) -> dict:
+    started = datetime.utcnow()
+    async with async_session() as db:
+        total = (await db.execute(select(func.count(VulnerabilityMatch.id)))).scalar() or 0
+
+        # Keyset over match ids: each chunk is one joined read and one upsert
+        processed = scored = 0
+        last_id = 0
+        while True:
+            in_chunk = VulnerabilityMatch.id > last_id
+            # Count matches only for the chunk's assets, not the whole table per chunk
+            chunk_assets = (
+                select(VulnerabilityMatch.asset_id).where(in_chunk).order_by(VulnerabilityMatch.id).limit(chunk_size)
+            )
+            rows = (await db.execute(
+                pair_select(in_chunk, count_assets=chunk_assets)
+                .order_by(VulnerabilityMatch.id)
+                .limit(chunk_size)
+            )).all()
+            if not rows:
+                break
+            last_id = rows[-1].match_id
+
+            values = _score_rows(rows)
+            await _upsert_scores(db, values, started)
+            await db.commit()
+
+            processed += len(rows)
+            scored += len(values)
+            if progress:
+                progress(processed, total)
+
+        # Anything not rewritten above belongs to a match that no longer exists
+        stale = await db.execute(
+            delete(RiskScore)
+            .where(RiskScore.cve_id.isnot(None), RiskScore.calculated_at < started)
+            .execution_options(synchronize_session=False)
+        )
+        await _refresh_asset_scores(db)
+        # Everything queued before this run has just been rescored
+        await db.execute(
+            delete(RiskDirtyEntity)
+            .where(RiskDirtyEntity.marked_at < started)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+
+    elapsed = (datetime.utcnow() - started).total_seconds()
+    logger.info(f"Recalculated {scored} risk scores from {processed} matches in {elapsed:.1f}s")
+    return {
+        "total_calculated": scored,
+        "matches_processed": processed,
+        "stale_removed": stale.rowcount,
+        "duration_seconds": round(elapsed, 2),
+    }
+
+
+@celery.task(name="app.risk.tasks.rescore_changed_cves", bind=True, max_retries=2)
+def rescore_changed_cves(self):
+    """Rescore only the matches whose CVEs appear in the ingestion change log."""
+    try:
+        return run_async(consume_changes("risk", _rescore_cve_changes))
+    except Exception as exc:
+        logger.error(f"Incremental risk scoring failed: {exc}")
+        self.retry(countdown=120, exc=exc)
+
+
+async def _rescore_cve_changes(db, changes: dict) -> int:
+    rescored = await _rescore_dependents(db, cve_ids=set(changes))
+    logger.info(f"Rescored {rescored} matches for {len(changes)} changed CVEs")
+    return rescored
+
+
+async def _rescore_dependents(db, asset_ids=(), cve_ids=()) -> int:
+    """Rescore every pair on the given assets or CVEs and drop scores whose match is gone."""
+    asset_ids, cve_ids = set(asset_ids), set(cve_ids)
+    if not asset_ids and not cve_ids:
+        return 0
+    match_scope = or_(VulnerabilityMatch.asset_id.in_(asset_ids), VulnerabilityMatch.cve_id.in_(cve_ids))
+    affected_assets = select(VulnerabilityMatch.asset_id).where(match_scope)
+
+    rows = (await db.execute(pair_select(match_scope, count_assets=affected_assets))).all()
+    values = _score_rows(rows) if rows else []
+    now = datetime.utcnow()
+    await _upsert_scores(db, values, now)
+
+    removed = (await db.execute(
+        delete(RiskScore)
+        .where(
+            or_(RiskScore.asset_id.in_(asset_ids), RiskScore.cve_id.in_(cve_ids)),
+            RiskScore.cve_id.isnot(None),
+            RiskScore.calculated_at < now,
+        )
+        .returning(RiskScore.asset_id)
+        .execution_options(synchronize_session=False)
+    )).scalars().all()
+
+    await _refresh_asset_scores(db, asset_ids | {row["asset_id"] for row in values} | set(removed))
+    return len(values)
+
+
+@celery.task(name="app.risk.tasks.flush_dirty_risk_scores", bind=True, max_retries=2)
+def flush_dirty_risk_scores(self, batch_size: int = DIRTY_FLUSH_BATCH_SIZE, max_per_run: int = DIRTY_FLUSH_MAX_PER_RUN):
+    """Rescore the assets and CVEs queued by the ORM dependency hooks."""
+    try:
+        return run_async(_flush_dirty_risk_scores(batch_size, max_per_run))
+    except Exception as exc:
+        logger.error(f"Dirty risk flush failed: {exc}")
+        self.retry(countdown=30, exc=exc)
+
+
+async def _flush_dirty_risk_scores(
+    batch_size: int = DIRTY_FLUSH_BATCH_SIZE, max_per_run: int = DIRTY_FLUSH_MAX_PER_RUN
+) -> dict:
+    flushed, rescored = 0, 0
+    while flushed < max_per_run:
+        async with async_session() as db:
+            dirty = (await db.execute(
+                select(RiskDirtyEntity).order_by(RiskDirtyEntity.marked_at).limit(batch_size)
+            )).scalars().all()
+            if not dirty:
+                break
+
+            asset_ids = {int(d.entity_key) for d in dirty if d.entity_type == DIRTY_ASSET}
+            cve_ids = {d.entity_key for d in dirty if d.entity_type == DIRTY_CVE}
+            rescored += await _rescore_dependents(db, asset_ids, cve_ids)
+
+            # Keys re-marked while we were scoring carry a newer marked_at and stay queued
+            cutoff = max(d.marked_at for d in dirty)
+            await db.execute(
+                delete(RiskDirtyEntity)
+                .where(RiskDirtyEntity.id.in_([d.id for d in dirty]), RiskDirtyEntity.marked_at <= cutoff)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            flushed += len(dirty)
+
+    if flushed:
+        logger.info(f"Flushed {flushed} dirty risk dependencies, rescored {rescored} matches")
+    return {"flushed": flushed, "rescored": rescored}
+
+
+@celery.task(name="app.risk.tasks.snapshot_risk_history")
+def snapshot_risk_history():
+    """Record today's per-asset and per-business-unit risk snapshot."""
+    return run_async(_snapshot_risk_history())
+
+
+async def _snapshot_risk_history() -> dict:
+    async with async_session() as db:
+        result = await history.snapshot(db)
+        await db.commit()
+    return result
+
+
+@celery.task(name="app.risk.tasks.downsample_risk_history")
+def downsample_risk_history():
+    """Roll aged daily history into weekly, and aged weekly into monthly, points."""
+    return run_async(_downsample_risk_history())
+
+
+async def _downsample_risk_history() -> dict:
+    async with async_session() as db:
+        result = await history.downsample(db)
+        await db.commit()
+    return result
@@ -0,0 +1,51 @@
+"""
+Bounded top-K selection over streamed query results.
+
+For queries whose filters span several tables, ORDER BY ... LIMIT can't
+walk the risk_score index and the database sorts the whole filtered join.
+``stream_top_k`` instead streams the filtered rows in ``yield_per``
+batches and keeps only the best ``k`` in a min-heap, so memory stays O(k)
+however many rows qualify.
+"""
+import heapq
+from itertools import count
+from typing import Any, Callable, List
+from sqlalchemy.ext.asyncio import AsyncSession
+
+STREAM_BATCH_SIZE = 2000
+
+
+class TopK:
+    """Min-heap holding the ``k`` rows with the largest ``key``; ties keep arrival order."""
+
+    def __init__(self, k: int, key: Callable[[Any], float]):
+        self.k = k
+        self.key = key
+        self._heap = []
+        self._seq = count()
+
+    def push(self, row) -> None:
+        if self.k <= 0:
+            return
+        item = (self.key(row), -next(self._seq), row)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, item)
+        elif item[:2] > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, item)
+
+    def extend(self, rows) -> None:
+        for row in rows:
+            self.push(row)
+
+    def result(self) -> List:
+        """Kept rows, best first."""
+        return [row for _, _, row in sorted(self._heap, key=lambda item: item[:2], reverse=True)]
+
+
+async def stream_top_k(db: AsyncSession, stmt, k: int, key: Callable[[Any], float]) -> List:
+    """Top ``k`` rows of a statement by ``key``, streamed from the database in batches."""
+    best = TopK(k, key)
+    result = await db.stream(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+    async for partition in result.partitions():
+        best.extend(partition)
+    return best.result()
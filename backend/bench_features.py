@@ -0,0 +1,64 @@
+"""
+Benchmark CVE feature engineering: per-row extract_features vs the columnar
+FeatureEngineer.build_frame, on the CVEs in the database tiled up to N rows.
+
+    python bench_features.py            # 250,000 rows
+    python bench_features.py 1000000
+"""
+import asyncio
+import sys
+import time
+
+import pandas as pd
+from sqlalchemy import select
+
+from app.database import async_session
+from app.ml.feature_engineering import FeatureEngineer
+from app.ml.tasks import FEATURE_SOURCE_COLUMNS
+
+
+async def load_records():
+    """CVE rows as the dicts extract_features takes (None for missing values)."""
+    async with async_session() as db:
+        return [dict(r._mapping) for r in (await db.execute(select(*FEATURE_SOURCE_COLUMNS[1:]))).all()]
+
+
+def per_row(engineer: FeatureEngineer, records: list) -> pd.DataFrame:
+    """The original build_dataframe: one extract_features dict per CVE."""
+    rows = []
+    for cve in records:
+        features = engineer.extract_features(cve)
+        features["cve_id"] = cve.get("cve_id", "")
+        features["label"] = 1.0 if cve.get("is_kev") else 0.0
+        rows.append(features)
+    return pd.DataFrame(rows)
+
+
+def bench(label: str, fn, rows: int, repeat: int = 3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<32} {rows:>9} rows  {best:8.3f}s  {rows / best:>12,.0f} rows/s")
+    return best
+
+
+if __name__ == "__main__":
+    target = int(sys.argv[1]) if len(sys.argv) > 1 else 250_000
+    corpus = asyncio.run(load_records())
+    if not corpus:
+        sys.exit("No CVEs in the database; run an ingestion or seed_db.py first")
+    records = (corpus * (target // len(corpus) + 1))[:target]
+    frame = pd.DataFrame(records)
+    engineer = FeatureEngineer()
+
+    print(f"Corpus: {len(corpus)} CVEs tiled to {len(records)} rows")
+
+    # Both paths must produce identical features (a day boundary between the runs would differ)
+    pd.testing.assert_frame_equal(engineer.build_dataframe(records[:50_000]), per_row(engineer, records[:50_000]))
+
+    base = bench("per-row extract_features", lambda: per_row(engineer, records), len(records))
+    bench("build_dataframe (records)", lambda: engineer.build_dataframe(records), len(records))
+    fast = bench("build_frame (DataFrame input)", lambda: engineer.build_frame(frame), len(records))
+    print(f"Speedup: {base / fast:.1f}x")
@@ -0,0 +1,89 @@
+"""
+Benchmark NVD page decoding + normalization: json/normalize_cve_data vs the
+msgspec struct fast path, on a recorded corpus of raw NVD API responses.
+
+    python bench_nvd_decode.py record ./nvd_corpus 30   # save raw pages for the last 30 days
+    python bench_nvd_decode.py ./nvd_corpus             # benchmark every *.json page in the dir
+"""
+import asyncio
+import glob
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from app.ingestion.fast_decode import decode_nvd_page, fast_decode_available
+from app.ingestion.normalizer import normalize_cve_data
+
+
+async def record(corpus_dir: str, days_back: int):
+    import httpx
+    from app.ingestion.connectors.nvd import NVDConnector, NVD_PAGE_SIZE
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    connector = NVDConnector()
+    end = datetime.utcnow()
+    start = end - timedelta(days=days_back)
+    params = {
+        "lastModStartDate": start.strftime("%Y-%m-%dT%H:%M:%S.000"),
+        "lastModEndDate": end.strftime("%Y-%m-%dT%H:%M:%S.000"),
+        "resultsPerPage": NVD_PAGE_SIZE,
+        "startIndex": 0,
+    }
+    async with httpx.AsyncClient() as client:
+        while True:
+            content = await connector._fetch_page_content(client, params)
+            path = os.path.join(corpus_dir, f"page_{params['startIndex']:07d}.json")
+            with open(path, "wb") as f:
+                f.write(content)
+            data = json.loads(content)
+            count = len(data.get("vulnerabilities", []))
+            print(f"Saved {count} CVEs to {path}")
+            params["startIndex"] += count
+            if not count or params["startIndex"] >= data.get("totalResults", 0):
+                break
+            await asyncio.sleep(connector.rate_delay)
+
+
+def baseline_decode(content: bytes):
+    data = json.loads(content)
+    return [normalize_cve_data(v) for v in data.get("vulnerabilities", [])]
+
+
+def bench(label: str, fn, pages, repeat: int = 3):
+    best = float("inf")
+    records = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = sum(len(fn(p)) for p in pages)
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:<28} {records:>8} records  {best:8.3f}s  {records / best:>12,.0f} rec/s")
+    return records / best
+
+
+if __name__ == "__main__":
+    if len(sys.argv) >= 3 and sys.argv[1] == "record":
+        asyncio.run(record(sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 7))
+        sys.exit(0)
+
+    corpus = sys.argv[1] if len(sys.argv) > 1 else "nvd_corpus"
+    files = sorted(glob.glob(os.path.join(corpus, "*.json"))) if os.path.isdir(corpus) else [corpus]
+    pages = []
+    for path in files:
+        with open(path, "rb") as f:
+            pages.append(f.read())
+    if not pages:
+        sys.exit(f"No NVD pages found in {corpus}; record some first")
+
+    print(f"Corpus: {len(pages)} pages, {sum(len(p) for p in pages) / 1e6:.1f} MB")
+
+    # Both paths must produce identical rows
+    for p in pages:
+        assert baseline_decode(p) == decode_nvd_page(p)[1], "fast path output differs from normalize_cve_data"
+
+    base = bench("json + normalize_cve_data", baseline_decode, pages)
+    if fast_decode_available():
+        fast = bench("msgspec structs", lambda p: decode_nvd_page(p)[1], pages)
+        print(f"Speedup: {fast / base:.2f}x")
+    else:
+        print("msgspec not installed; fast path unavailable")
@@ -0,0 +1,147 @@
+"""
+Bring an existing risk_scores table in line with app.risk.models.RiskScore.
+
+Older builds appended a new row per (asset, CVE) on every recalculation.
+This keeps the most recent row per pair and adds the unique index the
+recalculation upsert relies on, which also makes risk_scores itself the
+latest-score relation, plus the indexes top-K reads use. Scores used to carry a nested
+breakdown_json per row; the factor columns are backfilled from it and the
+JSON is cleared (breakdowns are rendered from the columns on read).
+Finally the business unit heatmap summary is materialized. Safe to run
+repeatedly.
+
+    python migrate_risk_scores.py
+"""
+import asyncio
+import json
+from sqlalchemy import text, inspect, select, update, null
+from app.database import engine, init_db, async_session, is_sqlite
+from app.risk.models import RiskScore
+from app.risk.heatmap import refresh_heatmap
+
+DEDUPE = """
+DELETE FROM risk_scores
+WHERE cve_id IS NOT NULL
+  AND id NOT IN (
+    SELECT keep_id FROM (
+      SELECT MAX(id) AS keep_id FROM risk_scores
+      WHERE cve_id IS NOT NULL
+      GROUP BY asset_id, cve_id
+    ) latest
+  )
+"""
+
+UNIQUE_INDEX = """
+CREATE UNIQUE INDEX IF NOT EXISTS uq_risk_scores_asset_cve
+ON risk_scores (asset_id, cve_id)
+"""
+
+TOP_K_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS ix_risk_scores_risk_score_desc ON risk_scores (risk_score DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_assets_business_unit ON assets (business_unit)",
+)
+
+NEW_COLUMNS = {
+    "cvss_score": "REAL",
+    "vulnerability_count": "INTEGER",
+}
+
+FLOAT32_COLUMNS = (
+    "exploit_probability_factor", "criticality_factor", "attack_path_factor",
+    "exposure_factor", "business_impact_factor", "urgency_boost", "cvss_score",
+)
+
+BACKFILL_BATCH_SIZE = 2000
+
+
+def _factor_values(breakdown) -> dict:
+    """Factor columns from a legacy breakdown_json value, or {} if it is not one."""
+    if isinstance(breakdown, str):
+        try:
+            breakdown = json.loads(breakdown)
+        except ValueError:
+            return {}
+    if not isinstance(breakdown, dict) or "exploit_probability" not in breakdown:
+        return {}
+    path = breakdown.get("attack_path_weight", {})
+    return {
+        "exploit_probability_factor": breakdown["exploit_probability"].get("value"),
+        "criticality_factor": breakdown.get("asset_criticality", {}).get("value"),
+        "attack_path_factor": path.get("value"),
+        "exposure_factor": breakdown.get("exposure_factor", {}).get("value"),
+        "business_impact_factor": breakdown.get("business_impact", {}).get("value"),
+        "urgency_boost": breakdown.get("urgency_boost", 1.0),
+        "cvss_score": path.get("cvss_score"),
+        "vulnerability_count": path.get("vulnerability_count"),
+    }
+
+
+async def backfill_factor_columns() -> int:
+    """Copy factor values out of breakdown_json into columns, then drop the JSON."""
+    filled, last_id = 0, 0
+    async with async_session() as db:
+        while True:
+            rows = (await db.execute(
+                select(RiskScore.id, RiskScore.breakdown_json)
+                .where(
+                    RiskScore.id > last_id,
+                    RiskScore.breakdown_json.isnot(None),
+                    RiskScore.exploit_probability_factor.is_(None),
+                )
+                .order_by(RiskScore.id)
+                .limit(BACKFILL_BATCH_SIZE)
+            )).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+
+            updates = []
+            for row in rows:
+                values = _factor_values(row.breakdown_json)
+                if values:
+                    updates.append({"id": row.id, **values})
+            if updates:
+                await db.execute(update(RiskScore), updates)  # bulk UPDATE by primary key
+                await db.execute(
+                    update(RiskScore)
+                    .where(RiskScore.id.in_([u["id"] for u in updates]))
+                    .values(breakdown_json=null())  # SQL NULL, not a JSON 'null'
+                    .execution_options(synchronize_session=False)
+                )
+                await db.commit()
+            filled += len(updates)
+    return filled
+
+
+async def migrate():
+    await init_db()
+    async with engine.begin() as conn:
+        removed = await conn.execute(text(DEDUPE))
+        print(f"Removed {removed.rowcount} superseded risk score rows")
+        await conn.execute(text(UNIQUE_INDEX))
+        print("Unique index uq_risk_scores_asset_cve in place")
+        for statement in TOP_K_INDEXES:
+            await conn.execute(text(statement))
+        print("Top-K indexes in place")
+
+        existing = await conn.run_sync(
+            lambda sync_conn: {c["name"] for c in inspect(sync_conn).get_columns("risk_scores")}
+        )
+        for name, sql_type in NEW_COLUMNS.items():
+            if name not in existing:
+                await conn.execute(text(f"ALTER TABLE risk_scores ADD COLUMN {name} {sql_type}"))
+                print(f"Added risk_scores.{name}")
+        if not is_sqlite:  # SQLite stores every REAL as 8 bytes anyway
+            for name in FLOAT32_COLUMNS:
+                await conn.execute(text(f"ALTER TABLE risk_scores ALTER COLUMN {name} TYPE REAL"))
+
+    filled = await backfill_factor_columns()
+    print(f"Backfilled factor columns for {filled} risk score rows")
+    async with async_session() as db:
+        await refresh_heatmap(db)
+        await db.commit()
+        print("Risk heatmap summary rebuilt")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,97 @@
+"""
+Parity check: FeatureEngineer.build_frame (columnar) must match the per-row
+extract_features path exactly, over randomized CVE records that cover the
+edge cases (missing keys, None, mixed case, odd timestamps, non-list references).
+
+    python test_feature_parity.py     # or: python -m pytest test_feature_parity.py
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+
+import app.ml.feature_engineering as feature_engineering
+from app.ml.feature_engineering import FeatureEngineer
+
+NOW = datetime(2026, 3, 1, 12, 0, 0)
+
+TIMESTAMPS = [
+    None, "", "garbage", "2024-13-01", "2026-02-30", "2024-W03", "20240115", "2024-01-15t10:00",
+    "2026-02-15", "2026-01-30T12:00:00", "2026-01-30T11:59:59.999999", "2026-01-30T12:00:00.000001",
+    "2026-01-30T12:00:00Z", "2026-01-30T12:00:00+05:30", "2026-01-31T02:00:00-08:00",
+    "2026-01-30 12:00", "2026-01-30T12", "2026-01-30T12:00:00.123456789", "2026-01-30T12:00:00,5",
+    "2026-01-30T12:00:00+0530", "2026-01-30T12:00:00+24:00", "2026-01-30Z", " 2026-01-30",
+    "2026-1-5", "2026-03-15T00:00:00", "2030-01-01T00:00:00.000",
+    NOW - timedelta(days=30), NOW - timedelta(days=30, microseconds=1), NOW + timedelta(days=3),
+    datetime(2026, 1, 30, 12, tzinfo=timezone(timedelta(hours=9))),
+]
+CATEGORIES = {
+    "attack_vector": [None, "", "NETWORK", "network", "Adjacent_Network", "LOCAL", "PHYSICAL", "OTHER"],
+    "attack_complexity": [None, "LOW", "high", "UNKNOWN"],
+    "privileges_required": [None, "NONE", "low", "HIGH", "?"],
+    "user_interaction": [None, "NONE", "Required"],
+    "scope": [None, "CHANGED", "unchanged", ""],
+    "exploit_maturity": [None, "", "none", "POC", "functional", "Weaponized", "unknown"],
+    "vendor": [None, "", "Microsoft", "apache", "acme", "F5", "linux"],
+}
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def utcnow(cls):
+        return NOW
+
+
+def random_record(rng: random.Random, i: int) -> dict:
+    record = {
+        "cve_id": f"CVE-2026-{i:05d}",
+        "cvss_v3_score": rng.choice([None, 0, 0.0, 5, 7.5, 9.8, 10.0, True]),
+        "epss_score": rng.choice([None, 0.0, rng.random()]),
+        "epss_percentile": rng.choice([None, rng.random()]),
+        "is_kev": rng.choice([None, False, True, 0, 1]),
+        "has_public_exploit": rng.choice([None, False, True]),
+        "published_date": rng.choice(TIMESTAMPS),
+        "references": rng.choice([None, [], ["a"], ["a", "b", "c"], "https://x", {"url": "x"}, ("a",)]),
+    }
+    for name, values in CATEGORIES.items():
+        record[name] = rng.choice(values)
+    # Some records omit keys entirely
+    for name in rng.sample(sorted(record), rng.randint(0, 3)):
+        if name != "cve_id":
+            del record[name]
+    return record
+
+
+def per_row_frame(engineer: FeatureEngineer, records: list) -> pd.DataFrame:
+    rows = []
+    for cve in records:
+        features = engineer.extract_features(cve)
+        features["cve_id"] = cve.get("cve_id", "")
+        features["label"] = 1.0 if cve.get("is_kev") else 0.0
+        rows.append(features)
+    return pd.DataFrame(rows)
+
+
+def test_build_frame_matches_extract_features():
+    original = feature_engineering.datetime
+    feature_engineering.datetime = FrozenDatetime
+    try:
+        engineer = FeatureEngineer()
+        rng = random.Random(7)
+        for size in (1, 17, 2000):
+            records = [random_record(rng, i) for i in range(size)]
+            expected = per_row_frame(engineer, records)
+            pd.testing.assert_frame_equal(engineer.build_dataframe(records), expected)
+            columns = FeatureEngineer.get_feature_columns()
+            pd.testing.assert_frame_equal(engineer.extract_frame(pd.DataFrame(records)), expected[columns])
+        # Every timestamp in isolation, so a frame-wide dtype cannot mask a mismatch
+        for value in TIMESTAMPS:
+            records = [{"published_date": value}]
+            pd.testing.assert_frame_equal(engineer.build_dataframe(records), per_row_frame(engineer, records))
+    finally:
+        feature_engineering.datetime = original
+
+
+if __name__ == "__main__":
+    test_build_frame_matches_extract_features()
+    print("build_frame matches extract_features")
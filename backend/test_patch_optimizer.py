@@ -0,0 +1,90 @@
+"""
+PatchOptimizer checks on a small synthetic fleet: plans must match the
+simulator's rescoring exactly, and an asset whose max is held by two
+packages at once must still be planned for (neither package gains alone).
+
+    python test_patch_optimizer.py     # or: python -m pytest test_patch_optimizer.py
+"""
+import numpy as np
+import pandas as pd
+
+import app.remediation.optimizer as optimizer
+from app.remediation.optimizer import PatchOptimizer
+from app.risk.simulator import RiskMatrix
+
+
+def finding(asset_id: int, cve_id: str, package: str, cvss: float, **factors) -> dict:
+    return {
+        "asset_id": asset_id, "cve_id": cve_id, "software_name": package, "software_version": "1.0",
+        "exploit_probability": 0.5, "cvss_score": cvss, "asset_criticality": "high",
+        "network_zone": "internal", "is_internet_facing": False, "business_unit": "it",
+        "has_exploit": False, "is_kev": False, **factors,
+    }
+
+
+def matrix(findings: list, n_assets: int) -> RiskMatrix:
+    df = pd.DataFrame(findings)
+    df["vulnerability_count"] = df.groupby("asset_id")["asset_id"].transform("size")
+    return RiskMatrix(df, [(i, f"host-{i}", "it") for i in range(1, n_assets + 1)])
+
+
+def fleet_after(m: RiskMatrix, plan: dict) -> float:
+    removals = [
+        {"package": a["package"], "version": a["installed_version"], "asset_ids": a["asset_ids"]}
+        for a in plan["actions"]
+    ]
+    return float(m.asset_scores_after(m.removal_mask(removals)).sum())
+
+
+def test_packages_tied_at_an_assets_max():
+    # Asset 1's max is held by two CVEs with identical inputs from two packages
+    m = matrix([
+        finding(1, "CVE-A", "chrome-remote-desktop", 9.8, is_kev=True, has_exploit=True),
+        finding(1, "CVE-B", "webview2", 9.8, is_kev=True, has_exploit=True),
+        finding(1, "CVE-C", "dropbox", 5.0),
+        finding(1, "CVE-D", "zip", 2.0),
+    ], 1)
+    scores = sorted(m.pair_score, reverse=True)
+    assert scores[0] == scores[1] > scores[2]
+
+    assert PatchOptimizer(m).plan(max_jobs=1)["actions"] == []  # one job cannot lower the max
+
+    plan = PatchOptimizer(m).plan(max_jobs=2)
+    assert {a["package"] for a in plan["actions"]} == {"chrome-remote-desktop", "webview2"}
+    assert plan["jobs"] == 2 and plan["hosts"] == 1
+    assert plan["risk_reduction"] > 0
+    assert round(fleet_after(m, plan), 2) == plan["fleet_risk_after"]
+
+    # Without a budget the other packages become worthwhile once the tie is broken
+    plan = PatchOptimizer(m).plan()
+    assert len(plan["actions"]) == 4
+    assert plan["fleet_risk_after"] == 0
+
+
+def test_plan_matches_simulator():
+    rng = np.random.default_rng(3)
+    findings = [
+        finding(
+            int(rng.integers(1, 41)), f"CVE-{int(rng.integers(0, 60))}", f"pkg{int(rng.integers(0, 15))}",
+            float(rng.choice([2.0, 5.0, 7.5, 9.8])), is_kev=bool(rng.random() < 0.2),
+        )
+        for _ in range(400)
+    ]
+    m = matrix(findings, 40)
+    original = optimizer.PLAN_ASSET_LIMIT
+    optimizer.PLAN_ASSET_LIMIT = 10 ** 6
+    try:
+        for budget in ({}, {"max_jobs": 5}, {"max_hosts": 3}, {"max_actions": 2}, {"max_jobs": 30, "max_hosts": 10}):
+            plan = PatchOptimizer(m).plan(**budget)
+            assert plan["jobs"] <= budget.get("max_jobs", np.inf)
+            assert plan["hosts"] <= budget.get("max_hosts", np.inf)
+            assert len(plan["actions"]) <= budget.get("max_actions", np.inf)
+            assert round(fleet_after(m, plan), 2) == plan["fleet_risk_after"]
+    finally:
+        optimizer.PLAN_ASSET_LIMIT = original
+
+
+if __name__ == "__main__":
+    test_packages_tied_at_an_assets_max()
+    test_plan_matches_simulator()
+    print("PatchOptimizer plans match the simulator")